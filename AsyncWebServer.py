@@ -0,0 +1,248 @@
+"""
+Mode alternatif WebServer.py berbasis asyncio:
+- Menerima video dari MaixCam via UDP (asyncio.DatagramProtocol) dan merakit frame.
+- Melayani halaman web, MJPEG /video_feed, /stats, /coords dan /direction dari
+  event loop yang sama, tanpa satu thread OS per viewer.
+- Memakai webserver.html dan folder static yang sama dengan WebServer.py.
+- Beberapa MaixCam dipisah per kamera seperti WebServer.py (streams.py):
+  /video_feed/<cam_id>, /stats/<cam_id> dan /streams.
+"""
+import asyncio
+import json
+import mimetypes
+import os
+import re
+import socket
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from broadcaster import AsyncFrameBroadcaster
+from commands import OP_MOVE, STATUS_ERROR, STATUS_NAMES, applied, parse_web_command, shared_session
+from jpeg_utils import looks_like_jpeg
+from latency import LatencyTracker
+from metrics import CONTENT_TYPE, ReceiverMetrics
+from protocol import HEADER_SIZE, parse_header
+from streams import CameraStream, StreamTable
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+MAX_BODY = 64 * 1024  # Batas body request HTTP (byte)
+
+latest_frame = {'data': b'', 'timestamp': 0, 'counter': 0, 'stats': {'fps': 0}}
+current_coords = {'x': 0, 'y': 0}  # Menyimpan koordinat terbaru
+broadcaster = AsyncFrameBroadcaster()
+latency = LatencyTracker()  # Latency per tahap, frame dianggap tayang saat dikirim ke viewer
+metrics = ReceiverMetrics()  # Counter dan histogram untuk /metrics
+# Kamera pertama memakai objek global di atas (/video_feed, /stats), kamera berikutnya punya state sendiri
+streams = StreamTable(CameraStream(broadcaster, latency, latest_frame, on_frame=metrics.on_frame),
+                      lambda: CameraStream(AsyncFrameBroadcaster(), on_frame=metrics.on_frame))
+
+class AsyncVideoReceiver(asyncio.DatagramProtocol):
+    """
+    Penerima UDP berbasis asyncio:
+    - datagram_received(): rakit chunk per kamera, validasi frame, publish ke broadcaster kamera.
+    - _tick(): dijadwalkan berkala untuk membuang frame basi dan mengirim NACK setiap kamera.
+    """
+    def __init__(self):
+        self.transport = None
+        self.nack_enabled = True
+        self.feedback_enabled = True  # Kirim laporan loss/jitter berkala untuk bitrate adaptif
+        self.clock_sync_enabled = True  # Sinkron jam dengan setiap MaixCam (alamat sumber stream) untuk latency
+        self.command_port = 9002
+        self.tick_interval = 0.005
+
+    def connection_made(self, transport):
+        self.transport = transport
+        sock = transport.get_extra_info('socket')
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 65536)
+        metrics.bind(sock=sock, viewers_fn=lambda: sum(s.broadcaster.viewers for s in streams.list()))
+        asyncio.get_running_loop().call_later(self.tick_interval, self._tick)
+
+    def datagram_received(self, data, addr):
+        header = parse_header(data)
+        metrics.on_datagram(len(data), header is not None)
+        if header is None:
+            return
+        stream = streams.get(header, addr)
+        if stream is None:
+            return
+        if stream.sender_addr is None:
+            metrics.bind(stream.reassembler)
+            stream.sender_addr = addr
+            if self.clock_sync_enabled:
+                # Pertukaran jam berjalan di thread ClockSync, tidak menahan event loop
+                stream.start_clock_sync(self.command_port)
+        now = time.time()
+        frame_data = stream.on_chunk(header, memoryview(data)[HEADER_SIZE:], addr, now)
+        if frame_data is None:
+            return
+        if not looks_like_jpeg(frame_data, header.total_size):
+            stream.invalid_frame()
+            metrics.on_invalid_frame()
+            return
+        stream.publish(header, frame_data, now)
+
+    def _tick(self):
+        if self.transport is None or self.transport.is_closing():
+            return
+        now = time.time()
+        for stream in streams.list():
+            stream.maintain(now, self.transport.sendto, self.nack_enabled, 0.0, self.feedback_enabled)
+        asyncio.get_running_loop().call_later(self.tick_interval, self._tick)
+
+    def error_received(self, exc):
+        print(f"\n⚠️ Error receiving frame: {str(exc)}")
+
+def send_command_to_server(op, a=0, b=0, server_ip='192.168.31', server_port=9002): #Ganti IP sesuai maixcam
+    # Fungsi blocking untuk mengirim perintah biner ke MaixCam (dijalankan di executor)
+    # MOVE dari beberapa request yang datang bersamaan digabung menjadi satu delta
+    try:
+        session, coalescer = shared_session(server_ip, server_port)
+        session.on_rtt = metrics.command_rtt.observe
+        if op == OP_MOVE:
+            return coalescer.move(a, b).wait(coalescer.deadline())
+        return session.call(op, a, b)
+    except Exception as e:
+        print(f"⚠️ Failed to send command: {e}")
+        return None
+
+def render_index():
+    # webserver.html memakai sintaks Jinja url_for, ganti dengan path static langsung
+    with open(os.path.join(BASE_DIR, 'webserver.html'), encoding='utf-8') as f:
+        html = f.read()
+    html = re.sub(r"\{\{\s*url_for\('static',\s*filename='([^']+)'\)\s*\}\}", r"/static/\1", html)
+    return html.encode('utf-8')
+
+async def send_response(writer, status, body, content_type='application/json'):
+    reason = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 409: 'Conflict',
+              503: 'Service Unavailable'}[status]
+    if not isinstance(body, bytes):
+        body = json.dumps(body).encode()
+    writer.write(
+        f"HTTP/1.1 {status} {reason}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n\r\n".encode() + body)
+    await writer.drain()
+
+async def handle_video_feed(writer, broadcaster):
+    # Streaming MJPEG, semua viewer kamera berbagi part yang sama dari broadcaster
+    writer.write(b"HTTP/1.1 200 OK\r\n"
+                 b"Content-Type: multipart/x-mixed-replace; boundary=frame\r\n"
+                 b"Cache-Control: no-cache\r\n"
+                 b"Connection: close\r\n\r\n")
+    async for part in broadcaster.stream():
+        writer.write(part)
+        # Viewer lambat menunggu di sini lalu lanjut dari frame terbaru
+        await writer.drain()
+
+def camera_not_found(cam_id):
+    return {'status': 'error', 'message': f'Kamera {cam_id} tidak ditemukan'}
+
+async def direction(headers, body):
+    # Terima perintah dari web (arah, delta dx/dy atau posisi x/y), koordinat dari balasan MaixCam
+    if headers.get('content-type', '').startswith('application/json'):
+        try:
+            data = json.loads(body or b'{}')
+        except ValueError:
+            data = {}
+    else:
+        data = {key: values[0] for key, values in parse_qs(body.decode()).items()}
+
+    try:
+        command = parse_web_command(data)
+    except ValueError as e:
+        return 400, {'status': 'error', 'message': str(e)}
+    if command is None:
+        return 400, {'status': 'error', 'message': 'No direction received'}
+
+    result = await asyncio.get_running_loop().run_in_executor(None, send_command_to_server, *command)
+    if result is None or result[0] == STATUS_ERROR:
+        return 503, {'status': 'error', 'message': 'MaixCam tidak membalas', 'coords': current_coords}
+    if not applied(result[0]):
+        return 409, {'status': 'error', 'message': f'Perintah tidak diterapkan MaixCam ({STATUS_NAMES[result[0]]})',
+                     'coords': current_coords}
+    current_coords.update(x=result[1], y=result[2])
+    return 200, {'status': 'ok', 'direction': data.get('direction'), 'coords': current_coords}
+
+async def handle_http(reader, writer):
+    try:
+        request_line = await reader.readline()
+        parts = request_line.decode('latin-1').split()
+        if len(parts) < 2:
+            return
+        method, path = parts[0], urlsplit(parts[1]).path
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        length = headers.get('content-length', '0')
+        if not length.isdigit() or int(length) > MAX_BODY:
+            await send_response(writer, 400, {'status': 'error', 'message': 'Invalid Content-Length'})
+            return
+        body = await reader.readexactly(int(length)) if int(length) else b''
+
+        if path == '/' and method == 'GET':
+            await send_response(writer, 200, render_index(), 'text/html; charset=utf-8')
+        elif path == '/video_feed' and method == 'GET':
+            await handle_video_feed(writer, broadcaster)
+        elif path == '/stats' and method == 'GET':
+            # Statistik kamera pertama (format sama dengan WebServer.py)
+            await send_response(writer, 200, streams.default.stats())
+        elif path.startswith(('/video_feed/', '/stats/')) and method == 'GET':
+            route, _, cam_id = path[1:].partition('/')
+            stream = streams.find(cam_id)
+            if stream is None:
+                await send_response(writer, 404, camera_not_found(cam_id))
+            elif route == 'video_feed':
+                await handle_video_feed(writer, stream.broadcaster)
+            else:
+                await send_response(writer, 200, stream.stats())
+        elif path == '/streams' and method == 'GET':
+            await send_response(writer, 200, streams.summary())
+        elif path == '/metrics' and method == 'GET':
+            await send_response(writer, 200, metrics.render().encode(), CONTENT_TYPE)
+        elif path == '/coords' and method == 'GET':
+            await send_response(writer, 200, current_coords)
+        elif path == '/direction':
+            if method != 'POST':
+                await send_response(writer, 405, {'status': 'error', 'message': 'Method not allowed'})
+            else:
+                status, result = await direction(headers, body)
+                await send_response(writer, status, result)
+        elif path.startswith('/static/') and method == 'GET':
+            filename = os.path.normpath(os.path.join(STATIC_DIR, path[len('/static/'):]))
+            if filename.startswith(STATIC_DIR + os.sep) and os.path.isfile(filename):
+                with open(filename, 'rb') as f:
+                    content = f.read()
+                content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+                await send_response(writer, 200, content, content_type)
+            else:
+                await send_response(writer, 404, {'status': 'error', 'message': 'Not found'})
+        else:
+            await send_response(writer, 404, {'status': 'error', 'message': 'Not found'})
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass  # Viewer menutup koneksi
+    finally:
+        writer.close()
+
+async def main(ip="0.0.0.0", video_port=9001, http_port=5000):
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(AsyncVideoReceiver, local_addr=(ip, video_port))
+    print(f"🚀 UDP receiver started on {ip}:{video_port}")
+    server = await asyncio.start_server(handle_http, "0.0.0.0", http_port)
+    print(f"🌐 Web server (asyncio) running at http://localhost:{http_port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        transport.close()
+
+if __name__ == '__main__':
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\n🛑 Server dihentikan")
@@ -4,13 +4,27 @@ Server penyiaran video UDP dan penerima perintah TCP dengan sinkronisasi koordin
 import socket
 import time
 import _thread as threading
-import json
 import gc
-from maix import camera, app
-import struct
+import argparse
+try:
+    from maix import app
+except ImportError:
+    app = None  # Dijalankan di PC biasa (sumber sintetis/replay)
+from command_channel import CommandServer
+from commands import (OP_NAMES, OP_QUERY, OP_TIME, STATUS_OK, CommandDeduper, apply_command,
+                      decode_request, encode_error_reply, encode_reply, encode_time_reply)
+from frame_sender import FrameSender
+from frame_sources import SOURCES, open_source
+from gc_policy import GcPolicy
+from jpeg_utils import ENCODER_BACKENDS, JpegEncoder
+from pacing import FramePacer
+from pipeline import FramePipeline
+from protocol import seq_next, timestamp_us
+from rate_control import AimdController
 
 class VideoStreamSender:
-    def __init__(self, server_ip="192.168.31", video_port=9001, command_port=9002): #Ganti IP sesuai server
+    def __init__(self, server_ip="192.168.31", video_port=9001, command_port=9002, #Ganti IP sesuai server
+                 source='auto', source_path=None, encoder='auto', stream_id=0):
         # Inisialisasi koordinat dengan thread lock
         self.coord_x = 0
         self.coord_y = 0
@@ -20,11 +34,13 @@ class VideoStreamSender:
         self.server_ip = server_ip
         self.video_port = video_port
         self.command_port = command_port
+        self.stream_id = stream_id  # Id kamera 1-255 jika beberapa MaixCam ke satu penerima (0 = pakai IP)
         
         # Status kontrol
         self.running = False
         self.udp_sock = None
-        self.tcp_sock = None
+        self.command_server = None
+        self.command_dedup = CommandDeduper()  # Balasan terakhir per klien untuk retry idempotent
         
         # Statistik
         self.frame_stats = {
@@ -34,12 +50,40 @@ class VideoStreamSender:
             'command_count': 0
         }
         
-        # Inisialisasi kamera
-        self.cam = camera.Camera(320, 240)  # Resolusi lebih rendah untuk FPS lebih tinggi
+        # Inisialisasi sumber frame (kamera MaixCam, sintetis atau replay, lihat frame_sources.py)
+        self.resolution = (320, 240)  # Resolusi lebih rendah untuk FPS lebih tinggi
+        self.source = open_source(source, *self.resolution, path=source_path)
+        self.encoder = JpegEncoder(encoder)
+        self.target_fps = 30
         
         # Pengaturan kompresi gambar
         self.jpeg_quality = 70  # Kualitas JPEG sedikit lebih tinggi untuk kualitas yang baik
         self.max_packet_size = 1400  # Ukuran paket mendekati MTU untuk efisiensi
+        self.fec_parity = 0  # Jumlah chunk parity FEC per frame (0 = nonaktif)
+        self.nack_deadline = 0.06  # Batas waktu (detik) retransmisi chunk yang di-NACK
+        self.frame_sender = None
+        # Pacing: sebar chunk setiap frame ke pacing_spread x interval frame (0 = nonaktif)
+        self.pacing_spread = 0.5
+        self.target_bitrate = 8000000  # bit/detik, laju minimum token bucket
+        
+        # Bitrate adaptif: kualitas, resolusi dan FPS diatur dari feedback penerima
+        self.adaptive_bitrate = True
+        self.rate_controller = AimdController(
+            quality=self.jpeg_quality, min_quality=30, max_quality=85,
+            resolutions=[(320, 240), (240, 180), (160, 120)],
+            fps=self.target_fps, min_fps=10, max_fps=30)
+        
+        # Pipeline: capture, encode dan kirim di thread terpisah (False = loop serial)
+        self.pipelined = True
+        self.encode_policy = 'latest'  # Kebijakan slot capture -> encode (lihat pipeline.py)
+        self.send_policy = 'latest'    # Kebijakan slot encode -> send
+        self.pipeline = None
+        self.frame_id = 0
+        self.next_capture = 0  # Waktu capture berikutnya sesuai target_fps
+        
+        # GC terkontrol: objek awal dibekukan, koleksi hanya saat idle (False = gc.collect() per frame)
+        self.controlled_gc = True
+        self.gc_policy = GcPolicy()
 
     def start(self):
         """Memulai semua komponen server"""
@@ -47,158 +91,204 @@ class VideoStreamSender:
         
         # Setup UDP untuk streaming video
         self.udp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        pacer = FramePacer(self.target_bitrate, self.pacing_spread) if self.pacing_spread else None
+        self.frame_sender = FrameSender(self.udp_sock, (self.server_ip, self.video_port),
+                                        chunk_size=self.max_packet_size,
+                                        fec_parity=self.fec_parity,
+                                        nack_deadline=self.nack_deadline,
+                                        on_feedback=self._on_feedback if self.adaptive_bitrate else None,
+                                        pacer=pacer,
+                                        stream_id=self.stream_id)
         
-        # Setup TCP untuk command server
-        self.tcp_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.tcp_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.tcp_sock.bind(("0.0.0.0", self.command_port))
-        self.tcp_sock.listen(1)
+        # Setup TCP untuk command server (koneksi persisten, beberapa klien sekaligus)
+        self.command_server = CommandServer(self.command_port, self._handle_command,
+                                            error_reply=self._command_error)
+        self.command_server.start()
         
-        # Mulai thread untuk TCP command server
-        threading.start_new_thread(self._tcp_command_listener, ())
+        # Mulai thread penerima NACK untuk retransmisi chunk
+        threading.start_new_thread(self.frame_sender.serve_feedback, ())
         
         print("📡 Streaming video UDP ke {}:{}".format(self.server_ip, self.video_port))
         print("🔄 Server perintah TCP di port", self.command_port)
-        print("⚙️  Kualitas JPEG: {}, Max Packet Size: {}".format(self.jpeg_quality, self.max_packet_size))
+        print("⚙️  Kualitas JPEG: {}, Max Packet Size: {}, FEC parity: {}".format(
+            self.jpeg_quality, self.max_packet_size, self.fec_parity))
+        print("🎚️  Bitrate adaptif: {}".format("aktif" if self.adaptive_bitrate else "nonaktif"))
+        print("⏱️  Pacing: {:.0%} interval frame, minimal {:.1f} Mbps".format(
+            self.pacing_spread, self.target_bitrate / 1000000))
+        
+        # Objek yang dibuat saat inisialisasi dibekukan, GC otomatis dimatikan
+        if self.controlled_gc:
+            self.gc_policy.start()
+            print("🧹 GC terkontrol aktif")
         
         # Mulai loop utama untuk streaming video
-        self._capture_and_send()
+        if self.pipelined:
+            self._run_pipeline()
+        else:
+            self._capture_and_send()
+
+    def _run_pipeline(self):
+        """Jalankan tahap capture, encode dan kirim bersamaan (frame N+1 di-capture saat frame N dikirim)"""
+        self.pipeline = FramePipeline(self._capture_stage, self._encode_stage, self._send_stage,
+                                      throttle=self._wait_next_capture,
+                                      encode_policy=self.encode_policy, send_policy=self.send_policy)
+        self.pipeline.start()
+        print("🧵 Pipeline capture/encode/send aktif")
+        while self.running and not self._need_exit():
+            time.sleep(0.1)
+        self.pipeline.stop()
 
     def _capture_and_send(self):
-        """Loop pengambilan dan pengiriman frame video"""
-        frame_id = 0
-        
-        while self.running and not app.need_exit():
+        """Loop serial: capture, encode dan kirim satu per satu di satu thread"""
+        while self.running and not self._need_exit():
             try:
-                start_time = time.time()
-                
-                # Ambil frame dari kamera
-                img = self.cam.read()
-                if not img:
-                    time.sleep(0.01)
+                self._wait_next_capture()
+                item = self._capture_stage()
+                if item is None:
                     continue
-                
-                # Encode frame ke JPEG
-                if hasattr(img, "to_jpeg"):
-                    img_bytes = img.to_jpeg(quality=self.jpeg_quality)
-                elif hasattr(img, "encode"):
-                    img_bytes = img.encode(".jpg", quality=self.jpeg_quality)
-                else:
-                    # Jika tidak ada metode encoding, coba resize dulu
-                    if hasattr(img, "resize"):
-                        small_img = img.resize((320, 240))
-                        img_bytes = small_img.to_jpeg(quality=self.jpeg_quality)
-                    else:
-                        continue
-                
-                # Konversi ke bytes jika perlu
-                if hasattr(img_bytes, "to_bytes"):
-                    img_bytes = img_bytes.to_bytes()
-                
-                # Update statistik frame
-                with self.coord_lock:
-                    self.frame_stats['total_frames'] += 1
-                    current_time = time.time()
-                    elapsed = current_time - self.frame_stats['last_time']
-                    
-                    if elapsed >= 1.0:
-                        self.frame_stats['fps'] = self.frame_stats['total_frames'] / elapsed
-                        self.frame_stats['total_frames'] = 0
-                        self.frame_stats['last_time'] = current_time
-                        print("FPS: {:.1f}, Ukuran Frame: {} bytes".format(
-                            self.frame_stats['fps'], len(img_bytes)))
-
-                # Kirim frame dalam chunks
-                chunk_size = self.max_packet_size
-                chunks = [img_bytes[i:i+chunk_size] for i in range(0, len(img_bytes), chunk_size)]
-                
-                # Kirim metadata (frame_id, jumlah chunks)
-                metadata = json.dumps({
-                    'frame_id': frame_id,
-                    'num_chunks': len(chunks),
-                    'total_size': len(img_bytes)
-                }).encode()
-                
-                try:
-                    # Kirim metadata
-                    self.udp_sock.sendto(metadata, (self.server_ip, self.video_port))
-                    
-                    # Kirim setiap chunk dengan header (frame_id + chunk_number)
-                    for i, chunk in enumerate(chunks):
-                        header = struct.pack('>IH', frame_id, i)  # 4-byte frame ID + 2-byte chunk number
-                        chunk_with_header = header + chunk
-                        self.udp_sock.sendto(chunk_with_header, (self.server_ip, self.video_port))
-                        
-                except Exception as e:
-                    print("⚠️ Gagal mengirim video:", str(e))
-                
-                frame_id = (frame_id + 1) % 10000
-                
-                # Kontrol frame rate untuk mencapai ~30 FPS
-                processing_time = time.time() - start_time
-                sleep_time = max(0, 1/30 - processing_time)  # Target 30 FPS
-                time.sleep(sleep_time)
-                
-                # Bersihkan memori
-                gc.collect()
-
+                encoded = self._encode_stage(item)
+                if encoded is not None:
+                    self._send_stage(encoded)
             except Exception as e:
                 print("⚠️ Error pengambilan frame:", str(e))
                 time.sleep(0.01)
 
-    def _tcp_command_listener(self):
-        """Server TCP untuk menerima perintah kontrol"""
-        print("🖥️ Server perintah TCP siap di port", self.command_port)
+    def _need_exit(self):
+        return app is not None and app.need_exit()
+
+    def _wait_next_capture(self):
+        """Kontrol frame rate sesuai target_fps (diatur kontrol bitrate)"""
+        delay = self.next_capture - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        self.next_capture = max(self.next_capture + 1.0 / self.target_fps, time.time())
+
+    def _capture_stage(self):
+        """Ambil satu frame dari sumber frame, return (img, capture_ts) atau None"""
+        # Ganti resolusi kamera jika diminta oleh kontrol bitrate
+        if self.adaptive_bitrate and self.rate_controller.resolution != self.resolution:
+            self.resolution = self.rate_controller.resolution
+            self.source.set_resolution(*self.resolution)
         
-        while self.running:
-            try:
-                conn, addr = self.tcp_sock.accept()
-                conn.settimeout(0.5)  # Timeout lebih pendek
-                print("📩 Koneksi dari:", addr)
-                
-                data = conn.recv(1024)
-                if data:
-                    try:
-                        command = data.decode().strip()
-                        
-                        # Handle perintah gerakan
-                        if command in ["RIGHT", "LEFT", "UP", "DOWN"]:
-                            with self.coord_lock:
-                                # Update koordinat
-                                if command == "RIGHT": self.coord_x += 1
-                                elif command == "LEFT": self.coord_x -= 1
-                                elif command == "UP": self.coord_y += 1
-                                elif command == "DOWN": self.coord_y -= 1
-                                
-                                # Kirim respon dengan koordinat terbaru
-                                response = f"{self.coord_x},{self.coord_y}"
-                                conn.send(response.encode())
-                                
-                                self.frame_stats['command_count'] += 1
-                                print("📩 Perintah {} diterima. Koordinat: ({}, {})".format(
-                                    command, self.coord_x, self.coord_y))
-                        
-                    except Exception as e:
-                        conn.send(b"ERROR")
-                
-                conn.close()
-                        
-            except Exception as e:
-                if "timed out" not in str(e):
-                    print("⚠️ Error koneksi TCP:", str(e))
-                time.sleep(0.01)
+        img = self.source.read()
+        if img is None:
+            time.sleep(0.01)
+            return None
+        return img, timestamp_us()
+
+    def _encode_stage(self, item):
+        """Encode frame ke JPEG, return (img_bytes, capture_ts) atau None"""
+        img, capture_ts = item
+        img_bytes = self.encoder.encode(img, self.jpeg_quality)
+        return img_bytes, capture_ts
+
+    def _send_stage(self, item):
+        """Kirim frame dalam chunks, setiap chunk membawa header lengkap"""
+        img_bytes, capture_ts = item
+        
+        # Update statistik frame
+        with self.coord_lock:
+            self.frame_stats['total_frames'] += 1
+            current_time = time.time()
+            elapsed = current_time - self.frame_stats['last_time']
+            
+            if elapsed >= 1.0:
+                self.frame_stats['fps'] = self.frame_stats['total_frames'] / elapsed
+                self.frame_stats['total_frames'] = 0
+                self.frame_stats['last_time'] = current_time
+                print("FPS: {:.1f}, Ukuran Frame: {} bytes, Retransmit: {}, Laju: {:.2f} Mbps".format(
+                    self.frame_stats['fps'], len(img_bytes),
+                    self.frame_sender.stats['retransmitted'],
+                    self.frame_sender.stats['send_rate'] / 1000000))
+                if self.controlled_gc:
+                    print("   GC: {collections} koleksi, jeda terakhir {last_ms:.2f} ms, "
+                          "maks {max_ms:.2f} ms, total {total_ms:.1f} ms".format(**self.gc_policy.report()))
+                if self.pipeline:
+                    print("   Tahap (ms) capture {capture_ms:.1f}, encode {encode_ms:.1f}, send {send_ms:.1f}, "
+                          "drop encode {dropped_encode}, drop send {dropped_send}".format(**self.pipeline.stats()))
+
+        try:
+            self.frame_sender.send_frame(self.frame_id, img_bytes, capture_ts,
+                                         frame_interval=1.0 / self.target_fps)
+        except Exception as e:
+            print("⚠️ Gagal mengirim video:", str(e))
+        
+        # frame_id diberikan saat kirim, frame yang di-drop pipeline tidak membuat celah
+        self.frame_id = seq_next(self.frame_id)
+        
+        # Bersihkan memori: saat idle sebelum capture berikutnya, atau cara lama per frame
+        if self.controlled_gc:
+            self.gc_policy.after_frame(self.next_capture - time.time())
+        else:
+            gc.collect()
+
+    def _on_feedback(self, feedback):
+        """Terima laporan link dari penerima (thread feedback), atur ulang bitrate"""
+        if self.rate_controller.on_feedback(feedback, time.time()):
+            self.jpeg_quality = self.rate_controller.quality
+            self.target_fps = self.rate_controller.fps
+            print("🎚️  Loss {:.1%}, jitter {:.0f} ms -> Kualitas {}, Resolusi {}x{}, FPS {}".format(
+                feedback.loss, feedback.jitter * 1000, self.jpeg_quality,
+                self.rate_controller.resolution[0], self.rate_controller.resolution[1],
+                self.target_fps))
+
+    def _command_error(self, body):
+        """Balasan STATUS_ERROR (dengan posisi saat ini) untuk perintah yang gagal diproses"""
+        return encode_error_reply(body, self.coord_x, self.coord_y)
+
+    def _handle_command(self, body):
+        """Proses satu perintah biner (commands.py) dari kanal TCP, return body balasan"""
+        op, client_id, seq, a, b = decode_request(body)
+        if op == OP_TIME:
+            # Sinkronisasi jam penerima: tidak mengubah state, tanpa dedup
+            return encode_time_reply(client_id, seq, timestamp_us())
+
+        with self.coord_lock:
+            # Retry dengan seq yang sama tidak diterapkan dua kali
+            reply = self.command_dedup.lookup(client_id, seq, self.coord_x, self.coord_y)
+            if reply is not None:
+                return reply
+
+            self.coord_x, self.coord_y = apply_command(op, a, b, self.coord_x, self.coord_y)
+            reply = encode_reply(STATUS_OK, client_id, seq, self.coord_x, self.coord_y)
+            self.command_dedup.store(client_id, seq, reply)
+            self.frame_stats['command_count'] += 1
+            if op != OP_QUERY:
+                print("📩 Perintah {} {} {} diterima. Koordinat: ({}, {})".format(
+                    OP_NAMES[op], a, b, self.coord_x, self.coord_y))
+        return reply
 
     def stop(self):
         """Menghentikan semua komponen server"""
         self.running = False
+        if self.pipeline:
+            self.pipeline.stop()
+        self.gc_policy.stop()
+        if self.frame_sender:
+            self.frame_sender.stop()
         if self.udp_sock:
             self.udp_sock.close()
-        if self.tcp_sock:
-            self.tcp_sock.close()
+        if self.command_server:
+            self.command_server.stop()
+        self.source.close()
         print("🛑 Server dihentikan")
 
 if __name__ == '__main__':
-    sender = VideoStreamSender()
+    # Di MaixCam cukup `python Maixcam.py`; di PC misal:
+    # python Maixcam.py --server-ip 127.0.0.1 --source synthetic
+    parser = argparse.ArgumentParser(description="Pengirim video UDP MaixCam")
+    parser.add_argument('--server-ip', default="192.168.31")
+    parser.add_argument('--source', choices=SOURCES, default='auto')
+    parser.add_argument('--source-path', help="Folder gambar atau file video untuk --source replay")
+    parser.add_argument('--encoder', choices=ENCODER_BACKENDS, default='auto')
+    parser.add_argument('--video-port', type=int, default=9001)
+    parser.add_argument('--command-port', type=int, default=9002)
+    parser.add_argument('--stream-id', type=int, default=0, choices=range(256), metavar='0-255',
+                        help="Id kamera di header, untuk beberapa MaixCam ke satu penerima")
+    args = parser.parse_args()
+    sender = VideoStreamSender(args.server_ip, args.video_port, args.command_port, source=args.source,
+                               source_path=args.source_path, encoder=args.encoder,
+                               stream_id=args.stream_id)
     try:
         sender.start()
     except Exception as e:
@@ -4,13 +4,32 @@ Server penyiaran video UDP dan penerima perintah TCP dengan sinkronisasi koordin
 import socket
 import time
 import _thread as threading
-import json
 import gc
-from maix import camera, display, image
-import struct
+import os
+import sys
+import argparse
+try:
+    from maix import display, image
+except ImportError:
+    display = image = None  # Dijalankan di PC biasa (sumber sintetis/replay)
+
+# Modul bersama (protocol, dll.) ada di folder induk
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from command_channel import CommandServer
+from commands import (OP_NAMES, OP_QUERY, OP_TIME, STATUS_OK, CommandDeduper, apply_command,
+                      decode_request, encode_error_reply, encode_reply, encode_time_reply)
+from frame_sender import FrameSender
+from frame_sources import SOURCES, open_source, test_pattern
+from gc_policy import GcPolicy
+from jpeg_utils import ENCODER_BACKENDS, JpegEncoder
+from pacing import FramePacer
+from pipeline import FramePipeline
+from protocol import FLAG_TEST_PATTERN, seq_next, timestamp_us
+from rate_control import AimdController
 
 class VideoStreamSender:
-    def __init__(self, server_ip="192.168.31", video_port=9001, command_port=9002): #Ganti IP sesuai PC
+    def __init__(self, server_ip="192.168.31", video_port=9001, command_port=9002, #Ganti IP sesuai PC
+                 source='auto', source_path=None, encoder='auto'):
         # Inisialisasi koordinat dengan thread lock
         self.coord_x = 0
         self.coord_y = 0
@@ -24,7 +43,8 @@ class VideoStreamSender:
         # Status kontrol
         self.running = False
         self.udp_sock = None
-        self.tcp_sock = None
+        self.command_server = None
+        self.command_dedup = CommandDeduper()  # Balasan terakhir per klien untuk retry idempotent
         
         # Statistik
         self.frame_stats = {
@@ -35,26 +55,53 @@ class VideoStreamSender:
             'camera_errors': 0
         }
         
-        # Inisialisasi kamera dan display
+        # Inisialisasi sumber frame (kamera MaixCam, sintetis atau replay) dan display
+        # Gunakan resolusi yang lebih rendah untuk FPS lebih tinggi
+        self.resolution = (240, 180)  # Mengurangi resolusi dari 320x240
         try:
-            # Gunakan resolusi yang lebih rendah untuk FPS lebih tinggi
-            self.cam = camera.Camera(240, 180)  # Mengurangi resolusi dari 320x240
-            self.disp = display.Display()
-            print("✅ Kamera dan display berhasil diinisialisasi")
+            self.source = open_source(source, *self.resolution, path=source_path)
+            self.disp = display.Display() if display is not None else None
+            print("✅ Sumber frame dan display berhasil diinisialisasi")
         except Exception as e:
-            print("❌ Gagal inisialisasi kamera/display:", str(e))
-            self.cam = None
+            print("❌ Gagal inisialisasi sumber frame/display:", str(e))
+            self.source = None
             self.disp = None
+        self.encoder = JpegEncoder(encoder)
         
         # Pengaturan kompresi gambar - dikurangi untuk performa lebih baik
         self.jpeg_quality = 40  # Mengurangi kualitas untuk FPS lebih tinggi
         self.max_packet_size = 1200  # Ukuran paket mendekati MTU
+        self.fec_parity = 0  # Jumlah chunk parity FEC per frame (0 = nonaktif)
+        self.nack_deadline = 0.06  # Batas waktu (detik) retransmisi chunk yang di-NACK
+        self.frame_sender = None
+        # Pacing: sebar chunk setiap frame ke pacing_spread x interval frame (0 = nonaktif)
+        self.pacing_spread = 0.5
+        self.target_bitrate = 4000000  # bit/detik, laju minimum token bucket
         self.target_fps = 30  # Target FPS yang lebih tinggi
+        
+        # Bitrate adaptif: kualitas, resolusi dan FPS diatur dari feedback penerima
+        self.adaptive_bitrate = True
+        self.rate_controller = AimdController(
+            quality=self.jpeg_quality, min_quality=20, max_quality=60,
+            resolutions=[(240, 180), (160, 120)],
+            fps=self.target_fps, min_fps=10, max_fps=30)
+        
+        # Pipeline: capture, encode dan kirim di thread terpisah (False = loop serial)
+        self.pipelined = True
+        self.encode_policy = 'latest'  # Kebijakan slot capture -> encode (lihat pipeline.py)
+        self.send_policy = 'latest'    # Kebijakan slot encode -> send
+        self.pipeline = None
+        self.frame_id = 0
+        self.next_capture = 0  # Waktu capture berikutnya sesuai target_fps
+        
+        # GC terkontrol: objek awal dibekukan, koleksi hanya saat idle (False = gc.collect() per frame)
+        self.controlled_gc = True
+        self.gc_policy = GcPolicy()
 
     def start(self):
         """Memulai semua komponen server"""
-        if self.cam is None:
-            print("❌ Tidak dapat memulai: Kamera tidak tersedia")
+        if self.source is None:
+            print("❌ Tidak dapat memulai: Sumber frame tidak tersedia")
             return
             
         self.running = True
@@ -62,37 +109,56 @@ class VideoStreamSender:
         # Setup UDP untuk streaming video
         try:
             self.udp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            pacer = FramePacer(self.target_bitrate, self.pacing_spread) if self.pacing_spread else None
+            self.frame_sender = FrameSender(self.udp_sock, (self.server_ip, self.video_port),
+                                            chunk_size=self.max_packet_size,
+                                            fec_parity=self.fec_parity,
+                                            nack_deadline=self.nack_deadline,
+                                            on_feedback=self._on_feedback if self.adaptive_bitrate else None,
+                                            pacer=pacer)
             print("✅ Socket UDP berhasil dibuat")
         except Exception as e:
             print("❌ Gagal membuat socket UDP:", str(e))
             return
         
-        # Setup TCP untuk command server
+        # Setup TCP untuk command server (koneksi persisten, beberapa klien sekaligus)
         try:
-            self.tcp_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.tcp_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            self.tcp_sock.bind(("0.0.0.0", self.command_port))
-            self.tcp_sock.listen(1)
-            self.tcp_sock.settimeout(0.1)  # Timeout lebih pendek
+            self.command_server = CommandServer(self.command_port, self._handle_command,
+                                                error_reply=self._command_error)
+            self.command_server.start()
             print("✅ Socket TCP berhasil dibuat")
         except Exception as e:
             print("❌ Gagal membuat socket TCP:", str(e))
             self.udp_sock.close()
             return
         
-        # Mulai thread untuk TCP command server
-        threading.start_new_thread(self._tcp_command_listener, ())
+        # Mulai thread penerima NACK untuk retransmisi chunk
+        threading.start_new_thread(self.frame_sender.serve_feedback, ())
         
         print("📡 Streaming video UDP ke {}:{}".format(self.server_ip, self.video_port))
         print("🔄 Server perintah TCP di port", self.command_port)
-        print("⚙️  Kualitas JPEG: {}, Max Packet Size: {}".format(self.jpeg_quality, self.max_packet_size))
+        print("⚙️  Kualitas JPEG: {}, Max Packet Size: {}, FEC parity: {}".format(
+            self.jpeg_quality, self.max_packet_size, self.fec_parity))
         print("🎯 Target FPS: {}".format(self.target_fps))
+        print("🎚️  Bitrate adaptif: {}".format("aktif" if self.adaptive_bitrate else "nonaktif"))
+        print("⏱️  Pacing: {:.0%} interval frame, minimal {:.1f} Mbps".format(
+            self.pacing_spread, self.target_bitrate / 1000000))
+        
+        # Objek yang dibuat saat inisialisasi dibekukan, GC otomatis dimatikan
+        if self.controlled_gc:
+            self.gc_policy.start()
+            print("🧹 GC terkontrol aktif")
         
         # Mulai loop utama untuk streaming video
-        self._capture_and_send()
+        if self.pipelined:
+            self._run_pipeline()
+        else:
+            self._capture_and_send()
 
     def _generate_test_pattern(self, width=240, height=180):
         """Generate test pattern jika kamera error"""
+        if image is None:
+            return test_pattern(width, height)
         img = image.Image(width, height, image.RGB)
         img.draw_rectangle(0, 0, width, height, color=(0, 0, 0), thickness=-1)
         
@@ -104,174 +170,200 @@ class VideoStreamSender:
         
         return img
 
+    def _run_pipeline(self):
+        """Jalankan tahap capture, encode dan kirim bersamaan (frame N+1 di-capture saat frame N dikirim)"""
+        self.pipeline = FramePipeline(self._capture_stage, self._encode_stage, self._send_stage,
+                                      throttle=self._wait_next_capture,
+                                      encode_policy=self.encode_policy, send_policy=self.send_policy)
+        self.pipeline.start()
+        print("🧵 Pipeline capture/encode/send aktif")
+        while self.running:
+            time.sleep(0.1)
+
     def _capture_and_send(self):
-        """Loop pengambilan dan pengiriman frame video"""
-        frame_id = 0
-        frame_interval = 1.0 / self.target_fps
-        
+        """Loop serial: capture, encode dan kirim satu per satu di satu thread"""
         while self.running:
             try:
-                start_time = time.time()
-                
-                # Ambil frame dari kamera atau generate test pattern
-                if self.cam:
-                    img = self.cam.read()
-                    if not img:
-                        self.frame_stats['camera_errors'] += 1
-                        if self.frame_stats['camera_errors'] % 20 == 0:
-                            print("⚠️ Gagal membaca frame dari kamera (error #{})".format(
-                                self.frame_stats['camera_errors']))
-                        img = self._generate_test_pattern()
-                else:
-                    img = self._generate_test_pattern()
-                
-                # Reset error counter jika berhasil
-                if self.cam and img:
-                    self.frame_stats['camera_errors'] = 0
-                
-                # Tambahkan overlay koordinat pada frame (opsional, bisa di-disable)
-                try:
-                    # Hanya update overlay setiap beberapa frame untuk menghemat waktu
-                    if self.frame_stats['total_frames'] % 5 == 0:
-                        with self.coord_lock:
-                            img.draw_string(5, 5, "X:{} Y:{}".format(self.coord_x, self.coord_y), 
-                                           scale=0.6, color=(0, 255, 0), thickness=1)
-                except:
-                    pass  # Skip jika gagal draw
-                
-                # Tampilkan preview di display MaixCam (opsional, bisa di-disable)
-                if self.disp and self.frame_stats['total_frames'] % 3 == 0:
-                    try:
-                        self.disp.show(img)
-                    except:
-                        pass
-                
-                # Encode frame ke JPEG
-                try:
-                    img_bytes = img.to_jpeg(quality=self.jpeg_quality)
-                    if hasattr(img_bytes, "to_bytes"):
-                        img_bytes = img_bytes.to_bytes()
-                except Exception as e:
-                    print("⚠️ Gagal encode JPEG:", str(e))
-                    time.sleep(0.05)
+                self._wait_next_capture()
+                item = self._capture_stage()
+                if item is None:
                     continue
-                
-                # Update statistik frame
-                with self.coord_lock:
-                    self.frame_stats['total_frames'] += 1
-                    current_time = time.time()
-                    elapsed = current_time - self.frame_stats['last_time']
-                    
-                    if elapsed >= 1.0:  # Update setiap 1 detik untuk statistik lebih akurat
-                        self.frame_stats['fps'] = self.frame_stats['total_frames'] / elapsed
-                        self.frame_stats['total_frames'] = 0
-                        self.frame_stats['last_time'] = current_time
-                        status = "LIVE" if self.cam and self.frame_stats['camera_errors'] == 0 else "TEST"
-                        print("FPS: {:.1f}, Status: {}, Frame: {} bytes".format(
-                            self.frame_stats['fps'], status, len(img_bytes)))
-
-                # Kirim frame dalam chunks
-                chunk_size = self.max_packet_size
-                chunks = []
-                for i in range(0, len(img_bytes), chunk_size):
-                    chunks.append(img_bytes[i:i+chunk_size])
-                
-                try:
-                    # Kirim metadata (frame_id, jumlah chunks)
-                    metadata = struct.pack('>II', frame_id, len(chunks))
-                    self.udp_sock.sendto(metadata, (self.server_ip, self.video_port))
-                    
-                    # Kirim setiap chunk dengan header
-                    for i, chunk in enumerate(chunks):
-                        header = struct.pack('>IH', frame_id, i)
-                        self.udp_sock.sendto(header + chunk, (self.server_ip, self.video_port))
-                        
-                except Exception as e:
-                    print("⚠️ Gagal mengirim video:", str(e))
-                
-                frame_id = (frame_id + 1) % 10000
-                
-                # Kontrol frame rate yang lebih presisi
-                processing_time = time.time() - start_time
-                sleep_time = max(0, frame_interval - processing_time)
-                if sleep_time > 0:
-                    time.sleep(sleep_time)
-                
-                # Bersihkan memori secara periodik
-                if frame_id % 30 == 0:
-                    gc.collect()
-
+                encoded = self._encode_stage(item)
+                if encoded is not None:
+                    self._send_stage(encoded)
             except Exception as e:
                 print("⚠️ Error pengambilan frame:", str(e))
                 time.sleep(0.05)
 
-    def _tcp_command_listener(self):
-        """Server TCP untuk menerima perintah kontrol"""
-        print("🖥️ Server perintah TCP siap di port", self.command_port)
+    def _wait_next_capture(self):
+        """Kontrol frame rate sesuai target_fps (diatur kontrol bitrate)"""
+        delay = self.next_capture - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        self.next_capture = max(self.next_capture + 1.0 / self.target_fps, time.time())
+
+    def _capture_stage(self):
+        """Ambil frame dari sumber frame atau test pattern, return (img, capture_ts, flags)"""
+        # Ganti resolusi kamera jika diminta oleh kontrol bitrate
+        if (self.source and self.adaptive_bitrate
+                and self.rate_controller.resolution != self.resolution):
+            self.resolution = self.rate_controller.resolution
+            self.source.set_resolution(*self.resolution)
         
-        while self.running:
+        # Ambil frame dari sumber frame atau generate test pattern
+        status_test = False
+        if self.source:
+            img = self.source.read()
+            if img is None:
+                self.frame_stats['camera_errors'] += 1
+                if self.frame_stats['camera_errors'] % 20 == 0:
+                    print("⚠️ Gagal membaca frame dari kamera (error #{})".format(
+                        self.frame_stats['camera_errors']))
+                img = self._generate_test_pattern(*self.resolution)
+                status_test = True
+        else:
+            img = self._generate_test_pattern(*self.resolution)
+            status_test = True
+        capture_ts = timestamp_us()
+        
+        # Reset error counter jika berhasil
+        if self.source and not status_test:
+            self.frame_stats['camera_errors'] = 0
+        
+        # Tambahkan overlay koordinat pada frame (opsional, bisa di-disable)
+        try:
+            # Hanya update overlay setiap beberapa frame untuk menghemat waktu
+            if self.frame_stats['total_frames'] % 5 == 0:
+                with self.coord_lock:
+                    img.draw_string(5, 5, "X:{} Y:{}".format(self.coord_x, self.coord_y), 
+                                   scale=0.6, color=(0, 255, 0), thickness=1)
+        except:
+            pass  # Skip jika gagal draw
+        
+        # Tampilkan preview di display MaixCam (opsional, bisa di-disable)
+        if self.disp and self.frame_stats['total_frames'] % 3 == 0:
             try:
-                conn, addr = self.tcp_sock.accept()
-                conn.settimeout(0.1)  # Timeout lebih pendek untuk koneksi
-                print("📩 Koneksi dari:", addr)
-                
-                data = conn.recv(64)  # Buffer lebih kecil untuk perintah sederhana
-                if data:
-                    try:
-                        command_str = data.decode().strip()
-                        
-                        # Handle perintah sederhana dengan respon cepat
-                        with self.coord_lock:
-                            if command_str == "RIGHT": 
-                                self.coord_x += 1
-                                response = "{},{}".format(self.coord_x, self.coord_y)
-                            elif command_str == "LEFT": 
-                                self.coord_x -= 1
-                                response = "{},{}".format(self.coord_x, self.coord_y)
-                            elif command_str == "UP": 
-                                self.coord_y += 1
-                                response = "{},{}".format(self.coord_x, self.coord_y)
-                            elif command_str == "DOWN": 
-                                self.coord_y -= 1
-                                response = "{},{}".format(self.coord_x, self.coord_y)
-                            else:
-                                response = "ERROR"
-                            
-                            conn.send(response.encode())
-                            
-                            self.frame_stats['command_count'] += 1
-                            if response != "ERROR":
-                                print("📩 Perintah {} diterima. Koordinat: ({}, {})".format(
-                                    command_str, self.coord_x, self.coord_y))
-                        
-                    except Exception as e:
-                        print("⚠️ Error parsing perintah:", str(e))
-                        try:
-                            conn.send(b"ERROR")
-                        except:
-                            pass
-                
-                conn.close()
-                        
-            except socket.timeout:
-                continue
-            except Exception as e:
-                if "timed out" not in str(e) and "accept" not in str(e):
-                    print("⚠️ Error koneksi TCP:", str(e))
-                time.sleep(0.05)
+                self.disp.show(img)
+            except:
+                pass
+        
+        return img, capture_ts, FLAG_TEST_PATTERN if status_test else 0
+
+    def _encode_stage(self, item):
+        """Encode frame ke JPEG, return (img_bytes, capture_ts, flags) atau None"""
+        img, capture_ts, flags = item
+        try:
+            img_bytes = self.encoder.encode(img, self.jpeg_quality)
+        except Exception as e:
+            print("⚠️ Gagal encode JPEG:", str(e))
+            time.sleep(0.05)
+            return None
+        return img_bytes, capture_ts, flags
+
+    def _send_stage(self, item):
+        """Kirim frame dalam chunks, setiap chunk membawa header lengkap"""
+        img_bytes, capture_ts, flags = item
+        
+        # Update statistik frame
+        with self.coord_lock:
+            self.frame_stats['total_frames'] += 1
+            current_time = time.time()
+            elapsed = current_time - self.frame_stats['last_time']
+            
+            if elapsed >= 1.0:  # Update setiap 1 detik untuk statistik lebih akurat
+                self.frame_stats['fps'] = self.frame_stats['total_frames'] / elapsed
+                self.frame_stats['total_frames'] = 0
+                self.frame_stats['last_time'] = current_time
+                status = "LIVE" if self.source and self.frame_stats['camera_errors'] == 0 else "TEST"
+                print("FPS: {:.1f}, Status: {}, Frame: {} bytes, Laju: {:.2f} Mbps".format(
+                    self.frame_stats['fps'], status, len(img_bytes),
+                    self.frame_sender.stats['send_rate'] / 1000000))
+                if self.controlled_gc:
+                    print("   GC: {collections} koleksi, jeda terakhir {last_ms:.2f} ms, "
+                          "maks {max_ms:.2f} ms, total {total_ms:.1f} ms".format(**self.gc_policy.report()))
+                if self.pipeline:
+                    print("   Tahap (ms) capture {capture_ms:.1f}, encode {encode_ms:.1f}, send {send_ms:.1f}, "
+                          "drop encode {dropped_encode}, drop send {dropped_send}".format(**self.pipeline.stats()))
+
+        try:
+            self.frame_sender.send_frame(self.frame_id, img_bytes, capture_ts, flags,
+                                         frame_interval=1.0 / self.target_fps)
+        except Exception as e:
+            print("⚠️ Gagal mengirim video:", str(e))
+        
+        # frame_id diberikan saat kirim, frame yang di-drop pipeline tidak membuat celah
+        self.frame_id = seq_next(self.frame_id)
+        
+        # Bersihkan memori: saat idle sebelum capture berikutnya, atau cara lama setiap 30 frame
+        if self.controlled_gc:
+            self.gc_policy.after_frame(self.next_capture - time.time())
+        elif self.frame_id % 30 == 0:
+            gc.collect()
+
+    def _on_feedback(self, feedback):
+        """Terima laporan link dari penerima (thread feedback), atur ulang bitrate"""
+        if self.rate_controller.on_feedback(feedback, time.time()):
+            self.jpeg_quality = self.rate_controller.quality
+            self.target_fps = self.rate_controller.fps
+            print("🎚️  Loss {:.1%}, jitter {:.0f} ms -> Kualitas {}, Resolusi {}x{}, FPS {}".format(
+                feedback.loss, feedback.jitter * 1000, self.jpeg_quality,
+                self.rate_controller.resolution[0], self.rate_controller.resolution[1],
+                self.target_fps))
+
+    def _command_error(self, body):
+        """Balasan STATUS_ERROR (dengan posisi saat ini) untuk perintah yang gagal diproses"""
+        return encode_error_reply(body, self.coord_x, self.coord_y)
+
+    def _handle_command(self, body):
+        """Proses satu perintah biner (commands.py) dari kanal TCP, return body balasan"""
+        op, client_id, seq, a, b = decode_request(body)
+        if op == OP_TIME:
+            # Sinkronisasi jam penerima: tidak mengubah state, tanpa dedup
+            return encode_time_reply(client_id, seq, timestamp_us())
+
+        with self.coord_lock:
+            # Retry dengan seq yang sama tidak diterapkan dua kali
+            reply = self.command_dedup.lookup(client_id, seq, self.coord_x, self.coord_y)
+            if reply is not None:
+                return reply
+
+            self.coord_x, self.coord_y = apply_command(op, a, b, self.coord_x, self.coord_y)
+            reply = encode_reply(STATUS_OK, client_id, seq, self.coord_x, self.coord_y)
+            self.command_dedup.store(client_id, seq, reply)
+            self.frame_stats['command_count'] += 1
+            if op != OP_QUERY:
+                print("📩 Perintah {} {} {} diterima. Koordinat: ({}, {})".format(
+                    OP_NAMES[op], a, b, self.coord_x, self.coord_y))
+        return reply
 
     def stop(self):
         """Menghentikan semua komponen server"""
         self.running = False
+        if self.pipeline:
+            self.pipeline.stop()
+        self.gc_policy.stop()
+        if self.frame_sender:
+            self.frame_sender.stop()
         if self.udp_sock:
             self.udp_sock.close()
-        if self.tcp_sock:
-            self.tcp_sock.close()
+        if self.command_server:
+            self.command_server.stop()
+        if self.source:
+            self.source.close()
         print("🛑 Server dihentikan")
 
 # Main execution
 if __name__ == '__main__':
-    sender = VideoStreamSender()
+    # Di MaixCam cukup `python Maixcam.py`; di PC misal:
+    # python Peer2Peer/Maixcam.py --server-ip 127.0.0.1 --source replay --source-path video.mp4
+    parser = argparse.ArgumentParser(description="Pengirim video UDP MaixCam (P2P)")
+    parser.add_argument('--server-ip', default="192.168.31")
+    parser.add_argument('--source', choices=SOURCES, default='auto')
+    parser.add_argument('--source-path', help="Folder gambar atau file video untuk --source replay")
+    parser.add_argument('--encoder', choices=ENCODER_BACKENDS, default='auto')
+    args = parser.parse_args()
+    sender = VideoStreamSender(args.server_ip, source=args.source, source_path=args.source_path,
+                               encoder=args.encoder)
     
     try:
         print("🚀 Starting MaixCam Video Stream Server...")
@@ -1,5 +1,8 @@
 """
-Aplikasi GUI untuk kontrol robot P2P dengan sinkronisasi koordinat
+Aplikasi GUI untuk kontrol robot P2P dengan sinkronisasi koordinat.
+Frame hasil decode ditulis penerima ke FrameRing di shared memory
+(frame_ring.py, nama maixcam_pc_<port>_<n>); GUI dan proses lain membaca
+frame terbaru dari ring tanpa salinan, dijaga seqlock per slot.
 """
 import sys
 import socket
@@ -7,13 +10,23 @@ import threading
 import cv2
 import numpy as np
 import time
-import json
 import struct
+import os
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QLabel, 
                              QPushButton, QVBoxLayout, QHBoxLayout, QGridLayout)
 from PyQt5.QtGui import QImage, QPixmap, QPainter, QPen, QColor, QBrush
 from PyQt5.QtCore import QTimer, Qt
 
+# Modul bersama (reassembly, dll.) ada di folder induk
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from command_channel import CommandClient
+from commands import DIRECTIONS, STATUS_NAMES, CommandSession, MoveCoalescer, applied
+from frame_ring import FrameRing
+from latency import ClockSync, LatencyTracker
+from protocol import HEADER_SIZE, pack_nack, parse_header
+from rate_control import LinkMonitor
+from reassembly import FrameReassembler
+
 class VideoReceiver:
     def __init__(self, ip="0.0.0.0", port=9001):
         self.ip = ip
@@ -21,7 +34,12 @@ class VideoReceiver:
         self.running = False
         self.sock = None
         self.frame_stats = {'last_time': time.time(), 'fps': 0, 'total_frames': 0}
-        self.current_frame = None
+        self.ring = None  # FrameRing frame BGR, dibuat saat frame pertama (ukuran slot = ukuran frame)
+        self.ring_slots = 4
+        self.retired_rings = []  # Ring lama setelah resolusi naik, ditutup saat stop()
+        self.latency = LatencyTracker()  # Frame dianggap tayang saat digambar di GUI
+        self.nack_enabled = True  # Minta ulang chunk yang hilang ke MaixCam (NACK)
+        self.feedback_enabled = True  # Kirim laporan loss/jitter berkala untuk bitrate adaptif
         
     def start(self):
         self.running = True
@@ -32,33 +50,48 @@ class VideoReceiver:
         print(f"🚀 Penerima video UDP berjalan di {self.ip}:{self.port}")
 
     def _receive_frames(self):
-        packet_buffer = {}
+        reassembler = FrameReassembler()
+        monitor = LinkMonitor()
+        self.sock.settimeout(0.02)  # Agar frame basi dibuang dan NACK tetap dikirim saat sepi
+        sender_addr = None
+        last_nack_check = 0
+        # Buffer datagram dialokasikan sekali, payload disalin langsung ke buffer frame
+        datagram = bytearray(65536)
+        datagram_view = memoryview(datagram)
         
         while self.running:
             try:
-                # Terima metadata frame
-                metadata, _ = self.sock.recvfrom(8)
-                frame_id, num_chunks = struct.unpack('>II', metadata)
+                try:
+                    nbytes, addr = self.sock.recvfrom_into(datagram)
+                except socket.timeout:
+                    nbytes = 0
                 
-                # Terima semua chunk untuk frame ini
-                chunks = [None] * num_chunks
-                chunks_received = 0
-                timeout = time.time() + 0.1  # Timeout 100ms untuk frame
+                frame_data = None
+                if nbytes:
+                    header = parse_header(datagram_view[:nbytes])
+                    if header is None:
+                        continue
+                    sender_addr = addr
+                    monitor.on_chunk(header, time.time())
+                    frame_data = reassembler.add_chunk(header, datagram_view[HEADER_SIZE:nbytes])
+                reassembler.evict_stale()
                 
-                while chunks_received < num_chunks and time.time() < timeout:
-                    try:
-                        chunk_data, _ = self.sock.recvfrom(1500)  # MTU size
-                        chunk_frame_id, chunk_num = struct.unpack('>IH', chunk_data[:6])
-                        
-                        if chunk_frame_id == frame_id and chunk_num < num_chunks:
-                            chunks[chunk_num] = chunk_data[6:]  # Hapus header
-                            chunks_received += 1
-                    except:
-                        pass
+                # Kirim NACK untuk chunk yang hilang ke alamat sumber stream
+                now = time.time()
+                if self.nack_enabled and sender_addr and now - last_nack_check >= 0.005:
+                    last_nack_check = now
+                    for frame_id, missing in reassembler.collect_nacks(now):
+                        self.sock.sendto(pack_nack(frame_id, missing), sender_addr)
                 
-                # Jika semua chunk diterima, reassemble frame
-                if chunks_received == num_chunks and all(chunks):
-                    frame_data = b''.join(chunks)
+                # Laporan kondisi link ke MaixCam untuk kontrol bitrate
+                if self.feedback_enabled and sender_addr:
+                    feedback = monitor.report(now, reassembler.stats)
+                    if feedback is not None:
+                        self.sock.sendto(feedback, sender_addr)
+                
+                # Jika frame lengkap, decode
+                if frame_data is not None:
+                    self.latency.on_frame(header, reassembler.last_first_seen, now)
                     np_frame = np.frombuffer(frame_data, dtype=np.uint8)
                     frame = cv2.imdecode(np_frame, cv2.IMREAD_COLOR)
                     
@@ -72,16 +105,33 @@ class VideoReceiver:
                             self.frame_stats['total_frames'] = 0
                             self.frame_stats['last_time'] = current_time
                         
-                        self.current_frame = frame
+                        if self.ring is None or frame.nbytes > self.ring.slot_size:
+                            self._open_ring(frame.nbytes)
+                        height, width, channels = frame.shape
+                        self.ring.write(frame, width, height, channels, header.frame_id,
+                                        header.capture_ts_us, reassembler.last_first_seen, now)
                     
             except Exception as e:
+                if not self.running:
+                    break
                 print(f"⚠️ Gagal menerima frame: {str(e)}")
                 time.sleep(0.001)
 
+    def _open_ring(self, frame_size):
+        # GUI mungkin masih memegang view ring lama, jadi ring lama baru ditutup saat stop()
+        if self.ring is not None:
+            self.retired_rings.append(self.ring)
+        name = f"maixcam_pc_{self.port}_{len(self.retired_rings)}"
+        self.ring = FrameRing.create(name, self.ring_slots, frame_size)
+        print(f"🔗 Frame ring {name}: {self.ring_slots} slot x {frame_size} byte")
+
     def stop(self):
         self.running = False
         if self.sock:
             self.sock.close()
+        for ring in self.retired_rings + [self.ring]:
+            if ring is not None:
+                ring.close()
 
 class RobotGUI(QMainWindow):
     def __init__(self, server_ip='192.168.31', command_port=9002): #Ganti IP sesuai maixcam
@@ -94,6 +144,11 @@ class RobotGUI(QMainWindow):
         self.command_port = command_port
         self.coords = {'x': 0, 'y': 0}
         self.coord_lock = threading.Lock()
+        # Koneksi perintah TCP persisten (reconnect otomatis)
+        self.command_client = CommandClient(server_ip, command_port)
+        # Perintah biner dengan seq per klien; klik beruntun digabung jadi satu MOVE
+        self.command_session = CommandSession(self.command_client)
+        self.move_coalescer = MoveCoalescer(self.command_session, on_reply=self._apply_reply)
         
         # Inisialisasi video receiver
         self.video_receiver = VideoReceiver()
@@ -102,13 +157,24 @@ class RobotGUI(QMainWindow):
         # Mulai thread sinkronisasi koordinat
         threading.Thread(target=self._sync_coords, daemon=True).start()
         
+        # Offset jam MaixCam lewat kanal perintah untuk latency glass-to-glass
+        self.clock_sync = ClockSync(self.command_session)
+        self.video_receiver.latency.clock = self.clock_sync
+        self.clock_sync.start()
+        
         # Setup UI
         self.init_ui()
         
         # Timer untuk update frame
+        self.last_frame = None  # (ring, counter) frame terakhir yang digambar
         self.timer = QTimer(self)
         self.timer.timeout.connect(self.update_frame)
         self.timer.start(33)  # ~30 FPS
+        
+        # Timer untuk update latency di status bar
+        self.latency_timer = QTimer(self)
+        self.latency_timer.timeout.connect(self.update_latency)
+        self.latency_timer.start(1000)
 
     def init_ui(self):
         main_widget = QWidget()
@@ -172,19 +238,23 @@ class RobotGUI(QMainWindow):
         main_layout.addLayout(control_panel, 30)
         main_widget.setLayout(main_layout)
         self.setCentralWidget(main_widget)
+        self.statusBar().showMessage("Latensi: menunggu frame")
 
     def update_frame(self):
-        if self.video_receiver.current_frame is not None:
-            frame = self.video_receiver.current_frame
+        ring = self.video_receiver.ring
+        ref = ring.latest() if ring is not None else None
+        if ref is not None and (ring, ref.counter) != self.last_frame:
+            # View langsung ke shared memory; cvtColor menyalin, setelah itu slot boleh ditimpa
+            frame = np.frombuffer(ref.data, dtype=np.uint8).reshape(ref.height, ref.width, ref.channels)
             rgb_image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            h, w, ch = rgb_image.shape
-            bytes_per_line = ch * w
-            qt_image = QImage(rgb_image.data, w, h, bytes_per_line, QImage.Format_RGB888)
-            self.video_label.setPixmap(QPixmap.fromImage(qt_image).scaled(
-                self.video_label.width(), 
-                self.video_label.height(),
-                Qt.KeepAspectRatio
-            ))
+            del frame
+            ref.release()
+            # Slot ditimpa saat dibaca: lewati, frame yang lebih baru diambil di tick berikutnya
+            if ref.valid():
+                self.last_frame = (ring, ref.counter)
+                self.show_frame(rgb_image)
+                self.video_receiver.latency.served(
+                    self.video_receiver.latency.timing(ref.capture_ts_us, ref.completed))
             
             self.stats_label.setText(
                 f"FPS: {self.video_receiver.frame_stats['fps']:.1f} | "
@@ -194,6 +264,32 @@ class RobotGUI(QMainWindow):
         # Update diagram koordinat
         self.update_diagram()
 
+    def show_frame(self, rgb_image):
+        h, w, ch = rgb_image.shape
+        bytes_per_line = ch * w
+        qt_image = QImage(rgb_image.data, w, h, bytes_per_line, QImage.Format_RGB888)
+        self.video_label.setPixmap(QPixmap.fromImage(qt_image).scaled(
+            self.video_label.width(), 
+            self.video_label.height(),
+            Qt.KeepAspectRatio
+        ))
+
+    def update_latency(self):
+        """Tampilkan p50/p95/p99 latency per tahap (ms) di status bar"""
+        summary = self.video_receiver.latency.summary()
+        stages = summary['stages_ms']
+        if stages['total'] is None:
+            return
+        names = [('total', 'Total'), ('capture_send', 'Kirim'), ('network', 'Jaringan'),
+                 ('reassembly', 'Rakit'), ('served', 'Tayang')]
+        parts = []
+        for stage, name in names:
+            p = stages[stage]
+            if p is not None:
+                parts.append(f"{name} {p['p50']:.0f}/{p['p95']:.0f}/{p['p99']:.0f}")
+        clock = f"offset jam {summary['clock_offset_ms']:+.1f} ms" if summary['clock_synced'] else "jam belum sinkron"
+        self.statusBar().showMessage(f"Latensi p50/p95/p99 (ms): {' | '.join(parts)} | {clock}")
+
     def update_diagram(self):
         pixmap = QPixmap(220, 220)
         pixmap.fill(Qt.white)
@@ -226,44 +322,45 @@ class RobotGUI(QMainWindow):
         self.diagram_label.setPixmap(pixmap)
         self.coords_label.setText(f"Koordinat: ({x}, {y})")
 
+    def _apply_reply(self, status, x, y):
+        """Simpan koordinat dari balasan MaixCam (dipanggil dari thread perintah)"""
+        if applied(status):
+            with self.coord_lock:
+                self.coords = {'x': x, 'y': y}
+        else:
+            print(f"⚠️ Perintah tidak diterapkan MaixCam ({STATUS_NAMES.get(status, status)})")
+
     def _sync_coords(self):
         """Sinkronisasi koordinat dengan server secara berkala"""
         while self.video_receiver.running:
             try:
-                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                    s.settimeout(1.0)  # Timeout lebih pendek
-                    s.connect((self.server_ip, self.command_port))
-                    s.sendall(json.dumps({'sync': True}).encode())
-                    data = s.recv(1024)
-                    if data:
-                        response = json.loads(data.decode())
-                        if response.get('status') == 'ok' and response.get('type') == 'sync_response':
-                            with self.coord_lock:
-                                self.coords = {'x': response['x'], 'y': response['y']}
+                self._apply_reply(*self.command_session.query())
             except Exception as e:
                 print(f"⚠️ Gagal sinkronisasi koordinat: {str(e)}")
             
             time.sleep(5)  # Sinkron setiap 5 detik
 
     def send_command(self, direction):
-        """Kirim perintah gerakan ke server"""
+        """Kirim perintah gerakan ke server tanpa menahan thread GUI"""
         try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.settimeout(1.0)  # Timeout lebih pendek
-                s.connect((self.server_ip, self.command_port))
-                s.sendall(json.dumps({'direction': direction}).encode())
-                
-                data = s.recv(1024)
-                if data:
-                    response = json.loads(data.decode())
-                    if response.get('status') == 'ok' and response.get('type') == 'move_response':
-                        with self.coord_lock:
-                            self.coords = {'x': response['x'], 'y': response['y']}
+            if direction in DIRECTIONS:
+                self.move_coalescer.move(*DIRECTIONS[direction])
+            else:
+                # STOP bisa menunggu timeout dan retry, jalankan di thread sendiri seperti MOVE
+                threading.Thread(target=self._send_stop, daemon=True).start()
+        except Exception as e:
+            print(f"⚠️ Gagal mengirim perintah: {str(e)}")
+
+    def _send_stop(self):
+        try:
+            self._apply_reply(*self.command_session.stop())
         except Exception as e:
             print(f"⚠️ Gagal mengirim perintah: {str(e)}")
 
     def closeEvent(self, event):
         self.video_receiver.stop()
+        self.clock_sync.stop()
+        self.command_client.close()
         event.accept()
 
 if __name__ == '__main__':
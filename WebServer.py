@@ -3,6 +3,16 @@
 - Menyediakan webserver (Flask) untuk kontrol arah dan visualisasi koordinat.
 - Mengirim perintah arah ke server via TCP.
 - Menyimpan dan menampilkan statistik frame dan koordinat.
+- Beberapa MaixCam ke port yang sama dipisah per kamera (lihat streams.py):
+  /video_feed/<cam_id> dan /stats/<cam_id>, daftar kamera di /streams.
+- --workers N: reassembly di N proses worker SO_REUSEPORT (receiver_pool.py),
+  proses ini hanya melayani HTTP.
+- --shm: setiap kamera juga menulis frame ke ring shared memory (frame_ring.py)
+  untuk konsumen di proses lain (worker --workers selalu memakai ring).
+- --record DIR: rekam frame setiap kamera ke segmen di disk (recorder.py),
+  daftar di /recordings dan putar ulang di /playback/<cam_id>?from=&speed=.
+- /snapshot[/<cam_id>] dan /thumbnail[/<cam_id>]?w=&h=&q=: gambar diam dari
+  frame terbaru, di-cache per frame dan varian (thumbnails.py).
 """
 # Import library untuk komunikasi jaringan, threading, pengolahan gambar, dan web server
 import socket
@@ -11,8 +21,17 @@ import cv2
 import numpy as np
 import os
 import time
-import json
 from flask import Flask, Response, render_template, request, jsonify
+from broadcaster import FrameBroadcaster, multipart_part
+from commands import OP_MOVE, STATUS_ERROR, STATUS_NAMES, applied, parse_web_command, shared_session
+from jpeg_utils import looks_like_jpeg
+from latency import LatencyTracker
+from metrics import CONTENT_TYPE, CallbackMetric, ReceiverMetrics
+from protocol import HEADER_SIZE, parse_header
+from receiver_pool import ReceiverPool
+from recorder import Recorder, RecordingStore
+from streams import CameraStream, StreamTable
+from thumbnails import ThumbnailCache
 
 # Inisialisasi aplikasi Flask dan variabel global
 from flask import send_from_directory
@@ -23,6 +42,16 @@ def static_files(filename):
     return send_from_directory(app.static_folder, filename)
 latest_frame = {'data': b'', 'timestamp': 0, 'counter': 0, 'stats': {'fps': 0}}
 current_coords = {'x': 0, 'y': 0}  # Menyimpan koordinat terbaru
+broadcaster = FrameBroadcaster()  # Fan-out MJPEG ke semua viewer /video_feed
+latency = LatencyTracker()  # Latency per tahap, frame dianggap tayang saat dikirim ke viewer
+metrics = ReceiverMetrics()  # Counter dan histogram untuk /metrics
+# Kamera pertama memakai objek global di atas (/video_feed, /stats), kamera berikutnya punya state sendiri
+streams = StreamTable(CameraStream(broadcaster, latency, latest_frame, on_frame=metrics.on_frame),
+                      lambda: CameraStream(FrameBroadcaster(), on_frame=metrics.on_frame))
+
+recorder = None  # Recorder saat --record, frame ditulis di thread writer sendiri
+recordings = None  # RecordingStore untuk /recordings dan /playback
+thumbnails = ThumbnailCache()  # Snapshot/thumbnail per (kamera, frame, ukuran, kualitas)
 
 class VideoStreamReceiver:
     """
@@ -31,96 +60,118 @@ class VideoStreamReceiver:
     - _receive_frames(): Loop menerima frame, update statistik, update frame terbaru.
     - stop(): Menghentikan receiver dan release resource.
     """
-    def __init__(self, ip="0.0.0.0", port=9001):
+    def __init__(self, ip="0.0.0.0", port=9001, reuse_port=False):
         # Ubah 'ip' di sini ke IP client jika ingin menerima hanya dari IP tertentu.
         # Biasanya biarkan "0.0.0.0" agar menerima dari semua alamat.
 
         # Inisialisasi variabel utama
         self.ip = ip
         self.port = port
+        self.reuse_port = reuse_port  # Port dibagi beberapa proses worker (receiver_pool.py)
         self.running = False
         self.sock = None
-        self.frame_stats = {'last_time': time.time(), 'fps': 0, 'total_frames': 0}
         self.buffer_size = 65536  # Meningkatkan buffer untuk throughput tinggi
+        # Validasi frame: 'markers' (cek SOI/EOI dan ukuran) atau 'decode' (cv2.imdecode penuh)
+        self.validate_mode = 'markers'
+        self.nack_enabled = True  # Minta ulang chunk yang hilang ke MaixCam (NACK)
+        self.nack_check_interval = 0.005
+        self.feedback_enabled = True  # Kirim laporan loss/jitter berkala untuk bitrate adaptif
+        self.clock_sync_enabled = True  # Sinkron jam dengan setiap MaixCam (alamat sumber stream) untuk latency
+        self.command_port = 9002
+        # frame_sink(stream, header, frame_data, completed): pengganti stream.publish() untuk frame valid
+        self.frame_sink = None
         
     def start(self):
         # Mulai receiver UDP dalam thread terpisah
         self.running = True
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.buffer_size)
+        if self.reuse_port:
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
         self.sock.bind((self.ip, self.port))
         threading.Thread(target=self._receive_frames, daemon=True).start()
         print(f"🚀 UDP receiver started on {self.ip}:{self.port}")
 
     def _receive_frames(self):
-        # Loop utama: menerima frame dari server, update statistik dan frame terbaru
-        packet_buffer = {}
+        # Loop utama: menerima chunk dari semua kamera, rakit frame per kamera, update statistik dan frame terbaru
+        metrics.bind(sock=self.sock, viewers_fn=lambda: sum(s.broadcaster.viewers for s in streams.list()))
+        self.sock.settimeout(0.02)  # Agar frame basi dibuang dan NACK tetap dikirim saat sepi
+        # Buffer datagram dialokasikan sekali, payload disalin langsung ke buffer frame
+        datagram = bytearray(65536)
+        datagram_view = memoryview(datagram)
         
         while self.running:
             try:
-                # Terima metadata frame
-                metadata, _ = self.sock.recvfrom(1024)
-                metadata = json.loads(metadata.decode())
-                frame_id = metadata['frame_id']
-                num_chunks = metadata['num_chunks']
-                
-                # Terima semua chunk untuk frame ini
-                chunks = [None] * num_chunks
-                chunks_received = 0
-                timeout = time.time() + 0.1  # Timeout 100ms untuk frame
+                try:
+                    nbytes, addr = self.sock.recvfrom_into(datagram)
+                except socket.timeout:
+                    nbytes = 0
                 
-                while chunks_received < num_chunks and time.time() < timeout:
-                    try:
-                        chunk_data, _ = self.sock.recvfrom(65507)
-                        chunk_id = int.from_bytes(chunk_data[4:6], 'big')
-                        if chunk_id < num_chunks:
-                            chunks[chunk_id] = chunk_data[6:]  # Hapus header
-                            chunks_received += 1
-                    except:
-                        pass
+                now = time.time()
+                if nbytes:
+                    header = parse_header(datagram_view[:nbytes])
+                    metrics.on_datagram(nbytes, header is not None)
+                    if header is None:
+                        continue
+                    stream = streams.get(header, addr)
+                    if stream is None:
+                        continue
+                    if stream.sender_addr is None:
+                        metrics.bind(stream.reassembler)
+                        stream.sender_addr = addr
+                        if self.clock_sync_enabled:
+                            stream.start_clock_sync(self.command_port)
+                    frame_data = stream.on_chunk(header, datagram_view[HEADER_SIZE:nbytes], addr, now)
+                    if frame_data is not None:
+                        self._on_frame(stream, header, frame_data, now)
                 
-                # Jika semua chunk diterima, reassemble frame
-                if chunks_received == num_chunks and all(chunks):
-                    frame_data = b''.join(chunks)
-                    np_frame = np.frombuffer(frame_data, dtype=np.uint8)
-                    frame = cv2.imdecode(np_frame, cv2.IMREAD_COLOR)
-                    
-                    if frame is not None:
-                        self.frame_stats['total_frames'] += 1
-                        current_time = time.time()
-                        elapsed = current_time - self.frame_stats['last_time']
-                        
-                        if elapsed >= 1.0:
-                            self.frame_stats['fps'] = self.frame_stats['total_frames'] / elapsed
-                            self.frame_stats['total_frames'] = 0
-                            self.frame_stats['last_time'] = current_time
-                        
-                        latest_frame.update({
-                            'data': frame_data,
-                            'timestamp': current_time,
-                            'counter': latest_frame['counter'] + 1,
-                            'stats': self.frame_stats.copy()
-                        })
+                # Frame basi, NACK dan laporan link untuk setiap kamera
+                for stream in streams.list():
+                    stream.maintain(now, self.sock.sendto, self.nack_enabled, self.nack_check_interval,
+                                    self.feedback_enabled)
                 
             except Exception as e:
+                if not self.running:
+                    break
                 print(f"\n⚠️ Error receiving frame: {str(e)}")
                 time.sleep(0.001)  # Mengurangi sleep time untuk responsivitas
 
+    def _on_frame(self, stream, header, frame_data, completed):
+        if self.validate_mode == 'decode':
+            np_frame = np.frombuffer(frame_data, dtype=np.uint8)
+            valid = cv2.imdecode(np_frame, cv2.IMREAD_COLOR) is not None
+        else:
+            # Cek struktur JPEG saja, decode penuh dilakukan saat dibutuhkan
+            valid = looks_like_jpeg(frame_data, header.total_size)
+        if not valid:
+            stream.invalid_frame()
+            metrics.on_invalid_frame()
+            return
+        if self.frame_sink is not None:
+            self.frame_sink(stream, header, frame_data, completed)
+        else:
+            stream.publish(header, frame_data, completed)
+
     def stop(self):
         # Stop receiver dan release resource
         self.running = False
+        for stream in streams.list():
+            stream.stop()
         if self.sock:
             self.sock.close()
 
-def send_direction_to_server(direction, server_ip='192.168.31', server_port=9002): #Ganti IP sesuai maixcam
-    # Fungsi untuk mengirim perintah arah ke server via TCP
+def send_command_to_server(op, a=0, b=0, server_ip='192.168.31', server_port=9002): #Ganti IP sesuai maixcam
+    # Kirim perintah biner ke MaixCam, return (status, x, y) atau None jika gagal
+    # MOVE dari beberapa request yang datang bersamaan digabung menjadi satu delta
     try:
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            s.settimeout(0.5)  # Timeout lebih pendek
-            s.connect((server_ip, server_port))
-            s.sendall(direction.encode())
+        session, coalescer = shared_session(server_ip, server_port)
+        session.on_rtt = metrics.command_rtt.observe
+        if op == OP_MOVE:
+            return coalescer.move(a, b).wait(coalescer.deadline())
+        return session.call(op, a, b)
     except Exception as e:
-        print(f"⚠️ Failed to send direction: {e}")
+        print(f"⚠️ Failed to send command: {e}")
+        return None
 
 @app.route('/')
 def index():
@@ -139,32 +190,106 @@ def video_feed():
         print(f"🌐 Device {client_ip} connected to video stream at {now}")
         first_access_logged = True
     
-    def generate():
-        last_frame_time = time.time()
-        while True:
-            if latest_frame['data']:
-                yield (b'--frame\r\n'
-                      b'Content-Type: image/jpeg\r\n\r\n' + 
-                      latest_frame['data'] + b'\r\n')
-                # Menjaga frame rate konsisten
-                elapsed = time.time() - last_frame_time
-                sleep_time = max(0, 1/30 - elapsed)  # Target 30 FPS
-                time.sleep(sleep_time)
-                last_frame_time = time.time()
-            else:
-                time.sleep(0.01)
-    return Response(generate(), mimetype='multipart/x-mixed-replace; boundary=frame')
+    # Semua viewer berbagi part multipart yang sama dari broadcaster
+    return Response(broadcaster.stream(), mimetype='multipart/x-mixed-replace; boundary=frame')
+
+@app.route('/video_feed/<cam_id>')
+def camera_video_feed(cam_id):
+    # Streaming MJPEG satu kamera (id dari /streams)
+    stream = streams.find(cam_id)
+    if stream is None:
+        return jsonify({'status': 'error', 'message': f'Kamera {cam_id} tidak ditemukan'}), 404
+    return Response(stream.broadcaster.stream(), mimetype='multipart/x-mixed-replace; boundary=frame')
 
 @app.route('/stats')
 def stats():
-    # Endpoint statistik frame untuk web
-    if latest_frame['data']:
-        return {
-            'fps': round(latest_frame['stats']['fps'], 1),
-            'last_update': time.time() - latest_frame['timestamp'],
-            'total_frames': latest_frame['counter']
-        }
-    return {'status': 'no frames received'}
+    # Endpoint statistik frame untuk web (kamera pertama)
+    return streams.default.stats()
+
+@app.route('/stats/<cam_id>')
+def camera_stats(cam_id):
+    # Statistik frame satu kamera
+    stream = streams.find(cam_id)
+    if stream is None:
+        return jsonify({'status': 'error', 'message': f'Kamera {cam_id} tidak ditemukan'}), 404
+    return stream.stats()
+
+@app.route('/streams')
+def list_streams():
+    # Daftar kamera yang pernah mengirim: id, alamat, fps, total frame, viewer
+    return jsonify(streams.summary())
+
+@app.route('/metrics')
+def metrics_endpoint():
+    # Metrik Prometheus: datagram, frame, reassembly, viewer, RTT perintah, drop kernel
+    return Response(metrics.render(), content_type=CONTENT_TYPE)
+
+def still_image(cam_id, width=None, height=None, quality=None):
+    # Frame terbaru kamera sebagai image/jpeg; ETag per frame dan varian agar polling tanpa frame baru murah
+    stream = streams.default if cam_id is None else streams.find(cam_id)
+    if stream is None:
+        return jsonify({'status': 'error', 'message': f'Kamera {cam_id} tidak ditemukan'}), 404
+    snapshot = stream.latest_frame.copy()  # Ambil data dan counter dari frame yang sama
+    data, counter = snapshot['data'], snapshot['counter']
+    if not data:
+        return jsonify({'status': 'no frames received'}), 503
+    variant = f"-{width or ''}x{height or ''}-q{quality}" if quality else ''
+    etag = f'"{stream.cam_id}-{counter}{variant}"'
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache', 'X-Frame-Counter': str(counter)}
+    if etag in request.headers.get('If-None-Match', ''):
+        return Response(status=304, headers=headers)
+    jpeg = thumbnails.get(stream.cam_id, counter, data, width, height, quality)
+    if jpeg is None:
+        return jsonify({'status': 'error', 'message': 'Frame gagal di-decode'}), 500
+    return Response(jpeg, mimetype='image/jpeg', headers=headers)
+
+@app.route('/snapshot', defaults={'cam_id': None})
+@app.route('/snapshot/<cam_id>')
+def snapshot(cam_id):
+    # JPEG asli frame terbaru (tanpa re-encode)
+    return still_image(cam_id)
+
+@app.route('/thumbnail', defaults={'cam_id': None})
+@app.route('/thumbnail/<cam_id>')
+def thumbnail(cam_id):
+    # Frame terbaru diperkecil agar muat di w x h (rasio aspek tetap), kualitas JPEG q
+    try:
+        width = int(request.args['w']) if 'w' in request.args else None
+        height = int(request.args['h']) if 'h' in request.args else None
+        quality = int(request.args.get('q', 70))
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'w/h/q harus bilangan bulat'}), 400
+    if width is None and height is None:
+        width = 160
+    if any(v is not None and not 16 <= v <= 3840 for v in (width, height)) or not 10 <= quality <= 95:
+        return jsonify({'status': 'error', 'message': 'w/h di antara 16 dan 3840, q di antara 10 dan 95'}), 400
+    return still_image(cam_id, width, height, quality)
+
+@app.route('/recordings')
+def list_recordings():
+    # Segmen rekaman per kamera (waktu detik unix) dan status writer (backlog, frame dibuang, fsync)
+    if recordings is None:
+        return jsonify({'status': 'error', 'message': 'Rekaman tidak aktif (--record)'}), 404
+    return jsonify({'cameras': recordings.list(), 'writer': recorder.report() if recorder else None})
+
+@app.route('/playback/<cam_id>')
+def playback(cam_id):
+    # MJPEG dari rekaman mulai ?from=<detik unix> (negatif = relatif dari sekarang), kecepatan ?speed=
+    if recordings is None:
+        return jsonify({'status': 'error', 'message': 'Rekaman tidak aktif (--record)'}), 404
+    try:
+        from_ts = float(request.args['from']) if 'from' in request.args else None
+        speed = float(request.args.get('speed', 1.0))
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'from/speed harus angka'}), 400
+    if not 0 < speed <= 32:
+        return jsonify({'status': 'error', 'message': 'speed harus di antara 0 dan 32'}), 400
+    if from_ts is not None and from_ts < 0:
+        from_ts += time.time()
+    if not recordings.segments(cam_id):
+        return jsonify({'status': 'error', 'message': f'Tidak ada rekaman kamera {cam_id}'}), 404
+    parts = (multipart_part(jpeg) for jpeg in recordings.play(cam_id, from_ts, speed))
+    return Response(parts, mimetype='multipart/x-mixed-replace; boundary=frame')
 
 @app.route('/coords')
 def get_coords():
@@ -174,35 +299,33 @@ def get_coords():
 
 @app.route('/direction', methods=['POST'])
 def direction():
-    # Endpoint menerima perintah arah dari web, update koordinat dan kirim ke server
+    # Endpoint menerima perintah dari web (arah, delta dx/dy atau posisi x/y),
+    # koordinat diambil dari balasan MaixCam setelah perintah diterapkan
     global current_coords
-    direction = None
-    if request.is_json:
-        direction = request.json.get('direction')
-    elif 'direction' in request.form:
-        direction = request.form['direction']
-    
-    if direction:
-        # Update koordinat lokal
-        if direction == "RIGHT":
-            current_coords['x'] += 1
-        elif direction == "LEFT":
-            current_coords['x'] -= 1
-        elif direction == "UP":
-            current_coords['y'] += 1
-        elif direction == "DOWN":
-            current_coords['y'] -= 1
-        
-        send_direction_to_server(direction)
-        return jsonify({
-            'status': 'ok', 
-            'direction': direction,
-            'coords': current_coords
-        })
-    return jsonify({'status': 'error', 'message': 'No direction received'}), 400
+    data = request.json if request.is_json else request.form
+    try:
+        command = parse_web_command(data or {})
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    if command is None:
+        return jsonify({'status': 'error', 'message': 'No direction received'}), 400
+
+    result = send_command_to_server(*command)
+    if result is None or result[0] == STATUS_ERROR:
+        return jsonify({'status': 'error', 'message': 'MaixCam tidak membalas', 'coords': current_coords}), 503
+    if not applied(result[0]):
+        return jsonify({'status': 'error', 'message': f'Perintah tidak diterapkan MaixCam ({STATUS_NAMES[result[0]]})',
+                        'coords': current_coords}), 409
+    current_coords.update(x=result[1], y=result[2])
+    return jsonify({
+        'status': 'ok',
+        'direction': data.get('direction'),
+        'coords': current_coords
+    })
 
 if __name__ == '__main__':
     # Entry point program client
+    import argparse
     import socket
     def get_local_ip():
         s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
@@ -215,7 +338,32 @@ if __name__ == '__main__':
             s.close()
         return ip
 
-    receiver = VideoStreamReceiver()
+    parser = argparse.ArgumentParser(description="Penerima video UDP dan web server")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Proses penerima SO_REUSEPORT (>1 untuk banyak kamera di banyak core)")
+    parser.add_argument('--shm', action='store_true',
+                        help="Tulis frame setiap kamera ke ring shared memory maixcam_<port>_<id>")
+    parser.add_argument('--record', metavar='DIR', help="Rekam frame setiap kamera ke folder ini")
+    parser.add_argument('--segment-seconds', type=float, default=60.0, help="Durasi satu segmen rekaman")
+    args = parser.parse_args()
+
+    if args.record:
+        recorder = Recorder(args.record, segment_seconds=args.segment_seconds)
+        recordings = RecordingStore(args.record)
+        streams.recorder = recorder
+        metrics.registry.add(CallbackMetric('recorder_backlog_frames', 'Frame antre menunggu ditulis ke disk',
+                                            recorder.backlog))
+        metrics.registry.add(CallbackMetric('recorder_dropped_frames_total',
+                                            'Frame tidak direkam karena antrean writer penuh',
+                                            lambda: recorder.stats['dropped'], 'counter'))
+        recorder.start()
+
+    if args.workers > 1:
+        receiver = ReceiverPool(args.workers, streams, metrics)
+    else:
+        receiver = VideoStreamReceiver()
+        if args.shm:
+            streams.ring_prefix = f"maixcam_{receiver.port}"
     receiver.start()
     try:
         import logging
@@ -226,4 +374,6 @@ if __name__ == '__main__':
         print(f"🌐 Web server running at http://{local_ip}:5000")
         app.run(host="0.0.0.0", port=5000, threaded=True)
     finally:
-        receiver.stop()
\ No newline at end of file
+        receiver.stop()
+        if recorder:
+            recorder.stop()
\ No newline at end of file
@@ -0,0 +1,105 @@
+"""
+Benchmark FEC: FPS yang terkirim vs loss rate dan overhead parity.
+Mensimulasikan pengiriman frame (tanpa jaringan) dengan loss acak per datagram,
+lalu merakit ulang memakai FrameReassembler yang sama dengan penerima.
+
+Contoh:
+    python benchmarks/fec_loss.py
+    python benchmarks/fec_loss.py --frame-size 15000 --parity 0 1 2 4 --plot fec.png
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fec import build_parity
+from protocol import FLAG_PARITY, HEADER_SIZE, chunk_count_for, pack_header, parse_header
+from reassembly import FrameReassembler
+
+
+def simulate(frame_size, chunk_size, parity, loss, frames, fps, seed):
+    """Return (fraksi frame terkirim, overhead parity, waktu encode parity per frame)"""
+    rng = random.Random(seed)
+    reassembler = FrameReassembler()
+    data = bytes(rng.getrandbits(8) for _ in range(frame_size))
+    num_chunks = chunk_count_for(frame_size, chunk_size)
+    delivered = 0
+    encode_time = 0.0
+    now = 0.0
+
+    for frame_id in range(frames):
+        packets = []
+        for i in range(num_chunks):
+            header = pack_header(frame_id, i, num_chunks, frame_size, 0)
+            packets.append(header + data[i * chunk_size:(i + 1) * chunk_size])
+        if parity:
+            start = time.perf_counter()
+            parities = build_parity(data, chunk_size, parity)
+            encode_time += time.perf_counter() - start
+            for j, payload in enumerate(parities):
+                packets.append(pack_header(frame_id, j, num_chunks, frame_size, 0, FLAG_PARITY) + payload)
+
+        for packet in packets:
+            if rng.random() < loss:
+                continue
+            frame = reassembler.add_chunk(parse_header(packet), packet[HEADER_SIZE:], now)
+            if frame is not None:
+                assert frame == data
+                delivered += 1
+        now += 1.0 / fps
+        reassembler.evict_stale(now)
+
+    overhead = min(parity, num_chunks) / num_chunks
+    return delivered / frames, overhead, encode_time / frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark FEC parity vs loss rate")
+    parser.add_argument('--frame-size', type=int, default=12000, help="Ukuran JPEG (byte)")
+    parser.add_argument('--chunk-size', type=int, default=1400)
+    parser.add_argument('--fps', type=float, default=30)
+    parser.add_argument('--frames', type=int, default=2000)
+    parser.add_argument('--loss', type=float, nargs='+', default=[0, 0.01, 0.02, 0.03, 0.05, 0.1])
+    parser.add_argument('--parity', type=int, nargs='+', default=[0, 1, 2, 3, 4])
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--plot', help="Simpan grafik ke file (butuh matplotlib)")
+    args = parser.parse_args()
+
+    results = {}
+    print("{:>7} {:>9} {:>12} {:>14}".format("loss", "parity", "overhead", "FPS terkirim"))
+    for parity in args.parity:
+        for loss in args.loss:
+            ratio, overhead, encode = simulate(args.frame_size, args.chunk_size, parity,
+                                               loss, args.frames, args.fps, args.seed)
+            results[(parity, loss)] = ratio * args.fps
+            print("{:>6.1f}% {:>9} {:>11.1f}% {:>14.1f}".format(
+                loss * 100, parity, overhead * 100, ratio * args.fps))
+        if parity:
+            print("   (encode parity {}: {:.3f} ms/frame)".format(parity, encode * 1000))
+
+    if args.plot:
+        try:
+            import matplotlib
+            matplotlib.use('Agg')
+            import matplotlib.pyplot as plt
+        except ImportError:
+            print("⚠️ matplotlib tidak terpasang, grafik dilewati")
+            return
+        num_chunks = chunk_count_for(args.frame_size, args.chunk_size)
+        for parity in args.parity:
+            label = "parity {} (+{:.0f}%)".format(parity, 100 * min(parity, num_chunks) / num_chunks)
+            plt.plot([l * 100 for l in args.loss], [results[(parity, l)] for l in args.loss],
+                     marker='o', label=label)
+        plt.xlabel("Loss rate (%)")
+        plt.ylabel("FPS terkirim")
+        plt.title("FEC XOR, frame {} byte".format(args.frame_size))
+        plt.legend()
+        plt.grid(True)
+        plt.savefig(args.plot)
+        print("📈 Grafik disimpan ke", args.plot)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+"""
+Benchmark end-to-end loopback: VideoStreamSender (Maixcam.py, sumber sintetis)
+dan VideoStreamReceiver (WebServer.py) di localhost, masing-masing di proses
+sendiri, untuk setiap kombinasi resolusi, kualitas JPEG, chunk size dan FPS.
+
+Per konfigurasi dilaporkan: FPS yang bertahan di penerima, Mbit/s, kelengkapan
+frame (frame lengkap / frame dikirim), CPU per frame (ms) pengirim dan penerima,
+dan latency p50/p95/p99 capture -> dikirim ke viewer (satu viewer MJPEG di
+proses penerima). Hasil dicetak sebagai tabel dan bisa disimpan sebagai JSON.
+Bitrate adaptif dimatikan agar setiap konfigurasi tetap.
+
+Contoh:
+    python benchmarks/loopback.py
+    python benchmarks/loopback.py --resolution 320x240 640x480 --quality 50 80 \\
+        --chunk-size 1400 --fps 30 --duration 10 --json hasil.json
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+STARTUP = 3.0  # Detik untuk import dan inisialisasi kedua proses sebelum jendela ukur
+
+
+def _quiet(verbose):
+    if not verbose:
+        sys.stdout = open(os.devnull, 'w')
+
+
+def _wait_until(deadline):
+    delay = deadline - time.time()
+    if delay > 0:
+        time.sleep(delay)
+
+
+def run_receiver(config, port, start_at, conn):
+    """Proses penerima: ukur frame, byte, CPU dan latency di jendela [warmup, warmup + duration]"""
+    _quiet(config['verbose'])
+    import WebServer
+    receiver = WebServer.VideoStreamReceiver(port=port)
+    receiver.clock_sync_enabled = False  # Satu host, jam sama
+    receiver.start()
+
+    def viewer():
+        for _ in WebServer.broadcaster.stream():
+            if not receiver.running:
+                break
+    threading.Thread(target=viewer, daemon=True).start()
+
+    metrics = WebServer.metrics
+    _wait_until(start_at + config['warmup'])
+    for samples in WebServer.latency.samples.values():
+        samples.clear()
+    frames_before = dict(metrics.frames.values)
+    bytes_before = metrics.datagram_bytes.values[()]
+    cpu_before = time.process_time()
+    wall_before = time.time()
+
+    _wait_until(start_at + config['warmup'] + config['duration'])
+    cpu = time.process_time() - cpu_before
+    wall = time.time() - wall_before
+    frames = {key: value - frames_before.get(key, 0) for key, value in metrics.frames.values.items()}
+    nbytes = metrics.datagram_bytes.values[()] - bytes_before
+    receiver.stop()
+
+    completed = frames.get(('completed',), 0)
+    conn.send({
+        'completed': completed,
+        'evicted': sum(value for key, value in frames.items() if key != ('completed',)),
+        'bytes': nbytes,
+        'wall': wall,
+        'cpu': cpu,
+        'latency_ms': WebServer.latency.percentiles(),
+    })
+
+
+def run_sender(config, port, start_at, conn):
+    """Proses pengirim: streaming sintetis tanpa bitrate adaptif, ukur frame terkirim dan CPU"""
+    _quiet(config['verbose'])
+    import Maixcam
+    from frame_sources import SyntheticSource
+    width, height = config['resolution']
+    sender = Maixcam.VideoStreamSender('127.0.0.1', video_port=port, command_port=port + 1,
+                                       source='synthetic', encoder=config['encoder'])
+    sender.resolution = (width, height)
+    sender.source = SyntheticSource(width, height, config['entropy'])
+    sender.jpeg_quality = config['quality']
+    sender.max_packet_size = config['chunk_size']
+    sender.target_fps = config['fps']
+    sender.adaptive_bitrate = False
+    threading.Thread(target=sender.start, daemon=True).start()
+
+    _wait_until(start_at + config['warmup'])
+    sent_before = sender.frame_id
+    cpu_before = time.process_time()
+    _wait_until(start_at + config['warmup'] + config['duration'])
+    cpu = time.process_time() - cpu_before
+    sent = sender.frame_id - sent_before
+    sender.stop()
+    conn.send({'sent': sent, 'cpu': cpu})
+
+
+def run_config(config, port):
+    """Jalankan satu konfigurasi, return dict hasil"""
+    ctx = multiprocessing.get_context('spawn')
+    start_at = time.time() + STARTUP
+    receiver_conn, receiver_child = ctx.Pipe(duplex=False)
+    sender_conn, sender_child = ctx.Pipe(duplex=False)
+    receiver = ctx.Process(target=run_receiver, args=(config, port, start_at, receiver_child))
+    sender = ctx.Process(target=run_sender, args=(config, port, start_at, sender_child))
+    receiver.start()
+    sender.start()
+    timeout = STARTUP + config['warmup'] + config['duration'] + 10
+    try:
+        if not (receiver_conn.poll(timeout) and sender_conn.poll(timeout)):
+            raise RuntimeError("Proses benchmark tidak melapor dalam {:.0f} detik".format(timeout))
+        rx = receiver_conn.recv()
+        tx = sender_conn.recv()
+    finally:
+        for process in (sender, receiver):
+            process.join(2)
+            if process.is_alive():
+                process.terminate()
+
+    completed = rx['completed']
+    total = rx['latency_ms']['total'] or {}
+    return {
+        'resolution': '{}x{}'.format(*config['resolution']),
+        'quality': config['quality'],
+        'chunk_size': config['chunk_size'],
+        'target_fps': config['fps'],
+        'fps': completed / rx['wall'],
+        'mbps': rx['bytes'] * 8 / rx['wall'] / 1000000,
+        'frames_sent': tx['sent'],
+        'frames_completed': completed,
+        'frames_evicted': rx['evicted'],
+        'completeness': completed / tx['sent'] if tx['sent'] else 0.0,
+        'sender_cpu_ms_per_frame': tx['cpu'] * 1000 / tx['sent'] if tx['sent'] else None,
+        'receiver_cpu_ms_per_frame': rx['cpu'] * 1000 / completed if completed else None,
+        'latency_p50_ms': total.get('p50'),
+        'latency_p95_ms': total.get('p95'),
+        'latency_p99_ms': total.get('p99'),
+        'stages_ms': rx['latency_ms'],
+    }
+
+
+def _fmt(value, spec):
+    return format(value, spec) if value is not None else '-'
+
+
+def print_table(results):
+    header = "{:>9} {:>4} {:>6} {:>4} | {:>6} {:>7} {:>7} {:>8} {:>8} | {:>17}".format(
+        "resolusi", "q", "chunk", "fps", "FPS", "Mbit/s", "lengkap", "CPU tx", "CPU rx", "latency p50/95/99")
+    print(header)
+    print('-' * len(header))
+    for r in results:
+        latency = "{}/{}/{}".format(_fmt(r['latency_p50_ms'], '.0f'), _fmt(r['latency_p95_ms'], '.0f'),
+                                    _fmt(r['latency_p99_ms'], '.0f'))
+        print("{:>9} {:>4} {:>6} {:>4} | {:>6.1f} {:>7.2f} {:>6.1f}% {:>8} {:>8} | {:>17}".format(
+            r['resolution'], r['quality'], r['chunk_size'], r['target_fps'], r['fps'], r['mbps'],
+            r['completeness'] * 100, _fmt(r['sender_cpu_ms_per_frame'], '.2f'),
+            _fmt(r['receiver_cpu_ms_per_frame'], '.2f'), latency))
+    print("CPU dalam ms per frame (CPU tx termasuk membuat frame sintetis), "
+          "latency dalam ms (capture -> dikirim ke viewer)")
+
+
+def parse_resolution(text):
+    width, _, height = text.lower().partition('x')
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark loopback pengirim/penerima video UDP")
+    parser.add_argument('--resolution', type=parse_resolution, nargs='+', default=[(320, 240), (640, 480)])
+    parser.add_argument('--quality', type=int, nargs='+', default=[50, 80])
+    parser.add_argument('--chunk-size', type=int, nargs='+', default=[1400])
+    parser.add_argument('--fps', type=int, nargs='+', default=[30])
+    parser.add_argument('--duration', type=float, default=5.0, help="Detik pengukuran per konfigurasi")
+    parser.add_argument('--warmup', type=float, default=1.0)
+    parser.add_argument('--entropy', type=float, default=0.3, help="Entropi sumber sintetis (0..1)")
+    parser.add_argument('--encoder', default='auto')
+    parser.add_argument('--port', type=int, default=19100, help="Port awal (video, perintah = +1)")
+    parser.add_argument('--json', help="Simpan hasil ke file JSON ('-' = stdout)")
+    parser.add_argument('--verbose', action='store_true', help="Tampilkan log pengirim/penerima")
+    args = parser.parse_args()
+
+    configs = list(itertools.product(args.resolution, args.quality, args.chunk_size, args.fps))
+    results = []
+    for i, (resolution, quality, chunk_size, fps) in enumerate(configs):
+        config = {'resolution': resolution, 'quality': quality, 'chunk_size': chunk_size, 'fps': fps,
+                  'duration': args.duration, 'warmup': args.warmup, 'entropy': args.entropy,
+                  'encoder': args.encoder, 'verbose': args.verbose}
+        print("▶️  [{}/{}] {}x{} q{} chunk {} fps {}".format(
+            i + 1, len(configs), resolution[0], resolution[1], quality, chunk_size, fps), file=sys.stderr)
+        # Port berbeda per konfigurasi agar tidak bentrok dengan socket proses sebelumnya
+        results.append(run_config(config, args.port + 2 * i))
+
+    print_table(results)
+    if args.json:
+        text = json.dumps(results, indent=2)
+        if args.json == '-':
+            print(text)
+        else:
+            with open(args.json, 'w') as f:
+                f.write(text + '\n')
+            print("💾 Hasil disimpan ke", args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Fan-out frame MJPEG ke banyak viewer /video_feed.
+- Part multipart dibangun sekali per frame baru, bukan per klien per tick.
+- Klien menunggu versi frame baru lewat Condition, bukan sleep-polling.
+- Klien lambat otomatis lompat ke frame terbaru (tidak ada antrean per klien).
+- on_serve(meta) (opsional) dipanggil setiap part dikirim ke viewer, dengan
+  meta dari publish() (misalnya FrameTiming untuk latency.py).
+"""
+import asyncio
+import threading
+
+
+def multipart_part(jpeg, boundary=b'frame'):
+    """Satu part multipart/x-mixed-replace berisi JPEG"""
+    return b''.join((
+        b'--', boundary, b'\r\n'
+        b'Content-Type: image/jpeg\r\n'
+        b'Content-Length: ', str(len(jpeg)).encode(), b'\r\n\r\n',
+        jpeg, b'\r\n'
+    ))
+
+
+class FrameBroadcaster:
+    """
+    - publish(jpeg): bangun part multipart frame baru dan bangunkan semua viewer.
+    - stream(): generator part multipart untuk satu viewer.
+    """
+    def __init__(self, boundary=b'frame'):
+        self.boundary = boundary
+        self.cond = threading.Condition()
+        self.version = 0
+        self.part = None
+        self.meta = None
+        self.viewers = 0
+        self.on_serve = None
+
+    def publish(self, jpeg, meta=None):
+        part = multipart_part(jpeg, self.boundary)
+        with self.cond:
+            self.part = part
+            self.meta = meta
+            self.version += 1
+            self.cond.notify_all()
+
+    def wait_next(self, last_version, timeout=1.0):
+        """Tunggu frame dengan versi != last_version, return (versi, part, meta)"""
+        with self.cond:
+            if self.version == last_version:
+                self.cond.wait_for(lambda: self.version != last_version, timeout)
+            return self.version, self.part, self.meta
+
+    def stream(self, timeout=1.0):
+        with self.cond:
+            self.viewers += 1
+        try:
+            version = 0
+            while True:
+                new_version, part, meta = self.wait_next(version, timeout)
+                if new_version != version and part is not None:
+                    version = new_version
+                    if self.on_serve is not None:
+                        self.on_serve(meta)
+                    yield part
+        finally:
+            with self.cond:
+                self.viewers -= 1
+
+
+class AsyncFrameBroadcaster:
+    """
+    Versi asyncio dari FrameBroadcaster (dipakai AsyncWebServer.py).
+    publish() harus dipanggil dari event loop yang sama dengan viewer.
+    """
+    def __init__(self, boundary=b'frame'):
+        self.boundary = boundary
+        self.version = 0
+        self.part = None
+        self.meta = None
+        self.viewers = 0
+        self.on_serve = None
+        self._changed = asyncio.Event()
+
+    def publish(self, jpeg, meta=None):
+        self.part = multipart_part(jpeg, self.boundary)
+        self.meta = meta
+        self.version += 1
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def stream(self):
+        self.viewers += 1
+        try:
+            version = 0
+            while True:
+                if self.version == version or self.part is None:
+                    await self._changed.wait()
+                    continue
+                version = self.version
+                if self.on_serve is not None:
+                    self.on_serve(self.meta)
+                yield self.part
+        finally:
+            self.viewers -= 1
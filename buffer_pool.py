@@ -0,0 +1,53 @@
+"""
+Pool bytearray yang dipakai ulang untuk buffer frame di sisi penerima.
+Mengurangi alokasi per frame: buffer frame yang sudah selesai/dibuang kembali ke
+pool dan dipakai lagi untuk frame berikutnya.
+"""
+import sys
+
+
+class BufferPool:
+    """
+    - acquire(size): ambil bytearray dengan panjang >= size.
+    - release(buf): kembalikan buffer yang tidak dipakai lagi.
+    - lend(buf): tandai buffer sedang dipegang konsumen (misal memoryview frame
+      terbaru); buffer baru dipakai ulang setelah tidak ada lagi yang
+      mereferensikannya, jadi konsumen tidak pernah melihat frame tertimpa.
+    """
+    def __init__(self, buffer_size=65536, max_free=16, max_lent=64):
+        self.buffer_size = buffer_size
+        self.max_free = max_free
+        self.max_lent = max_lent
+        self.free = []
+        self.lent = []
+        self.stats = {'allocated': 0, 'reused': 0}
+
+    def acquire(self, size):
+        if self.lent:
+            self._reclaim()
+        for i, buf in enumerate(self.free):
+            if len(buf) >= size:
+                self.stats['reused'] += 1
+                return self.free.pop(i)
+        self.stats['allocated'] += 1
+        return bytearray(max(size, self.buffer_size))
+
+    def release(self, buf):
+        if len(self.free) < self.max_free:
+            self.free.append(buf)
+
+    def lend(self, buf):
+        self.lent.append(buf)
+        if len(self.lent) > self.max_lent:
+            # Konsumen menahan terlalu banyak frame, serahkan sisanya ke GC
+            del self.lent[0]
+
+    def _reclaim(self):
+        still_lent = []
+        for buf in self.lent:
+            # Referensi: list self.lent + variabel loop + argumen getrefcount
+            if sys.getrefcount(buf) <= 3:
+                self.release(buf)
+            else:
+                still_lent.append(buf)
+        self.lent = still_lent
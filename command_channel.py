@@ -0,0 +1,245 @@
+"""
+Kanal perintah TCP persisten antara PC/WebServer dan MaixCam.
+- Satu koneksi dipakai terus (tidak connect per tombol), TCP_NODELAY aktif.
+- Framing: length(2) seq(4) + body. Balasan membawa seq yang sama, jadi
+  beberapa request bisa dikirim beruntun (pipelined) sebelum balasan datang.
+- CommandClient reconnect otomatis jika koneksi putus.
+- CommandServer (sisi MaixCam) melayani beberapa klien persisten sekaligus.
+"""
+import socket
+import struct
+import threading
+import time
+import _thread
+
+FRAME = struct.Struct('>HI')
+MAX_BODY = 0xFFFF
+
+
+def _recv_exact(sock, size):
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Koneksi ditutup")
+        data += chunk
+    return data
+
+
+def read_frame(sock):
+    """Baca satu frame, return (seq, body)"""
+    length, seq = FRAME.unpack(_recv_exact(sock, FRAME.size))
+    return seq, _recv_exact(sock, length) if length else b''
+
+
+def pack_frame(seq, body):
+    if len(body) > MAX_BODY:
+        raise ValueError("Body perintah terlalu besar")
+    return FRAME.pack(len(body), seq & 0xFFFFFFFF) + body
+
+
+class PendingReply:
+    """Handle balasan untuk satu request yang sudah dikirim"""
+    def __init__(self, seq):
+        self.seq = seq
+        self.event = threading.Event()
+        self.body = None
+        self.error = None
+        self.sent_time = time.time()
+
+    def wait(self, timeout=None):
+        if not self.event.wait(timeout):
+            raise TimeoutError("Tidak ada balasan untuk seq {}".format(self.seq))
+        if self.error is not None:
+            raise self.error
+        return self.body
+
+
+class CommandClient:
+    """
+    - submit(body): kirim request tanpa menunggu, return PendingReply (pipelining).
+    - wait(reply): tunggu balasan; jika timeout, request dilupakan dan balasan
+      yang datang terlambat dibuang.
+    - request(body): kirim dan tunggu balasan.
+    Thread-safe: boleh dipanggil dari banyak thread (misal request Flask).
+    """
+    def __init__(self, host, port, timeout=1.0, reconnect_interval=0.5):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.reconnect_interval = reconnect_interval
+        self.sock = None
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.next_seq = 0
+        self.last_attempt = 0
+        self.stats = {'requests': 0, 'reconnects': 0, 'rtt': 0.0}
+
+    def _connect(self):
+        now = time.time()
+        if now - self.last_attempt < self.reconnect_interval:
+            raise ConnectionError("Menunggu reconnect ke {}:{}".format(self.host, self.port))
+        self.last_attempt = now
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.settimeout(None)
+        self.sock = sock
+        self.stats['reconnects'] += 1
+        threading.Thread(target=self._read_replies, args=(sock,), daemon=True).start()
+
+    def _read_replies(self, sock):
+        try:
+            while True:
+                seq, body = read_frame(sock)
+                with self.lock:
+                    reply = self.pending.pop(seq, None)
+                if reply is not None:
+                    self.stats['rtt'] = time.time() - reply.sent_time
+                    reply.body = body
+                    reply.event.set()
+        except Exception as e:
+            self._disconnect(sock, e)
+
+    def _disconnect(self, sock, error):
+        with self.lock:
+            if self.sock is sock:
+                self.sock = None
+            failed = list(self.pending.values())
+            self.pending.clear()
+        try:
+            sock.close()
+        except Exception:
+            pass
+        for reply in failed:
+            reply.error = ConnectionError("Koneksi perintah putus: {}".format(error))
+            reply.event.set()
+
+    def submit(self, body):
+        with self.lock:
+            if self.sock is None:
+                self._connect()
+            sock = self.sock
+            seq = self.next_seq
+            self.next_seq = (self.next_seq + 1) & 0xFFFFFFFF
+            reply = PendingReply(seq)
+            self.pending[seq] = reply
+            try:
+                sock.sendall(pack_frame(seq, body))
+            except Exception:
+                self.pending.pop(seq, None)
+                self.sock = None
+                sock.close()
+                raise
+            self.stats['requests'] += 1
+        return reply
+
+    def wait(self, reply, timeout=None):
+        try:
+            return reply.wait(self.timeout if timeout is None else timeout)
+        except TimeoutError:
+            with self.lock:
+                if self.pending.get(reply.seq) is reply:
+                    del self.pending[reply.seq]
+            raise
+
+    def request(self, body, timeout=None):
+        return self.wait(self.submit(body), timeout)
+
+    def close(self):
+        with self.lock:
+            sock, self.sock = self.sock, None
+        if sock is not None:
+            self._disconnect(sock, "ditutup")
+
+
+_shared_clients = {}
+_shared_lock = threading.Lock()
+
+
+def shared_client(host, port):
+    """CommandClient bersama per (host, port), dipakai ulang antar request web"""
+    with _shared_lock:
+        client = _shared_clients.get((host, port))
+        if client is None:
+            client = CommandClient(host, port, timeout=0.5)
+            _shared_clients[(host, port)] = client
+        return client
+
+
+class CommandServer:
+    """
+    Server perintah di MaixCam: satu thread per klien persisten.
+    handler(body) -> body balasan (bytes), dipanggil untuk setiap request.
+    error_reply(body) -> body balasan jika handler gagal, agar klien tetap
+    menerima balasan yang bisa di-decode (misal commands.encode_error_reply).
+    """
+    def __init__(self, port, handler, max_clients=8, error_reply=None):
+        self.port = port
+        self.handler = handler
+        self.error_reply = error_reply
+        self.max_clients = max_clients
+        self.running = False
+        self.sock = None
+        self.clients = {}
+        self.clients_lock = _thread.allocate_lock()
+
+    def start(self):
+        self.running = True
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(("0.0.0.0", self.port))
+        self.sock.listen(self.max_clients)
+        self.sock.settimeout(0.5)
+        _thread.start_new_thread(self._accept_loop, ())
+
+    def _accept_loop(self):
+        while self.running:
+            try:
+                conn, addr = self.sock.accept()
+            except socket.timeout:
+                continue
+            except Exception as e:
+                if self.running:
+                    print("⚠️ Error koneksi TCP:", str(e))
+                    time.sleep(0.05)
+                continue
+
+            with self.clients_lock:
+                if len(self.clients) >= self.max_clients:
+                    conn.close()
+                    continue
+                self.clients[addr] = conn
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            conn.settimeout(None)
+            print("📩 Koneksi perintah dari:", addr)
+            _thread.start_new_thread(self._serve_client, (conn, addr))
+
+    def _serve_client(self, conn, addr):
+        try:
+            while self.running:
+                seq, body = read_frame(conn)
+                try:
+                    reply = self.handler(body)
+                except Exception as e:
+                    print("⚠️ Error parsing perintah:", str(e))
+                    reply = self.error_reply(body) if self.error_reply else b"ERROR"
+                conn.sendall(pack_frame(seq, reply))
+        except Exception:
+            pass  # Klien menutup koneksi
+        finally:
+            with self.clients_lock:
+                self.clients.pop(addr, None)
+            conn.close()
+            print("🔌 Koneksi perintah ditutup:", addr)
+
+    def stop(self):
+        self.running = False
+        if self.sock:
+            self.sock.close()
+        with self.clients_lock:
+            for conn in self.clients.values():
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            self.clients.clear()
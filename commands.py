@@ -0,0 +1,309 @@
+"""
+Codec perintah biner untuk kanal perintah (lihat command_channel.py).
+Dipakai bersama oleh WebServer.py, AsyncWebServer.py, PC.py dan kedua Maixcam.py.
+
+Request (16 byte): version(1) op(1) client_id(2) seq(4) a(4) b(4)
+    MOVE  a=dx b=dy   geser relatif
+    SET   a=x  b=y    set posisi absolut
+    STOP              hentikan gerakan, balas posisi saat ini
+    QUERY             baca posisi saat ini
+    TIME              baca jam MaixCam (sinkronisasi jam, lihat latency.py)
+Reply (16 byte):   version(1) status(1) client_id(2) seq(4) x(4) y(4)
+Reply TIME:        version(1) status(1) client_id(2) seq(4) server_ts_us(8)
+
+seq per klien membuat retry idempotent: MaixCam mengingat balasan beberapa
+seq terakhir per client_id dan mengirim ulang balasan itu tanpa menerapkan
+perintah dua kali.
+"""
+import random
+import struct
+import threading
+import time
+
+from command_channel import shared_client
+
+VERSION = 1
+
+REQUEST = struct.Struct('>BBHIii')
+REPLY = struct.Struct('>BBHIii')
+TIME_REPLY = struct.Struct('>BBHIQ')  # Ukuran sama dengan REPLY
+
+OP_MOVE = 1
+OP_SET = 2
+OP_STOP = 3
+OP_QUERY = 4
+OP_TIME = 5
+OPS = (OP_MOVE, OP_SET, OP_STOP, OP_QUERY, OP_TIME)
+OP_NAMES = {OP_MOVE: 'MOVE', OP_SET: 'SET', OP_STOP: 'STOP', OP_QUERY: 'QUERY', OP_TIME: 'TIME'}
+
+STATUS_OK = 0
+STATUS_DUPLICATE = 1  # Seq sudah pernah diterapkan, balasan lama dikirim ulang
+STATUS_STALE = 2      # Seq terlalu lama, tidak diterapkan
+STATUS_ERROR = 3
+RETRY_DELAY = 0.05  # Jeda sebelum retry perintah (detik)
+
+STATUS_NAMES = {STATUS_OK: 'OK', STATUS_DUPLICATE: 'DUPLICATE', STATUS_STALE: 'STALE', STATUS_ERROR: 'ERROR'}
+
+# Arah tombol (web dan GUI) -> delta
+DIRECTIONS = {
+    'RIGHT': (1, 0), 'LEFT': (-1, 0), 'UP': (0, 1), 'DOWN': (0, -1),
+    'KANAN': (1, 0), 'KIRI': (-1, 0), 'ATAS': (0, 1), 'BAWAH': (0, -1),
+}
+
+
+def applied(status):
+    """True jika perintah sudah diterapkan MaixCam (sekarang atau sebelumnya untuk retry)"""
+    return status in (STATUS_OK, STATUS_DUPLICATE)
+
+
+def encode_request(op, client_id, seq, a=0, b=0):
+    return REQUEST.pack(VERSION, op, client_id, seq & 0xFFFFFFFF, a, b)
+
+
+def decode_request(body):
+    """Return (op, client_id, seq, a, b), ValueError jika tidak valid"""
+    if len(body) != REQUEST.size:
+        raise ValueError("Panjang perintah tidak valid: {}".format(len(body)))
+    version, op, client_id, seq, a, b = REQUEST.unpack(body)
+    if version != VERSION or op not in OPS:
+        raise ValueError("Perintah tidak dikenal: v{} op {}".format(version, op))
+    return op, client_id, seq, a, b
+
+
+def encode_reply(status, client_id, seq, x, y):
+    return REPLY.pack(VERSION, status, client_id, seq & 0xFFFFFFFF, x, y)
+
+
+def encode_error_reply(body, x=0, y=0):
+    """Balasan STATUS_ERROR untuk request yang gagal diproses, client_id/seq diambil dari body jika ada"""
+    client_id = seq = 0
+    if len(body) >= 8:
+        _, _, client_id, seq = struct.unpack_from('>BBHI', body)
+    return encode_reply(STATUS_ERROR, client_id, seq, x, y)
+
+
+def decode_reply(body):
+    """Return (status, client_id, seq, x, y)"""
+    if len(body) != REPLY.size:
+        raise ValueError("Balasan tidak valid: {!r}".format(bytes(body[:16])))
+    version, status, client_id, seq, x, y = REPLY.unpack(body)
+    if version != VERSION:
+        raise ValueError("Versi balasan tidak dikenal: {}".format(version))
+    return status, client_id, seq, x, y
+
+
+def encode_time_reply(client_id, seq, server_ts_us):
+    return TIME_REPLY.pack(VERSION, STATUS_OK, client_id, seq & 0xFFFFFFFF, server_ts_us)
+
+
+def decode_time_reply(body):
+    """Return server_ts_us (mikrodetik, jam MaixCam)"""
+    if len(body) != TIME_REPLY.size:
+        raise ValueError("Balasan TIME tidak valid: {!r}".format(bytes(body[:16])))
+    version, status, _, _, server_ts_us = TIME_REPLY.unpack(body)
+    if version != VERSION or status != STATUS_OK:
+        raise ValueError("Balasan TIME gagal: v{} status {}".format(version, status))
+    return server_ts_us
+
+
+class CommandDeduper:
+    """
+    Sisi MaixCam: ingat balasan `window` seq terakhir per client_id.
+    lookup() return balasan (bytes) jika perintah tidak boleh diterapkan lagi.
+    """
+    def __init__(self, window=32):
+        self.window = window
+        self.clients = {}  # client_id -> {'last': seq tertinggi, 'replies': {seq: reply}}
+
+    def lookup(self, client_id, seq, x, y):
+        state = self.clients.get(client_id)
+        if state is None:
+            return None
+        reply = state['replies'].get(seq)
+        if reply is not None:
+            return encode_reply(STATUS_DUPLICATE, client_id, seq, *REPLY.unpack(reply)[4:])
+        behind = (state['last'] - seq) & 0xFFFFFFFF
+        if 0 < behind < 0x80000000:
+            return encode_reply(STATUS_STALE, client_id, seq, x, y)
+        return None
+
+    def store(self, client_id, seq, reply):
+        state = self.clients.setdefault(client_id, {'last': seq, 'replies': {}})
+        state['last'] = seq
+        replies = state['replies']
+        replies[seq] = reply
+        if len(replies) > self.window:
+            del replies[next(iter(replies))]
+
+
+def parse_web_command(data):
+    """
+    Terjemahkan body /direction dari web menjadi (op, a, b), None jika kosong.
+    - {'direction': 'RIGHT', 'steps': 20}  -> MOVE 20 0
+    - {'direction': 'STOP'}                -> STOP
+    - {'dx': 5, 'dy': -2}                  -> MOVE 5 -2
+    - {'x': 10, 'y': 3}                    -> SET 10 3
+    ValueError jika angka tidak valid.
+    """
+    direction = data.get('direction')
+    if direction in DIRECTIONS:
+        steps = int(data.get('steps', 1))
+        dx, dy = DIRECTIONS[direction]
+        return OP_MOVE, dx * steps, dy * steps
+    if direction in ('STOP', 'BERHENTI'):
+        return OP_STOP, 0, 0
+    if 'dx' in data or 'dy' in data:
+        return OP_MOVE, int(data.get('dx', 0)), int(data.get('dy', 0))
+    if 'x' in data and 'y' in data:
+        return OP_SET, int(data['x']), int(data['y'])
+    if direction:
+        raise ValueError("Arah tidak dikenal: {}".format(direction))
+    return None
+
+
+def apply_command(op, a, b, x, y):
+    """Hitung posisi baru untuk satu perintah, return (x, y)"""
+    if op == OP_MOVE:
+        return x + a, y + b
+    if op == OP_SET:
+        return a, b
+    return x, y  # STOP dan QUERY tidak mengubah posisi
+
+
+class CommandSession:
+    """
+    Sisi klien: kirim perintah biner lewat CommandClient dengan seq per klien.
+    Retry (timeout/putus) memakai seq yang sama sehingga aman diulang.
+    Seq dibuat dan dikirim di bawah lock yang sama, jadi perintah dari banyak
+    thread sampai di MaixCam berurutan seq (tidak ada yang dianggap STALE).
+    on_rtt(detik) (opsional) dipanggil dengan RTT setiap perintah yang dibalas.
+    """
+    def __init__(self, client, client_id=None, retries=2):
+        self.client = client
+        self.client_id = random.getrandbits(16) if client_id is None else client_id
+        self.retries = retries
+        self.on_rtt = None
+        self.seq = 0
+        self.lock = threading.Lock()
+
+    def _submit(self, op, a=0, b=0, body=None):
+        """Kirim request (body None = seq baru), return (body, PendingReply)"""
+        with self.lock:
+            if body is None:
+                self.seq = (self.seq + 1) & 0xFFFFFFFF
+                body = encode_request(op, self.client_id, self.seq, a, b)
+            return body, self.client.submit(body)
+
+    def call(self, op, a=0, b=0):
+        """Kirim perintah, return (status, x, y)"""
+        body = None
+        for attempt in range(self.retries + 1):
+            try:
+                start = time.time()
+                body, pending = self._submit(op, a, b, body)
+                reply = self.client.wait(pending)
+                if self.on_rtt is not None:
+                    self.on_rtt(time.time() - start)
+                status, _, _, x, y = decode_reply(reply)
+                return status, x, y
+            except (TimeoutError, ConnectionError):
+                if attempt == self.retries:
+                    raise
+                time.sleep(RETRY_DELAY)
+
+    def deadline(self):
+        """Waktu terlama call() sebelum menyerah (detik): connect + balasan di setiap percobaan, plus jeda retry"""
+        return (self.retries + 1) * 2 * self.client.timeout + self.retries * RETRY_DELAY
+
+    def move(self, dx, dy):
+        return self.call(OP_MOVE, dx, dy)
+
+    def set(self, x, y):
+        return self.call(OP_SET, x, y)
+
+    def stop(self):
+        return self.call(OP_STOP)
+
+    def query(self):
+        return self.call(OP_QUERY)
+
+    def server_time(self, timeout=1.0):
+        """Satu pertukaran jam, return (t_kirim, server_ts_us, t_terima) dengan jam lokal dalam detik"""
+        sent = time.time()
+        _, pending = self._submit(OP_TIME)
+        body = self.client.wait(pending, timeout)
+        received = time.time()
+        return sent, decode_time_reply(body), received
+
+
+class PendingMove:
+    """Handle satu batch MOVE gabungan"""
+    def __init__(self):
+        self.dx = 0
+        self.dy = 0
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+    def wait(self, timeout=None):
+        """Return (status, x, y) dari MaixCam setelah batch diterapkan"""
+        if not self.event.wait(timeout):
+            raise TimeoutError("MOVE belum dibalas")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class MoveCoalescer:
+    """
+    Gabungkan klik beruntun menjadi satu MOVE dx dy.
+    move() langsung return PendingMove; klik yang datang dalam `window` detik
+    masuk ke batch yang sama. on_reply(status, x, y) dipanggil setiap batch selesai.
+    """
+    def __init__(self, session, window=0.03, on_reply=None):
+        self.session = session
+        self.window = window
+        self.on_reply = on_reply
+        self.lock = threading.Lock()
+        self.batch = None
+
+    def move(self, dx, dy):
+        with self.lock:
+            batch = self.batch
+            if batch is None:
+                batch = self.batch = PendingMove()
+                threading.Thread(target=self._flush, daemon=True).start()
+            batch.dx += dx
+            batch.dy += dy
+        return batch
+
+    def deadline(self):
+        """Waktu terlama sampai PendingMove selesai: jendela batch + CommandSession.deadline()"""
+        return self.window + self.session.deadline()
+
+    def _flush(self):
+        time.sleep(self.window)
+        with self.lock:
+            batch, self.batch = self.batch, None
+        try:
+            batch.result = self.session.move(batch.dx, batch.dy)
+            if self.on_reply is not None:
+                self.on_reply(*batch.result)
+        except Exception as e:
+            batch.error = e
+        batch.event.set()
+
+
+_shared_sessions = {}
+_shared_lock = threading.Lock()
+
+
+def shared_session(host, port):
+    """(CommandSession, MoveCoalescer) bersama per (host, port) untuk server web"""
+    with _shared_lock:
+        entry = _shared_sessions.get((host, port))
+        if entry is None:
+            session = CommandSession(shared_client(host, port))
+            entry = (session, MoveCoalescer(session))
+            _shared_sessions[(host, port)] = entry
+        return entry
@@ -0,0 +1,41 @@
+"""
+Forward error correction (FEC) XOR untuk stream video UDP.
+- Pengirim menambahkan parity_count chunk parity per frame.
+- Chunk data ke-i masuk grup (i % parity_count), jadi grup saling
+  berselang-seling dan loss beruntun (burst) tersebar ke grup berbeda.
+- Penerima bisa membangun ulang satu chunk yang hilang per grup tanpa round trip.
+Payload chunk parity = 1 byte parity_count + XOR semua chunk data grup
+(chunk terakhir di-pad nol sampai chunk_size).
+"""
+from protocol import chunk_count_for
+
+
+def build_parity(data, chunk_size, parity_count):
+    """Buat daftar payload chunk parity untuk satu frame"""
+    num_chunks = chunk_count_for(len(data), chunk_size)
+    groups = min(parity_count, num_chunks)
+    if groups <= 0:
+        return []
+    # XOR sebagai integer little-endian: padding nol di akhir chunk terjadi otomatis
+    acc = [0] * groups
+    for i in range(num_chunks):
+        acc[i % groups] ^= int.from_bytes(data[i * chunk_size:(i + 1) * chunk_size], 'little')
+    prefix = bytes((groups,))
+    return [prefix + value.to_bytes(chunk_size, 'little') for value in acc]
+
+
+def parity_groups(parity_payload):
+    """Jumlah grup parity yang tercatat di payload parity"""
+    return parity_payload[0]
+
+
+def recover_chunk(parity_payload, group_chunks, length):
+    """
+    Bangun ulang chunk yang hilang dari parity dan chunk lain di grupnya.
+    length = panjang asli chunk yang hilang (chunk terakhir bisa lebih pendek).
+    """
+    chunk_size = len(parity_payload) - 1
+    value = int.from_bytes(parity_payload[1:], 'little')
+    for chunk in group_chunks:
+        value ^= int.from_bytes(chunk, 'little')
+    return value.to_bytes(chunk_size, 'little')[:length]
@@ -0,0 +1,236 @@
+"""
+Ring frame di multiprocessing.shared_memory: satu penulis (penerima), banyak
+pembaca (streamer HTTP, GUI, recorder, proses analitik) tanpa pickle, salinan
+atau lock di jalur panas.
+
+Layout (little-endian):
+- header ring (64 byte): magic, versi layout, jumlah slot, kapasitas slot,
+  counter frame terbaru (head)
+- per slot: seq (u64), metadata frame, lalu data frame
+Setiap slot dilindungi seqlock: penulis menaikkan seq menjadi ganjil, menulis
+data dan metadata, lalu menaikkan seq menjadi genap; baru setelah itu head
+menunjuk ke frame itu. Pembaca mengambil seq (genap) bersama view data,
+memakai data langsung dari shared memory, lalu FrameRef.valid() memastikan
+slot tidak ditimpa selama dipakai (jika tidak valid, buang hasilnya). Frame
+ke-n ditulis ke slot n % slots, jadi view tetap utuh selama `slots - 1`
+frame berikutnya.
+
+Data bisa JPEG (channels 0) atau piksel mentah (width x height x channels).
+
+Contoh pembaca di proses lain:
+    ring = FrameRing.attach('maixcam_9001_1')
+    ref = ring.latest()
+    if ref is not None:
+        jpeg = bytes(ref.data)
+        if ref.valid():
+            ...
+    python frame_ring.py maixcam_9001_1   # cek ring: fps, ukuran, frame terlewat
+"""
+import os
+import struct
+import sys
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+MAGIC = b'FRNG'
+LAYOUT_VERSION = 1
+RING = struct.Struct('<4sHHIIQ')    # magic, versi, cadangan, slots, slot_size, head
+RING_SIZE = 64
+SEQ = struct.Struct('<Q')
+# counter, size, width, height, channels, frame_id, capture_ts_us, first_seen, completed, written
+META = struct.Struct('<QIHHBxxxIQddd')
+SLOT_HEADER = 128
+HEAD_OFFSET = RING.size - 8
+STALE_AFTER = 5.0  # Ring dengan nama sama tanpa frame baru selama ini dianggap sisa proses mati
+
+
+# Python < 3.13 selalu mendaftarkan segmen ke resource_tracker, juga saat hanya
+# attach, lalu menghapus segmen itu saat proses pembaca keluar
+TRACKS_ATTACH = sys.version_info < (3, 13) and os.name == 'posix'
+
+
+def _open_shared(name):
+    """Buka shared memory milik proses lain tanpa didaftarkan ke resource_tracker"""
+    if not TRACKS_ATTACH:
+        try:
+            return shared_memory.SharedMemory(name, track=False)  # Python 3.13+
+        except TypeError:
+            return shared_memory.SharedMemory(name)  # Windows < 3.13: tanpa resource_tracker
+    shm = shared_memory.SharedMemory(name)
+    resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
+
+
+class FrameRef:
+    """Frame di ring: data = memoryview ke shared memory (tanpa salinan)"""
+    __slots__ = ('ring', 'offset', 'seq', 'counter', 'width', 'height', 'channels', 'frame_id',
+                 'capture_ts_us', 'first_seen', 'completed', 'written', 'data')
+
+    def valid(self):
+        """True jika slot tidak ditimpa sejak frame ini diambil"""
+        return SEQ.unpack_from(self.ring.buf, self.offset)[0] == self.seq
+
+    def release(self):
+        self.data.release()
+
+
+class FrameRing:
+    """
+    - FrameRing.create(name, slots, slot_size): penulis, pemilik segmen. Segmen lama
+      dengan nama sama hanya dihapus jika sudah STALE_AFTER detik tidak ditulis.
+    - FrameRing.attach(name): pembaca di proses lain.
+    - write(data, ...): tulis satu frame, return counter (None jika lebih besar dari slot).
+    - latest() / get(counter): FrameRef atau None.
+    """
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.owner = owner
+        self.buf = shm.buf
+        magic, version, _, self.slots, self.slot_size, self.head = RING.unpack_from(self.buf, 0)
+        if magic != MAGIC or version != LAYOUT_VERSION:
+            raise ValueError("Bukan ring frame: {}".format(shm.name))
+        self.stride = (SLOT_HEADER + self.slot_size + 63) // 64 * 64
+        self.oversize = 0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @classmethod
+    def create(cls, name, slots=8, slot_size=512 * 1024):
+        if slots < 2:
+            raise ValueError("Ring butuh minimal 2 slot")
+        stride = (SLOT_HEADER + slot_size + 63) // 64 * 64
+        try:
+            shm = shared_memory.SharedMemory(name, create=True, size=RING_SIZE + slots * stride)
+        except FileExistsError:
+            # Sisa proses sebelumnya yang tidak sempat unlink; ring yang masih ditulis
+            # tidak dihapus, pembacanya akan kehilangan segmen yang sedang dipakai
+            stale = shared_memory.SharedMemory(name)
+            written = cls._last_write(stale)
+            stale.close()
+            if written is not None and time.time() - written < STALE_AFTER:
+                raise FileExistsError("Ring {} masih ditulis proses lain".format(name))
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name, create=True, size=RING_SIZE + slots * stride)
+        RING.pack_into(shm.buf, 0, MAGIC, LAYOUT_VERSION, 0, slots, slot_size, 0)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def _last_write(cls, shm):
+        """Waktu tulis frame terbaru di segmen, None jika bukan ring atau belum ada frame"""
+        try:
+            ring = cls(shm, owner=False)
+        except (ValueError, struct.error):
+            return None
+        ref = ring.latest()
+        ring.buf = None
+        if ref is None:
+            return None
+        ref.release()
+        return ref.written
+
+    @classmethod
+    def attach(cls, name):
+        return cls(_open_shared(name), owner=False)
+
+    def _slot(self, counter):
+        return RING_SIZE + (counter % self.slots) * self.stride
+
+    def write(self, data, width=0, height=0, channels=0, frame_id=0, capture_ts_us=0,
+              first_seen=0.0, completed=0.0):
+        data = memoryview(data).cast('B')
+        size = data.nbytes
+        if size > self.slot_size:
+            self.oversize += 1
+            return None
+        buf = self.buf
+        counter = self.head + 1
+        offset = self._slot(counter)
+        seq = SEQ.unpack_from(buf, offset)[0] + 1
+        SEQ.pack_into(buf, offset, seq)  # Ganjil: slot sedang ditulis
+        start = offset + SLOT_HEADER
+        buf[start:start + size] = data
+        META.pack_into(buf, offset + SEQ.size, counter, size, width, height, channels, frame_id,
+                       capture_ts_us, first_seen, completed, time.time())
+        SEQ.pack_into(buf, offset, seq + 1)
+        struct.pack_into('<Q', buf, HEAD_OFFSET, counter)
+        self.head = counter
+        return counter
+
+    def head_counter(self):
+        """Counter frame terbaru (0 = belum ada frame)"""
+        return struct.unpack_from('<Q', self.buf, HEAD_OFFSET)[0]
+
+    def latest(self):
+        return self.get(self.head_counter())
+
+    def get(self, counter):
+        """FrameRef untuk frame `counter`, None jika belum ada, sedang ditulis atau sudah ditimpa"""
+        if counter <= 0:
+            return None
+        buf = self.buf
+        offset = self._slot(counter)
+        seq = SEQ.unpack_from(buf, offset)[0]
+        if seq & 1:
+            return None
+        meta = META.unpack_from(buf, offset + SEQ.size)
+        if meta[0] != counter or SEQ.unpack_from(buf, offset)[0] != seq:
+            return None
+        ref = FrameRef()
+        ref.ring = self
+        ref.offset = offset
+        ref.seq = seq
+        (ref.counter, size, ref.width, ref.height, ref.channels, ref.frame_id, ref.capture_ts_us,
+         ref.first_seen, ref.completed, ref.written) = meta
+        start = offset + SLOT_HEADER
+        ref.data = buf[start:start + size]
+        return ref
+
+    def close(self):
+        """Lepaskan semua FrameRef.data sebelum close; pemilik juga menghapus segmen"""
+        self.buf = None
+        self.shm.close()
+        if self.owner:
+            if TRACKS_ATTACH:
+                # Pembaca yang memakai resource_tracker yang sama (proses anak) ikut menghapus
+                # pendaftaran segmen saat attach; daftarkan lagi agar unlink() tidak gagal di tracker
+                resource_tracker.register(self.shm._name, 'shared_memory')
+            self.shm.unlink()
+
+
+def main():
+    # Pembaca contoh: statistik ring dari proses lain
+    ring = FrameRing.attach(sys.argv[1])
+    print("🔗 Ring {}: {} slot x {} byte".format(ring.name, ring.slots, ring.slot_size))
+    last = ring.head_counter()
+    frames = skipped = torn = 0
+    started = time.time()
+    try:
+        while True:
+            time.sleep(0.005)
+            head = ring.head_counter()
+            if head == last:
+                continue
+            skipped += head - last - 1
+            last = head
+            ref = ring.get(head)
+            if ref is None:
+                torn += 1
+                continue
+            size = ref.data.nbytes
+            ref.release()
+            frames += 1
+            if time.time() - started >= 1.0:
+                print("📊 {:.1f} fps, {} byte, frame {}, terlewat {}, tertimpa {}".format(
+                    frames / (time.time() - started), size, head, skipped, torn))
+                frames = skipped = torn = 0
+                started = time.time()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ring.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+"""
+Pengirim frame JPEG sebagai chunk UDP untuk MaixCam (format lihat protocol.py).
+Dipakai bersama oleh Maixcam.py dan Peer2Peer/Maixcam.py.
+
+Jalur kirim tanpa alokasi per chunk: JPEG disalin sekali ke slot buffer yang
+dipakai ulang (sekaligus ring retransmisi), memoryview setiap chunk dihitung
+saat slot dialokasikan, header ditulis ke buffer tetap (pack_into), lalu
+header + payload dikirim dengan scatter/gather (socket.sendmsg) lewat list
+iov yang sama untuk semua chunk.
+Dengan pacer (pacing.py) datagram satu frame disebar ke sebagian interval frame
+agar burst tidak memenuhi buffer penerima.
+"""
+import socket
+import time
+import _thread as threading
+
+from fec import build_parity
+from pacing import RateMeter
+from protocol import (FLAG_PARITY, FLAG_RETRANSMIT, HEADER_SIZE, MSG_FEEDBACK, MSG_NACK,
+                      pack_chunk_index_into, pack_header_into, parse_control, parse_feedback,
+                      timestamp_us)
+
+
+class _SendSlot:
+    """Buffer satu frame yang dipakai ulang + memoryview per chunk"""
+    __slots__ = ('buf', 'views', 'tail', 'full', 'size', 'num_chunks', 'frame_id',
+                 'capture_ts', 'send_delay', 'flags', 'sent_time')
+
+    def __init__(self):
+        self.buf = bytearray(0)
+        self.views = []
+        self.tail = None
+        self.full = 0
+        self.size = 0
+        self.num_chunks = 0
+        self.frame_id = None
+        self.capture_ts = 0
+        self.send_delay = 0
+        self.flags = 0
+        self.sent_time = 0
+
+    def load(self, data, chunk_size):
+        size = len(data)
+        if size > len(self.buf):
+            # Jarang terjadi (kualitas/resolusi naik): alokasi 1.5x agar tidak sering tumbuh
+            capacity = (size + (size >> 1) + chunk_size - 1) // chunk_size * chunk_size
+            self.buf = bytearray(capacity)
+            view = memoryview(self.buf)
+            self.views = [view[i:i + chunk_size] for i in range(0, capacity, chunk_size)]
+        self.buf[:size] = data
+        self.size = size
+        self.full, tail_size = divmod(size, chunk_size)
+        self.tail = self.views[self.full][:tail_size] if tail_size else None
+        self.num_chunks = self.full + (1 if tail_size else 0)
+
+    def chunk(self, i):
+        return self.views[i] if i < self.full else self.tail
+
+
+class FrameSender:
+    """
+    - send_frame(): kirim semua chunk data (+ parity FEC opsional) satu frame.
+    - serve_feedback(): loop penerima NACK dari penerima (jalankan di thread
+      sendiri), kirim ulang hanya chunk yang hilang selama belum lewat nack_deadline.
+      Laporan MSG_FEEDBACK diteruskan ke on_feedback(feedback) (lihat rate_control.py).
+    Beberapa frame terakhir disimpan di slot ring untuk retransmisi.
+    """
+    def __init__(self, sock, addr, chunk_size=1400, fec_parity=0, history=4, nack_deadline=0.06,
+                 on_feedback=None, pacer=None, stream_id=0):
+        self.sock = sock
+        self.addr = addr
+        self.chunk_size = chunk_size
+        self.fec_parity = fec_parity
+        self.history = history              # Jumlah frame yang disimpan untuk retransmisi
+        self.nack_deadline = nack_deadline  # Detik setelah kirim, lewat ini NACK diabaikan
+        self.on_feedback = on_feedback
+        self.pacer = pacer      # FramePacer opsional, None = kirim beruntun
+        self.stream_id = stream_id  # Id kamera di header (0 = penerima memakai alamat sumber)
+        self.meter = RateMeter()
+        self.running = False
+        self.slots = [_SendSlot() for _ in range(max(history, 1))]
+        self.next_slot = 0
+        self.ring = {}          # frame_id -> _SendSlot yang masih bisa di-retransmit
+        self.ring_lock = threading.allocate_lock()
+        self.stats = {'nacks': 0, 'retransmitted': 0, 'expired': 0, 'feedback': 0, 'send_rate': 0.0}
+
+        # Header dan iov terpisah untuk thread kirim dan thread retransmisi
+        self._header = bytearray(HEADER_SIZE)
+        self._retx_header = bytearray(HEADER_SIZE)
+        self._iov = [self._header, None]
+        self._retx_iov = [self._retx_header, None]
+        self._use_sendmsg = hasattr(sock, 'sendmsg')
+
+    def _send(self, iov):
+        """Kirim satu datagram iov[0] (header) + iov[1] (payload) tanpa menggabungkan buffer"""
+        if self._use_sendmsg:
+            self.sock.sendmsg(iov, (), 0, self.addr)
+        else:
+            self.sock.sendto(bytes(iov[0]) + bytes(iov[1]), self.addr)
+
+    def _send_chunks(self, iov, slot, indices, pacer=None):
+        header = iov[0]
+        for i in indices:
+            pack_chunk_index_into(header, i)
+            payload = iov[1] = slot.chunk(i)
+            if pacer is not None:
+                pacer.pace(HEADER_SIZE + len(payload))
+            self._send(iov)
+
+    def send_frame(self, frame_id, data, capture_ts, flags=0, frame_interval=None):
+        """frame_interval (detik) dipakai pacer untuk menyebar chunk frame ini"""
+        chunk_size = self.chunk_size
+        with self.ring_lock:
+            # Slot tertua dipakai ulang, frame lamanya tidak bisa di-retransmit lagi
+            slot = self.slots[self.next_slot]
+            self.next_slot = (self.next_slot + 1) % len(self.slots)
+            if slot.frame_id is not None:
+                self.ring.pop(slot.frame_id, None)
+            slot.load(data, chunk_size)
+            slot.frame_id = frame_id
+            slot.capture_ts = capture_ts
+            slot.send_delay = timestamp_us() - capture_ts  # Capture -> mulai kirim (jam MaixCam)
+            slot.flags = flags
+            slot.sent_time = time.time()
+            if self.history:
+                self.ring[frame_id] = slot
+
+        total_size = slot.size
+        num_chunks = slot.num_chunks
+        iov = self._iov
+        header = self._header
+        pacer = self.pacer
+        wire_bytes = total_size + num_chunks * HEADER_SIZE
+        if self.fec_parity:
+            wire_bytes += self.fec_parity * (HEADER_SIZE + 1 + chunk_size)
+        if pacer is not None:
+            pacer.begin_frame(wire_bytes, frame_interval)
+
+        # Field header sama untuk semua chunk frame ini, hanya chunk_index yang berubah
+        pack_header_into(header, 0, frame_id, 0, num_chunks, total_size, capture_ts, flags,
+                         slot.send_delay, self.stream_id)
+        self._send_chunks(iov, slot, range(num_chunks), pacer)
+
+        # Kirim chunk parity FEC (opsional) setelah semua chunk data
+        if self.fec_parity:
+            pack_header_into(header, 0, frame_id, 0, num_chunks, total_size, capture_ts,
+                             flags | FLAG_PARITY, slot.send_delay, self.stream_id)
+            view = memoryview(slot.buf)[:total_size]
+            for j, parity in enumerate(build_parity(view, chunk_size, self.fec_parity)):
+                pack_chunk_index_into(header, j)
+                iov[1] = parity
+                if pacer is not None:
+                    pacer.pace(HEADER_SIZE + len(parity))
+                self._send(iov)
+        iov[1] = None
+        self.stats['send_rate'] = self.meter.add(wire_bytes)
+
+    def handle_nack(self, frame_id, indices):
+        """Kirim ulang chunk yang diminta, return jumlah chunk yang dikirim"""
+        self.stats['nacks'] += 1
+        # Lock ditahan selama kirim ulang agar slot tidak ditimpa frame baru
+        with self.ring_lock:
+            slot = self.ring.get(frame_id)
+            if slot is None or time.time() - slot.sent_time > self.nack_deadline:
+                self.stats['expired'] += 1
+                return 0
+
+            indices = [i for i in indices if i < slot.num_chunks]
+            pack_header_into(self._retx_header, 0, frame_id, 0, slot.num_chunks, slot.size,
+                             slot.capture_ts, slot.flags | FLAG_RETRANSMIT, slot.send_delay,
+                             self.stream_id)
+            self._send_chunks(self._retx_iov, slot, indices)
+            self._retx_iov[1] = None
+        self.stats['retransmitted'] += len(indices)
+        self.meter.add(len(indices) * (HEADER_SIZE + self.chunk_size))
+        return len(indices)
+
+    def serve_feedback(self):
+        """Loop penerima pesan kontrol (NACK, feedback) di socket UDP yang sama"""
+        self.running = True
+        self.sock.settimeout(0.2)
+        while self.running:
+            try:
+                packet, _ = self.sock.recvfrom(1024)
+            except socket.timeout:
+                continue
+            except Exception as e:
+                if not self.running:
+                    break
+                print("⚠️ Error feedback UDP:", str(e))
+                time.sleep(0.05)
+                continue
+
+            message = parse_control(packet)
+            if message is None:
+                continue
+            msg_type, frame_id, indices = message
+            if msg_type == MSG_NACK:
+                self.handle_nack(frame_id, indices)
+            elif msg_type == MSG_FEEDBACK and self.on_feedback is not None:
+                feedback = parse_feedback(packet)
+                if feedback is not None:
+                    self.stats['feedback'] += 1
+                    self.on_feedback(feedback)
+
+    def stop(self):
+        self.running = False
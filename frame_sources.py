@@ -0,0 +1,161 @@
+"""
+Sumber frame untuk VideoStreamSender (Maixcam.py dan Peer2Peer/Maixcam.py).
+Semua sumber punya antarmuka yang sama:
+    read() -> image atau None, set_resolution(width, height), close(), resolution
+- MaixCamSource: kamera MaixCam (butuh modul maix), image maix.
+- SyntheticSource: generator array numpy BGR dengan ukuran dan entropi yang bisa
+  diatur, untuk menjalankan/profiling pengirim di PC biasa tanpa kamera.
+- ReplaySource: putar ulang folder gambar atau file video (butuh OpenCV).
+Image maix di-encode dengan encoder maix, array numpy dengan OpenCV/Pillow
+(lihat jpeg_utils.JpegEncoder).
+"""
+import os
+
+try:
+    from maix import camera
+except ImportError:
+    camera = None  # Bukan di MaixCam: pakai SyntheticSource atau ReplaySource
+
+SOURCES = ('auto', 'maix', 'synthetic', 'replay')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+class MaixCamSource:
+    """Kamera MaixCam, dibuat ulang saat resolusi diganti"""
+    def __init__(self, width, height):
+        if camera is None:
+            raise RuntimeError("Modul maix tidak tersedia")
+        self.resolution = (width, height)
+        self.cam = camera.Camera(width, height)
+
+    def read(self):
+        return self.cam.read()
+
+    def set_resolution(self, width, height):
+        self.resolution = (width, height)
+        self.cam = camera.Camera(width, height)
+
+    def close(self):
+        self.cam = None
+
+
+class SyntheticSource:
+    """
+    Frame sintetis: gradien bergerak dicampur noise acak.
+    entropy 0.0 = gradien halus (JPEG kecil), 1.0 = noise penuh (JPEG besar),
+    jadi ukuran frame bisa disetel mendekati kamera sebenarnya.
+    """
+    def __init__(self, width, height, entropy=0.3, seed=0):
+        import numpy as np
+        self.np = np
+        self.entropy = entropy
+        self.rng = np.random.default_rng(seed)
+        self.frame_index = 0
+        self.set_resolution(width, height)
+
+    def set_resolution(self, width, height):
+        np = self.np
+        self.resolution = (width, height)
+        x = np.linspace(0, 255, width, dtype=np.float32)
+        y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+        self.base = np.stack([np.broadcast_to(x, (height, width)),
+                              np.broadcast_to(y, (height, width)),
+                              (x + y) / 2], axis=2)
+
+    def read(self):
+        np = self.np
+        width, height = self.resolution
+        frame = np.roll(self.base, self.frame_index * 4, axis=1)  # Gradien bergeser setiap frame
+        self.frame_index += 1
+        if self.entropy > 0:
+            noise = self.rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+            frame = frame * (1 - self.entropy) + noise * self.entropy
+        return frame.astype(np.uint8)
+
+    def close(self):
+        pass
+
+
+class ReplaySource:
+    """Putar ulang folder gambar (urut nama file) atau file video, diulang jika loop=True"""
+    def __init__(self, path, width, height, loop=True):
+        import cv2
+        self.cv2 = cv2
+        self.path = path
+        self.loop = loop
+        self.resolution = (width, height)
+        self.index = 0
+        self.capture = None
+        if os.path.isdir(path):
+            self.files = sorted(os.path.join(path, name) for name in os.listdir(path)
+                                if name.lower().endswith(IMAGE_EXTENSIONS))
+            if not self.files:
+                raise ValueError("Tidak ada gambar di {}".format(path))
+        else:
+            self.files = None
+            self.capture = cv2.VideoCapture(path)
+            if not self.capture.isOpened():
+                raise ValueError("Tidak bisa membuka video {}".format(path))
+
+    def _next_frame(self):
+        if self.files is not None:
+            if self.index >= len(self.files):
+                if not self.loop:
+                    return None
+                self.index = 0
+            frame = self.cv2.imread(self.files[self.index])
+            self.index += 1
+            return frame
+        ok, frame = self.capture.read()
+        if not ok and self.loop:
+            self.capture.set(self.cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self.capture.read()
+        return frame if ok else None
+
+    def read(self):
+        frame = self._next_frame()
+        if frame is None:
+            return None
+        if (frame.shape[1], frame.shape[0]) != self.resolution:
+            frame = self.cv2.resize(frame, self.resolution, interpolation=self.cv2.INTER_AREA)
+        return frame
+
+    def set_resolution(self, width, height):
+        self.resolution = (width, height)
+
+    def close(self):
+        if self.capture is not None:
+            self.capture.release()
+
+
+def open_source(kind, width, height, path=None, entropy=0.3):
+    """
+    Buat sumber frame. kind 'auto' = kamera MaixCam jika modul maix ada,
+    jika tidak sumber sintetis.
+    """
+    if kind not in SOURCES:
+        raise ValueError("Sumber frame tidak dikenal: {}".format(kind))
+    if kind == 'auto':
+        kind = 'maix' if camera is not None else 'synthetic'
+    if kind == 'maix':
+        return MaixCamSource(width, height)
+    if kind == 'replay':
+        if not path:
+            raise ValueError("Sumber replay butuh path folder gambar atau file video")
+        return ReplaySource(path, width, height)
+    return SyntheticSource(width, height, entropy)
+
+
+def test_pattern(width, height):
+    """Frame test pattern numpy (hitam + teks) saat modul maix tidak tersedia"""
+    import numpy as np
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    try:
+        import cv2
+    except ImportError:
+        return frame
+    cv2.putText(frame, "TEST PATTERN", (30, height // 2 - 15), cv2.FONT_HERSHEY_SIMPLEX,
+                0.7, (255, 255, 255), 1)
+    cv2.putText(frame, "Camera not available", (20, height // 2 + 15), cv2.FONT_HERSHEY_SIMPLEX,
+                0.5, (255, 255, 255), 1)
+    return frame
@@ -0,0 +1,84 @@
+"""
+Kebijakan garbage collector untuk loop kirim MaixCam.
+gc.collect() penuh setiap frame (atau setiap N frame) menyebabkan jeda
+beberapa milidetik yang periodik. GcPolicy:
+- start(): kumpulkan sekali, bekukan objek yang hidup lama (modul, kelas,
+  buffer awal) ke generasi permanen (gc.freeze), lalu matikan GC otomatis.
+- after_frame(idle): panggil setelah frame dikirim dengan sisa waktu sampai
+  capture berikutnya. Generasi 0 (dan generasi 1 setiap 10 koleksi gen0)
+  dikumpulkan saat idle, atau dipaksa jika alokasi melewati threshold;
+  koleksi penuh hanya saat idle panjang dan paling sering setiap
+  full_interval detik.
+Durasi setiap jeda GC diukur lewat gc.callbacks, lihat report().
+"""
+import gc
+import time
+
+
+class GcPolicy:
+    def __init__(self, idle_min=0.005, threshold=5000, full_interval=30.0, full_idle=0.015):
+        self.idle_min = idle_min            # Detik idle minimal untuk koleksi generasi 0
+        self.threshold = threshold          # Alokasi gen0 maksimal sebelum koleksi dipaksa
+        self.full_interval = full_interval  # Detik minimal antar koleksi penuh
+        self.full_idle = full_idle          # Detik idle minimal untuk koleksi penuh
+        self.last_full = time.time()
+        self.started = False
+        self._gc_start = None
+        self.stats = {'collections': 0, 'forced': 0, 'full': 0,
+                      'last_ms': 0.0, 'max_ms': 0.0, 'total_ms': 0.0}
+
+    def _on_gc(self, phase, info):
+        # Dipanggil interpreter untuk setiap koleksi, termasuk yang bukan dari policy ini
+        if phase == 'start':
+            self._gc_start = time.perf_counter()
+        elif self._gc_start is not None:
+            pause = (time.perf_counter() - self._gc_start) * 1000
+            self._gc_start = None
+            stats = self.stats
+            stats['collections'] += 1
+            stats['last_ms'] = pause
+            stats['total_ms'] += pause
+            if pause > stats['max_ms']:
+                stats['max_ms'] = pause
+
+    def start(self):
+        """Panggil sekali setelah inisialisasi selesai, tepat sebelum loop kirim"""
+        if self.started:
+            return
+        gc.callbacks.append(self._on_gc)
+        gc.collect()
+        if hasattr(gc, 'freeze'):
+            gc.freeze()
+        gc.disable()
+        self.started = True
+
+    def stop(self):
+        if not self.started:
+            return
+        gc.enable()
+        if self._on_gc in gc.callbacks:
+            gc.callbacks.remove(self._on_gc)
+        self.started = False
+
+    def after_frame(self, idle):
+        """idle = detik sampai capture berikutnya (boleh negatif jika terlambat)"""
+        counts = gc.get_count()
+        pending = counts[0]
+        # Generasi 1 ikut dikumpulkan setelah 10 koleksi gen0, seperti default CPython
+        generation = 1 if counts[1] >= 10 else 0
+        if idle >= self.full_idle and time.time() - self.last_full >= self.full_interval:
+            gc.collect()
+            self.last_full = time.time()
+            self.stats['full'] += 1
+        elif idle >= self.idle_min and pending > 0:
+            gc.collect(generation)
+        elif pending >= self.threshold:
+            # Tidak pernah idle (pengirim penuh): jangan biarkan sampah menumpuk
+            gc.collect(generation)
+            self.stats['forced'] += 1
+
+    def report(self):
+        """Salinan statistik, max_ms direset untuk jendela berikutnya"""
+        stats = dict(self.stats)
+        self.stats['max_ms'] = 0.0
+        return stats
@@ -0,0 +1,255 @@
+"""
+Relay UDP dengan gangguan jaringan yang bisa diulang (tanpa root / tc netem),
+dipasang di antara Maixcam.py dan WebServer.py/PC.py:
+
+    Maixcam.py --server-ip <proxy>  ->  proxy :9101  ->  penerima :9001
+    NACK/feedback penerima          ->  proxy        ->  alamat sumber MaixCam
+
+Gangguan arah maju (MaixCam -> penerima), semua keputusan dari random.Random(seed)
+dengan urutan paket yang sama, jadi hasil drop/duplikat/reorder sama setiap run:
+- drop:       loss acak independen per datagram
+- Gilbert-Elliott: loss burst dua keadaan (good/bad) dengan peluang pindah
+  p_gb/p_bg dan loss per keadaan loss_good/loss_bad
+- reorder:    sebagian datagram ditahan reorder_delay agar disalip yang berikutnya
+- duplicate:  sebagian datagram dikirim dua kali
+- delay/jitter: delay dasar + jitter uniform
+- rate:       batas bandwidth (bit/detik) dengan antrean maksimal queue_ms,
+              datagram yang melebihi antrean dibuang (tail drop; ini bergantung
+              waktu, bukan hanya seed)
+Arah balik hanya diberi delay yang sama kecuali --impair-reverse.
+
+Setiap datagram dicatat (JSON per baris, --log) dengan frame_id/chunk dan aksi,
+untuk dicocokkan dengan statistik penerima (/metrics, /stats).
+
+Contoh:
+    python impairment_proxy.py --listen 9101 --target 127.0.0.1:9001 \\
+        --drop 0.01 --ge 0.01 0.3 --reorder 0.02 --delay 20 --jitter 5 --seed 7 --log impair.jsonl
+"""
+import argparse
+import heapq
+import json
+import random
+import selectors
+import socket
+import sys
+import time
+
+from protocol import parse_header
+
+
+class GilbertElliott:
+    """Model loss burst dua keadaan, keadaan awal good"""
+    def __init__(self, p_gb, p_bg, loss_good=0.0, loss_bad=1.0):
+        self.p_gb = p_gb          # Peluang good -> bad per datagram
+        self.p_bg = p_bg          # Peluang bad -> good per datagram
+        self.loss_good = loss_good
+        self.loss_bad = loss_bad
+        self.bad = False
+
+    def lose(self, rng):
+        if self.bad:
+            if rng.random() < self.p_bg:
+                self.bad = False
+        elif rng.random() < self.p_gb:
+            self.bad = True
+        return rng.random() < (self.loss_bad if self.bad else self.loss_good)
+
+
+class Impairment:
+    """
+    decide(size, now) -> daftar (waktu kirim, aksi) untuk satu datagram;
+    daftar kosong = dibuang, aksi drop tersimpan di self.last_drop.
+    """
+    def __init__(self, seed=0, drop=0.0, gilbert=None, reorder=0.0, reorder_delay=0.01,
+                 duplicate=0.0, delay=0.0, jitter=0.0, rate=None, queue_ms=100.0):
+        self.rng = random.Random(seed)
+        self.drop = drop
+        self.gilbert = gilbert        # GilbertElliott atau None
+        self.reorder = reorder
+        self.reorder_delay = reorder_delay
+        self.duplicate = duplicate
+        self.delay = delay            # Detik
+        self.jitter = jitter          # Detik, uniform [0, jitter]
+        self.rate = rate              # bit/detik, None = tanpa batas
+        self.queue = queue_ms / 1000.0
+        self.link_free = 0.0          # Waktu link selesai mengirim antrean
+        self.last_drop = None
+
+    def decide(self, size, now):
+        rng = self.rng
+        # Semua angka acak diambil dengan urutan tetap per datagram agar deterministik
+        random_drop = rng.random() < self.drop
+        burst_drop = self.gilbert.lose(rng) if self.gilbert is not None else False
+        reordered = rng.random() < self.reorder
+        duplicated = rng.random() < self.duplicate
+        jitter = rng.uniform(0, self.jitter) if self.jitter else 0.0
+
+        if random_drop or burst_drop:
+            self.last_drop = 'drop' if random_drop else 'burst_drop'
+            return []
+
+        departure = now
+        if self.rate:
+            start = max(now, self.link_free)
+            if start - now > self.queue:
+                self.last_drop = 'queue_drop'
+                return []
+            departure = self.link_free = start + size * 8.0 / self.rate
+
+        send_at = departure + self.delay + jitter
+        if reordered:
+            send_at += self.reorder_delay
+        actions = [(send_at, 'reorder' if reordered else 'forward')]
+        if duplicated:
+            actions.append((send_at, 'duplicate'))
+        return actions
+
+
+class ImpairmentProxy:
+    """
+    Relay satu stream: datagram dari pengirim (alamat sumber terakhir diingat)
+    diteruskan ke target lewat socket upstream; balasan target dikirim balik
+    ke pengirim dari socket listen.
+    """
+    def __init__(self, listen_addr, target_addr, forward, reverse=None, log=None):
+        self.target_addr = target_addr
+        self.forward = forward
+        self.reverse = reverse if reverse is not None else Impairment(delay=forward.delay)
+        self.log = log
+        self.listen_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.listen_sock.bind(listen_addr)
+        self.upstream_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.upstream_sock.bind(('0.0.0.0', 0))  # Port balasan penerima (NACK/feedback)
+        self.sender_addr = None
+        self.running = False
+        self.queue = []   # Heap (waktu kirim, urutan, data, socket, tujuan)
+        self.order = 0
+        self.count = 0
+        self.start_time = None
+        self.stats = {'fwd': 0, 'rev': 0, 'sent': 0, 'drop': 0, 'burst_drop': 0, 'queue_drop': 0,
+                      'reorder': 0, 'duplicate': 0}
+
+    def _log(self, direction, data, action, now, send_at=None):
+        if action != 'forward':
+            self.stats[action] += 1
+        if self.log is None:
+            return
+        entry = {'n': self.count, 't': round(now - self.start_time, 6), 'dir': direction,
+                 'size': len(data), 'action': action}
+        if send_at is not None:
+            entry['delay_ms'] = round((send_at - now) * 1000, 3)
+        header = parse_header(data) if direction == 'fwd' else None
+        if header is not None:
+            entry.update(frame_id=header.frame_id, chunk=header.chunk_index,
+                         chunks=header.chunk_count, flags=header.flags)
+        self.log.write(json.dumps(entry) + '\n')
+
+    def _handle(self, data, direction, impairment, sock, dest, now):
+        self.count += 1
+        self.stats[direction] += 1
+        actions = impairment.decide(len(data), now)
+        if not actions:
+            self._log(direction, data, impairment.last_drop, now)
+            return
+        for send_at, action in actions:
+            self._log(direction, data, action, now, send_at)
+            self.order += 1
+            heapq.heappush(self.queue, (send_at, self.order, data, sock, dest))
+
+    def _flush(self, now):
+        while self.queue and self.queue[0][0] <= now:
+            _, _, data, sock, dest = heapq.heappop(self.queue)
+            try:
+                sock.sendto(data, dest)
+                self.stats['sent'] += 1
+            except OSError:
+                pass  # Penerima belum siap, perlakukan seperti loss
+
+    def run(self):
+        self.running = True
+        self.start_time = time.time()
+        selector = selectors.DefaultSelector()
+        selector.register(self.listen_sock, selectors.EVENT_READ, 'fwd')
+        selector.register(self.upstream_sock, selectors.EVENT_READ, 'rev')
+        while self.running:
+            now = time.time()
+            timeout = max(0.0, self.queue[0][0] - now) if self.queue else 0.1
+            for key, _ in selector.select(min(timeout, 0.1)):
+                try:
+                    data, addr = key.fileobj.recvfrom(65536)
+                except OSError:
+                    continue
+                now = time.time()
+                if key.data == 'fwd':
+                    self.sender_addr = addr
+                    self._handle(data, 'fwd', self.forward, self.upstream_sock, self.target_addr, now)
+                elif self.sender_addr is not None:
+                    self._handle(data, 'rev', self.reverse, self.listen_sock, self.sender_addr, now)
+            self._flush(time.time())
+        selector.close()
+
+    def stop(self):
+        self.running = False
+
+    def close(self):
+        self.listen_sock.close()
+        self.upstream_sock.close()
+
+
+def parse_addr(text, default_host='127.0.0.1'):
+    host, _, port = text.rpartition(':')
+    return host or default_host, int(port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Relay UDP dengan gangguan jaringan deterministik")
+    parser.add_argument('--listen', default='0.0.0.0:9101', help="host:port tujuan Maixcam.py")
+    parser.add_argument('--target', default='127.0.0.1:9001', help="host:port penerima")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--drop', type=float, default=0.0, help="Loss acak per datagram (0..1)")
+    parser.add_argument('--ge', type=float, nargs=2, metavar=('P_GB', 'P_BG'),
+                        help="Loss burst Gilbert-Elliott: peluang good->bad dan bad->good")
+    parser.add_argument('--ge-loss', type=float, nargs=2, default=[0.0, 1.0], metavar=('GOOD', 'BAD'),
+                        help="Loss di keadaan good dan bad")
+    parser.add_argument('--reorder', type=float, default=0.0, help="Peluang datagram ditahan (reorder)")
+    parser.add_argument('--reorder-delay', type=float, default=10.0, help="ms")
+    parser.add_argument('--duplicate', type=float, default=0.0)
+    parser.add_argument('--delay', type=float, default=0.0, help="ms")
+    parser.add_argument('--jitter', type=float, default=0.0, help="ms, uniform [0, jitter]")
+    parser.add_argument('--rate', type=float, help="Batas bandwidth dalam Mbit/s")
+    parser.add_argument('--queue', type=float, default=100.0, help="Antrean maksimal (ms) saat --rate")
+    parser.add_argument('--impair-reverse', action='store_true',
+                        help="Terapkan gangguan yang sama ke NACK/feedback (seed + 1)")
+    parser.add_argument('--log', help="File log JSON per datagram ('-' = stdout)")
+    args = parser.parse_args()
+
+    def build(seed):
+        gilbert = GilbertElliott(args.ge[0], args.ge[1], *args.ge_loss) if args.ge else None
+        return Impairment(seed=seed, drop=args.drop, gilbert=gilbert, reorder=args.reorder,
+                          reorder_delay=args.reorder_delay / 1000.0, duplicate=args.duplicate,
+                          delay=args.delay / 1000.0, jitter=args.jitter / 1000.0,
+                          rate=args.rate * 1000000 if args.rate else None, queue_ms=args.queue)
+
+    log = None
+    if args.log == '-':
+        log = sys.stdout
+    elif args.log:
+        log = open(args.log, 'w')
+
+    forward = build(args.seed)
+    reverse = build(args.seed + 1) if args.impair_reverse else None
+    proxy = ImpairmentProxy(parse_addr(args.listen, '0.0.0.0'), parse_addr(args.target), forward, reverse, log)
+    print("🧪 Proxy gangguan {} -> {}:{} (seed {})".format(args.listen, *proxy.target_addr, args.seed))
+    try:
+        proxy.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        proxy.close()
+        if log is not None and log is not sys.stdout:
+            log.close()
+        print("\n📊 " + ", ".join("{} {}".format(key, value) for key, value in proxy.stats.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Utilitas JPEG ringan:
+- looks_like_jpeg(): validasi struktur di penerima tanpa decode.
+- jpeg_size(): lebar/tinggi dari marker SOF tanpa decode.
+- JpegEncoder: encoder JPEG yang bisa diganti di pengirim (maix, OpenCV, Pillow).
+"""
+import io
+
+SOI = b'\xff\xd8'  # Start of image
+EOI = b'\xff\xd9'  # End of image
+
+
+def looks_like_jpeg(data, declared_size=None):
+    """
+    Cek murah apakah data adalah JPEG utuh: marker SOI di awal, marker segmen
+    setelahnya, EOI di akhir, dan ukuran sesuai header (jika diberikan).
+    Tidak menjamin gambar bisa di-decode, tapi menangkap frame terpotong/rusak
+    dari reassembly tanpa biaya cv2.imdecode.
+    """
+    size = len(data)
+    if size < 4 or (declared_size is not None and size != declared_size):
+        return False
+    return data[:2] == SOI and data[2] == 0xFF and data[size - 2:] == EOI
+
+
+# Marker start-of-frame (baseline, progressive, dll.) yang membawa ukuran gambar
+SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def jpeg_size(data):
+    """(lebar, tinggi) dari header JPEG, None jika marker SOF tidak ditemukan"""
+    size = len(data)
+    offset = 2
+    while offset + 9 <= size:
+        if data[offset] != 0xFF:
+            return None
+        marker = data[offset + 1]
+        if marker == 0xFF:
+            offset += 1  # Byte pengisi
+            continue
+        if marker in SOF_MARKERS:
+            height = (data[offset + 5] << 8) | data[offset + 6]
+            width = (data[offset + 7] << 8) | data[offset + 8]
+            return width, height
+        if marker == 0xDA:
+            return None  # Data scan dimulai sebelum SOF
+        offset += 2 + ((data[offset + 2] << 8) | data[offset + 3])
+    return None
+
+
+ENCODER_BACKENDS = ('auto', 'opencv', 'pillow')
+
+
+class JpegEncoder:
+    """
+    encode(img, quality) -> bytes JPEG.
+    - Image maix (punya to_jpeg/encode) di-encode dengan hardware encoder maix.
+    - Array numpy BGR (dari frame_sources.py) di-encode dengan `backend`:
+      'opencv', 'pillow', atau 'auto' (OpenCV jika ada, jika tidak Pillow).
+    OpenCV/Pillow di-import saat dibutuhkan saja, jadi modul ini tetap bisa
+    dipakai di MaixCam tanpa keduanya.
+    """
+    def __init__(self, backend='auto'):
+        if backend not in ENCODER_BACKENDS:
+            raise ValueError("Backend encoder tidak dikenal: {}".format(backend))
+        self.backend = backend
+        # Backend yang dipilih eksplisit dimuat sekarang agar error import langsung terlihat
+        self._encode_array = self._load_backend() if backend != 'auto' else None
+
+    def _load_backend(self):
+        if self.backend in ('auto', 'opencv'):
+            try:
+                import cv2
+            except ImportError:
+                if self.backend == 'opencv':
+                    raise
+            else:
+                def encode_cv2(array, quality):
+                    ok, buf = cv2.imencode('.jpg', array, [cv2.IMWRITE_JPEG_QUALITY, quality])
+                    if not ok:
+                        raise ValueError("cv2.imencode gagal")
+                    return buf.tobytes()
+                self.backend = 'opencv'
+                return encode_cv2
+
+        from PIL import Image
+
+        def encode_pillow(array, quality):
+            out = io.BytesIO()
+            Image.fromarray(array[:, :, ::-1]).save(out, format='JPEG', quality=quality)  # BGR -> RGB
+            return out.getvalue()
+        self.backend = 'pillow'
+        return encode_pillow
+
+    def encode(self, img, quality):
+        if hasattr(img, "to_jpeg"):
+            img_bytes = img.to_jpeg(quality=quality)
+        elif hasattr(img, "encode"):
+            img_bytes = img.encode(".jpg", quality=quality)
+        else:
+            if self._encode_array is None:
+                self._encode_array = self._load_backend()
+            return self._encode_array(img, quality)
+        # Konversi ke bytes jika perlu
+        if hasattr(img_bytes, "to_bytes"):
+            img_bytes = img_bytes.to_bytes()
+        return img_bytes
@@ -0,0 +1,135 @@
+"""
+Pengukuran latency glass-to-glass di penerima (WebServer.py, AsyncWebServer.py, PC.py).
+Tahap per frame:
+- capture_send: capture -> mulai kirim di MaixCam (send_delay_us dari header)
+- network:      mulai kirim -> chunk pertama tiba di penerima
+- reassembly:   chunk pertama -> frame lengkap (termasuk sebaran pacing dan NACK)
+- served:       frame lengkap -> decode/ditayangkan ke viewer
+- total:        capture -> ditayangkan (glass-to-glass)
+network dan total membandingkan jam MaixCam dengan jam lokal, jadi butuh offset
+dari ClockSync. Sebelum sinkron offset dianggap 0.
+"""
+import threading
+import time
+from collections import deque
+
+STAGES = ('capture_send', 'network', 'reassembly', 'served', 'total')
+PERCENTILES = (50, 95, 99)
+
+
+class ClockSync:
+    """
+    Perkirakan offset jam MaixCam - jam lokal ala NTP lewat OP_TIME di kanal
+    perintah (CommandSession.server_time). Dari `samples` pertukaran dipakai
+    sampel dengan RTT terkecil (paling sedikit antrean), offset = jam server -
+    titik tengah kirim/terima. Diulang setiap `interval` detik di thread sendiri.
+    """
+    def __init__(self, session, samples=8, interval=10.0):
+        self.session = session
+        self.samples = samples
+        self.interval = interval
+        self.offset = 0.0  # Detik, positif jika jam MaixCam lebih cepat
+        self.rtt = None
+        self.synced = False
+        self.running = False
+
+    def sync(self):
+        """Jalankan satu putaran sinkronisasi, return offset (detik)"""
+        best = None
+        for _ in range(self.samples):
+            sent, server_ts_us, received = self.session.server_time()
+            rtt = received - sent
+            if best is None or rtt < best[0]:
+                best = (rtt, server_ts_us / 1000000.0 - (sent + received) / 2)
+        self.rtt, self.offset = best
+        self.synced = True
+        return self.offset
+
+    def _run(self):
+        while self.running:
+            try:
+                self.sync()
+            except Exception as e:
+                print("⚠️ Gagal sinkronisasi jam: {}".format(e))
+            time.sleep(self.interval)
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def stop(self):
+        self.running = False
+
+
+class FrameTiming:
+    """Waktu satu frame dalam jam lokal, dibawa sampai frame ditayangkan"""
+    __slots__ = ('capture', 'completed', 'served')
+
+    def __init__(self, capture, completed):
+        self.capture = capture
+        self.completed = completed
+        self.served = False
+
+
+class LatencyTracker:
+    """
+    - on_frame(header, first_seen, completed): catat tahap sampai frame lengkap,
+      return FrameTiming untuk diteruskan ke served().
+    - served(timing): catat saat frame pertama kali ditayangkan (sekali per frame).
+    - timing(capture_ts_us, completed): FrameTiming untuk frame yang dibawa tanpa
+      objek FrameTiming (misalnya lewat frame_ring.py).
+    - summary(): p50/p95/p99 (ms) per tahap dari `window` frame terakhir.
+    """
+    def __init__(self, clock=None, window=300):
+        self.clock = clock  # ClockSync atau None
+        self.samples = {stage: deque(maxlen=window) for stage in STAGES}
+        self.lock = threading.Lock()
+
+    def timing(self, capture_ts_us, completed):
+        offset = self.clock.offset if self.clock is not None else 0.0
+        # Waktu capture dalam jam lokal
+        return FrameTiming(capture_ts_us / 1000000.0 - offset, completed)
+
+    def on_frame(self, header, first_seen, completed):
+        timing = self.timing(header.capture_ts_us, completed)
+        send_delay = header.send_delay_us / 1000000.0
+        with self.lock:
+            self.samples['capture_send'].append(send_delay * 1000)
+            self.samples['network'].append((first_seen - timing.capture - send_delay) * 1000)
+            self.samples['reassembly'].append((completed - first_seen) * 1000)
+        return timing
+
+    def served(self, timing, now=None):
+        if timing is None:
+            return
+        if now is None:
+            now = time.time()
+        with self.lock:
+            if timing.served:
+                return
+            timing.served = True
+            self.samples['served'].append((now - timing.completed) * 1000)
+            self.samples['total'].append((now - timing.capture) * 1000)
+
+    def percentiles(self):
+        """{tahap: {'p50': ms, 'p95': ms, 'p99': ms}}, None untuk tahap tanpa sampel"""
+        with self.lock:
+            windows = {stage: sorted(samples) for stage, samples in self.samples.items()}
+        result = {}
+        for stage, values in windows.items():
+            if not values:
+                result[stage] = None
+                continue
+            # Nearest-rank percentile
+            result[stage] = {'p{}'.format(p): round(values[max(0, -(-p * len(values) // 100) - 1)], 1)
+                             for p in PERCENTILES}
+        return result
+
+    def summary(self):
+        clock = self.clock
+        return {
+            'stages_ms': self.percentiles(),
+            'clock_synced': bool(clock and clock.synced),
+            'clock_offset_ms': round(clock.offset * 1000, 2) if clock else 0.0,
+            'clock_rtt_ms': round(clock.rtt * 1000, 2) if clock and clock.rtt is not None else None,
+        }
@@ -0,0 +1,262 @@
+"""
+Metrik penerima dalam format teks Prometheus (endpoint /metrics di WebServer.py
+dan AsyncWebServer.py), tanpa dependensi prometheus_client.
+- Counter (label opsional), Histogram: metrik dasar.
+- CallbackMetric: nilai dibaca saat scrape (statistik reassembler, viewer,
+  counter drop kernel).
+- udp_socket_stats(sock): rx_queue dan counter drop kernel untuk socket UDP
+  yang di-bind, dibaca dari /proc/net/udp (Linux). Drop kernel naik saat
+  penerima tidak sempat membaca (overload), loss chunk tanpa drop kernel
+  berarti hilang di link.
+- ReceiverMetrics: kumpulan metrik standar penerima video.
+- state()/export(): nilai mentah yang bisa di-pickle, dijumlahkan saat render
+  di proses lain (worker receiver_pool.py -> proses HTTP).
+"""
+import os
+import threading
+
+PREFIX = 'maixcam_'
+
+# Batas bucket histogram
+MISSING_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64)
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+BYTES_BUCKETS = (5000, 10000, 20000, 40000, 80000, 160000, 320000)
+
+
+def _format_labels(labelnames, values):
+    if not labelnames:
+        return ''
+    pairs = ('{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+             for name, value in zip(labelnames, values))
+    return '{' + ','.join(pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, doc, labelnames=()):
+        self.name = PREFIX + name
+        self.doc = doc
+        self.type = 'counter'
+        self.labelnames = labelnames
+        self.values = {} if labelnames else {(): 0}
+
+    def inc(self, amount=1, labels=()):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def state(self):
+        return dict(self.values)
+
+    def samples(self, remote=()):
+        values = dict(self.values)
+        for state in remote:
+            for labels, value in state.items():
+                values[labels] = values.get(labels, 0) + value
+        return [(self.name, _format_labels(self.labelnames, labels), value)
+                for labels, value in sorted(values.items())]
+
+
+class CallbackMetric:
+    """Nilai dari fn() saat scrape; None = metrik dilewati"""
+    def __init__(self, name, doc, fn, kind='gauge'):
+        self.name = PREFIX + name
+        self.doc = doc
+        self.type = kind
+        self.fn = fn
+
+    def state(self):
+        return self.fn()
+
+    def samples(self, remote=()):
+        values = [value for value in (self.fn(),) + tuple(remote) if value is not None]
+        return [(self.name, '', sum(values))] if values else []
+
+
+class Histogram:
+    def __init__(self, name, doc, buckets):
+        self.name = PREFIX + name
+        self.doc = doc
+        self.type = 'histogram'
+        self.buckets = tuple(buckets) + (float('inf'),)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0
+        self.count = 0
+        self.lock = threading.Lock()  # observe() bisa dari thread penerima dan thread perintah
+
+    def observe(self, value):
+        with self.lock:
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+            self.sum += value
+            self.count += 1
+
+    def state(self):
+        with self.lock:
+            return list(self.counts), self.sum, self.count
+
+    def samples(self, remote=()):
+        counts, total, count = self.state()
+        for remote_counts, remote_sum, remote_count in remote:
+            counts = [a + b for a, b in zip(counts, remote_counts)]
+            total += remote_sum
+            count += remote_count
+        samples = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            samples.append((self.name + '_bucket', '{{le="{}"}}'.format(_format_value(float(bound))),
+                            cumulative))
+        samples.append((self.name + '_sum', '', total))
+        samples.append((self.name + '_count', '', count))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def state(self):
+        return {metric.name: metric.state() for metric in self.metrics}
+
+    def render(self, remote=()):
+        """Teks eksposisi Prometheus (text/plain; version=0.0.4), ditambah state() proses lain"""
+        lines = []
+        for metric in self.metrics:
+            samples = metric.samples([state[metric.name] for state in remote if metric.name in state])
+            if not samples:
+                continue
+            lines.append('# HELP {} {}'.format(metric.name, metric.doc))
+            lines.append('# TYPE {} {}'.format(metric.name, metric.type))
+            for name, labels, value in samples:
+                lines.append('{}{} {}'.format(name, labels, _format_value(value)))
+        return '\n'.join(lines) + '\n'
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def udp_socket_stats(sock):
+    """
+    Return {'rx_queue': byte antre, 'drops': datagram dibuang kernel} untuk socket,
+    atau None jika /proc/net/udp tidak ada (bukan Linux) atau socket tidak ditemukan.
+    """
+    try:
+        inode = str(os.fstat(sock.fileno()).st_ino)
+    except (OSError, ValueError):
+        return None
+    for path in ('/proc/net/udp', '/proc/net/udp6'):
+        try:
+            with open(path) as f:
+                next(f)  # Baris judul
+                for line in f:
+                    fields = line.split()
+                    # sl local rem st tx_queue:rx_queue tr:tm retrnsmt uid timeout inode ref pointer drops
+                    if len(fields) >= 13 and fields[9] == inode:
+                        return {'rx_queue': int(fields[4].split(':')[1], 16),
+                                'drops': int(fields[12])}
+        except OSError:
+            continue
+    return None
+
+
+class ReceiverMetrics:
+    """
+    Metrik penerima video. Hubungkan:
+    - on_datagram(nbytes, valid): setiap datagram dari socket
+    - FrameReassembler(on_frame=metrics.on_frame)
+    - on_invalid_frame(): frame lengkap yang gagal validasi/decode
+    - command_rtt.observe(detik): RTT perintah (CommandSession.on_rtt)
+    - bind(reassembler, sock, viewers_fn): sumber nilai saat scrape; bind()
+      untuk setiap reassembler (satu per kamera), statistiknya dijumlahkan
+    """
+    def __init__(self):
+        registry = self.registry = Registry()
+        self.datagrams = registry.add(Counter('datagrams_received_total', 'Datagram UDP diterima'))
+        self.datagram_bytes = registry.add(Counter('datagram_bytes_received_total',
+                                                   'Byte datagram UDP diterima'))
+        self.invalid_datagrams = registry.add(Counter('datagrams_invalid_total',
+                                                      'Datagram dengan header tidak valid'))
+        self.frames = registry.add(Counter('frames_total', 'Frame selesai per hasil (completed/alasan buang)',
+                                           ('result',)))
+        self.invalid_frames = registry.add(Counter('frames_decode_failed_total',
+                                                   'Frame lengkap yang gagal validasi/decode JPEG'))
+        self.missing = registry.add(Histogram('frame_missing_chunks',
+                                              'Chunk per frame yang tidak datang di pengiriman pertama',
+                                              MISSING_BUCKETS))
+        self.reassembly = registry.add(Histogram('frame_reassembly_seconds',
+                                                 'Chunk pertama sampai frame lengkap', SECONDS_BUCKETS))
+        self.frame_bytes = registry.add(Histogram('frame_bytes', 'Ukuran JPEG per frame lengkap',
+                                                  BYTES_BUCKETS))
+        self.command_rtt = registry.add(Histogram('command_rtt_seconds', 'RTT perintah ke MaixCam',
+                                                  SECONDS_BUCKETS))
+        self.handoff_dropped = registry.add(Counter('frames_handoff_dropped_total',
+                                                    'Frame worker dibuang karena antrean ke proses HTTP penuh'))
+        self.remote = {}  # Worker -> export() terakhir, ikut dijumlahkan di render()
+        self.reassemblers = []
+        self.sock = None
+        self.viewers_fn = None
+        for key, doc in (('duplicates', 'Chunk duplikat'), ('late', 'Chunk untuk frame yang sudah lewat'),
+                          ('recovered', 'Chunk dibangun ulang dengan FEC'),
+                          ('nacked', 'Chunk yang diminta ulang (NACK)'),
+                          ('rejected', 'Chunk dengan ukuran frame tidak valid di header')):
+            registry.add(CallbackMetric('chunks_{}_total'.format(key), doc,
+                                        self._reassembler_stat(key), 'counter'))
+        registry.add(CallbackMetric('viewers', 'Viewer /video_feed terhubung',
+                                    lambda: self.viewers_fn() if self.viewers_fn else None))
+        registry.add(CallbackMetric('udp_receive_queue_bytes', 'Byte antre di buffer terima socket (kernel)',
+                                    lambda: self._udp_stat('rx_queue')))
+        registry.add(CallbackMetric('udp_kernel_drops_total',
+                                    'Datagram dibuang kernel karena buffer terima penuh',
+                                    lambda: self._udp_stat('drops'), 'counter'))
+
+    def bind(self, reassembler=None, sock=None, viewers_fn=None):
+        if reassembler is not None and reassembler not in self.reassemblers:
+            self.reassemblers.append(reassembler)
+        if sock is not None:
+            self.sock = sock
+        if viewers_fn is not None:
+            self.viewers_fn = viewers_fn
+
+    def _reassembler_stat(self, key):
+        return lambda: (sum(reassembler.stats[key] for reassembler in self.reassemblers)
+                        if self.reassemblers else None)
+
+    def _udp_stat(self, key):
+        if self.sock is None:
+            return None
+        stats = udp_socket_stats(self.sock)
+        return stats[key] if stats else None
+
+    def on_datagram(self, nbytes, valid=True):
+        self.datagrams.inc()
+        self.datagram_bytes.inc(nbytes)
+        if not valid:
+            self.invalid_datagrams.inc()
+
+    def on_frame(self, slot, reason, now):
+        self.frames.inc(labels=(reason,))
+        self.missing.observe(slot.missing_count())
+        if reason == 'completed':
+            self.reassembly.observe(now - slot.first_seen)
+            self.frame_bytes.observe(slot.total_size)
+
+    def on_invalid_frame(self):
+        self.invalid_frames.inc()
+
+    def export(self):
+        return self.registry.state()
+
+    def render(self):
+        return self.registry.render(list(self.remote.values()))
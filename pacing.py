@@ -0,0 +1,71 @@
+"""
+Pacing pengiriman UDP di MaixCam.
+Tanpa pacing semua chunk satu frame dikirim beruntun dan burst-nya bisa
+memenuhi SO_RCVBUF penerima (64 KB), sehingga ada loss yang bukan karena link.
+- TokenBucket: batasi laju byte dengan burst kecil.
+- FramePacer: sebar datagram satu frame ke sebagian (`spread`) interval frame,
+  laju bucket minimal target_bitrate.
+- RateMeter: ukur laju kirim sebenarnya (bit/detik).
+"""
+import time
+
+
+class TokenBucket:
+    """consume(nbytes) menunggu (sleep) sampai token cukup, laju dalam byte/detik"""
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.last = time.monotonic()
+
+    def consume(self, nbytes):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+        if self.tokens < nbytes:
+            delay = (nbytes - self.tokens) / self.rate
+            time.sleep(delay)
+            self.tokens = nbytes
+            self.last = now + delay
+        self.tokens -= nbytes
+
+
+class FramePacer:
+    """
+    - begin_frame(frame_bytes, frame_interval): atur laju untuk frame berikutnya,
+      cukup cepat agar frame selesai dalam spread * frame_interval.
+    - pace(nbytes): panggil sebelum mengirim setiap datagram.
+    """
+    def __init__(self, target_bitrate, spread=0.5, burst_bytes=6000):
+        self.target_bitrate = target_bitrate  # bit/detik
+        self.spread = spread
+        self.bucket = TokenBucket(target_bitrate / 8.0, burst_bytes)
+
+    def begin_frame(self, frame_bytes, frame_interval=None):
+        rate = self.target_bitrate / 8.0
+        if frame_interval:
+            # Frame besar tidak boleh menurunkan FPS: naikkan laju agar tetap muat
+            rate = max(rate, frame_bytes / (self.spread * frame_interval))
+        self.bucket.rate = rate
+
+    def pace(self, nbytes):
+        self.bucket.consume(nbytes)
+
+
+class RateMeter:
+    """Hitung laju kirim (bit/detik) per jendela `window` detik"""
+    def __init__(self, window=1.0):
+        self.window = window
+        self.bytes = 0
+        self.start = time.time()
+        self.rate = 0.0
+
+    def add(self, nbytes):
+        self.bytes += nbytes
+        now = time.time()
+        elapsed = now - self.start
+        if elapsed >= self.window:
+            self.rate = self.bytes * 8 / elapsed
+            self.bytes = 0
+            self.start = now
+        return self.rate
@@ -0,0 +1,142 @@
+"""
+Pipeline bertahap capture -> encode -> send untuk MaixCam.
+Setiap tahap berjalan di thread sendiri dan saling oper lewat slot berkapasitas
+satu, jadi capture frame N+1 berjalan bersamaan dengan encode/kirim frame N dan
+waktu per frame = tahap paling lambat, bukan jumlah semua tahap.
+
+Kebijakan slot saat penerima belum mengambil item sebelumnya:
+- 'latest': item lama dibuang, diganti yang baru (latency rendah)
+- 'skip':   item baru dibuang, item lama tetap menunggu
+- 'block':  produsen menunggu sampai slot kosong (tanpa drop)
+"""
+import threading
+import time
+
+POLICIES = ('latest', 'skip', 'block')
+
+
+class HandoffSlot:
+    """Slot satu item antar tahap dengan kebijakan drop"""
+    def __init__(self, policy='latest'):
+        if policy not in POLICIES:
+            raise ValueError("Kebijakan slot tidak dikenal: {}".format(policy))
+        self.policy = policy
+        self.item = None
+        self.cond = threading.Condition()
+        self.closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        with self.cond:
+            if self.item is not None:
+                if self.policy == 'skip':
+                    self.dropped += 1
+                    return
+                if self.policy == 'block':
+                    while self.item is not None and not self.closed:
+                        self.cond.wait(0.1)
+                else:
+                    self.dropped += 1
+            self.item = item
+            self.cond.notify_all()
+
+    def get(self, timeout=0.1):
+        """Ambil item (None jika timeout atau slot ditutup)"""
+        with self.cond:
+            if self.item is None and not self.closed:
+                self.cond.wait(timeout)
+            item, self.item = self.item, None
+            if item is not None:
+                self.cond.notify_all()
+            return item
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+class FramePipeline:
+    """
+    Jalankan capture(), encode(item) dan send(item) di tiga thread.
+    - throttle() (opsional) dipanggil sebelum capture untuk membatasi FPS
+    - capture() -> item atau None (dicoba lagi)
+    - encode(item) -> item hasil encode atau None (frame dibuang)
+    - send(item)
+    Waktu rata-rata (ms) dan jumlah drop per tahap ada di stats().
+    """
+    def __init__(self, capture, encode, send, throttle=None, encode_policy='latest',
+                 send_policy='latest'):
+        self.throttle = throttle
+        self.capture = capture
+        self.encode = encode
+        self.send = send
+        self.to_encode = HandoffSlot(encode_policy)
+        self.to_send = HandoffSlot(send_policy)
+        self.running = False
+        self.threads = []
+        self.timing = {'capture': 0.0, 'encode': 0.0, 'send': 0.0}
+
+    def _measure(self, stage, start):
+        # Rata-rata bergerak eksponensial waktu per tahap
+        self.timing[stage] += ((time.time() - start) * 1000 - self.timing[stage]) / 16
+
+    def _run(self, stage, step):
+        while self.running:
+            try:
+                step()
+            except Exception as e:
+                print("⚠️ Error tahap {}: {}".format(stage, str(e)))
+                time.sleep(0.01)
+
+    def _capture_step(self):
+        if self.throttle is not None:
+            self.throttle()
+        start = time.time()
+        item = self.capture()
+        if item is not None:
+            self._measure('capture', start)
+            self.to_encode.put(item)
+
+    def _encode_step(self):
+        item = self.to_encode.get()
+        if item is None:
+            return
+        start = time.time()
+        encoded = self.encode(item)
+        self._measure('encode', start)
+        if encoded is not None:
+            self.to_send.put(encoded)
+
+    def _send_step(self):
+        item = self.to_send.get()
+        if item is None:
+            return
+        start = time.time()
+        self.send(item)
+        self._measure('send', start)
+
+    def start(self):
+        self.running = True
+        for stage, step in (('capture', self._capture_step), ('encode', self._encode_step),
+                            ('send', self._send_step)):
+            thread = threading.Thread(target=self._run, args=(stage, step), daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        self.running = False
+        self.to_encode.close()
+        self.to_send.close()
+        for thread in self.threads:
+            thread.join(1.0)
+        self.threads = []
+
+    def stats(self):
+        return {
+            'capture_ms': self.timing['capture'],
+            'encode_ms': self.timing['encode'],
+            'send_ms': self.timing['send'],
+            'dropped_encode': self.to_encode.dropped,
+            'dropped_send': self.to_send.dropped,
+        }
@@ -0,0 +1,157 @@
+"""
+Format wire biner (berversi) untuk stream video UDP.
+Dipakai bersama oleh pengirim (Maixcam.py) dan penerima (WebServer.py, PC.py).
+
+Setiap datagram = header 28 byte + payload chunk JPEG:
+    magic(1) version(1) flags(1) stream_id(1)
+    frame_id(4) chunk_index(2) chunk_count(2) total_size(4) capture_ts_us(8)
+    send_delay_us(4)
+capture_ts_us = waktu capture (jam MaixCam), send_delay_us = jeda capture ->
+mulai kirim, dipakai penerima untuk memecah latency per tahap (latency.py).
+stream_id (0 = tidak diatur) membedakan beberapa kamera yang mengirim ke port
+penerima yang sama (lihat streams.py); tanpa stream_id penerima memakai alamat sumber.
+Karena setiap chunk membawa info frame lengkap, chunk mana pun bisa memulai
+reassembly, tanpa paket metadata terpisah.
+
+Pesan kontrol balik (penerima -> pengirim, ke alamat sumber stream):
+    magic(1) version(1) msg_type(1) count(1) frame_id(4) + count x chunk_index(2)
+    MSG_FEEDBACK (count=0) diikuti laporan link:
+        loss_permille(2) incomplete_permille(2) jitter_us(4) frames(4)
+"""
+import struct
+import time
+from collections import namedtuple
+
+MAGIC = 0x56  # 'V'
+VERSION = 2  # v2: + send_delay_us
+
+HEADER = struct.Struct('>BBBBIHHIQI')
+HEADER_SIZE = HEADER.size
+CHUNK_INDEX = struct.Struct('>H')
+CHUNK_INDEX_OFFSET = 8  # Posisi chunk_index di dalam header
+
+# Flags
+FLAG_TEST_PATTERN = 0x01  # Frame berasal dari test pattern, bukan kamera
+FLAG_PARITY = 0x02        # Chunk parity FEC, chunk_index = nomor grup parity (lihat fec.py)
+FLAG_RETRANSMIT = 0x04    # Chunk dikirim ulang karena NACK
+
+# Ruang urutan frame_id 32-bit dengan serial number arithmetic (RFC 1982)
+SEQ_BITS = 32
+SEQ_MODULUS = 1 << SEQ_BITS
+SEQ_MASK = SEQ_MODULUS - 1
+SEQ_HALF = SEQ_MODULUS >> 1
+
+MAX_CHUNKS = 0xFFFF
+MAX_DATAGRAM = 65507  # Payload UDP maksimum di IPv4
+MAX_CHUNK_PAYLOAD = MAX_DATAGRAM - HEADER_SIZE
+
+# Pesan kontrol
+CONTROL_MAGIC = 0x43  # 'C'
+CONTROL = struct.Struct('>BBBBI')
+MSG_NACK = 1
+MSG_FEEDBACK = 2
+MAX_NACK_INDICES = 0xFF
+FEEDBACK = struct.Struct('>HHII')
+
+ChunkHeader = namedtuple('ChunkHeader', [
+    'version', 'flags', 'frame_id', 'chunk_index', 'chunk_count',
+    'total_size', 'capture_ts_us', 'send_delay_us', 'stream_id'
+])
+
+# Laporan kondisi link dari penerima (lihat rate_control.py)
+Feedback = namedtuple('Feedback', ['frame_id', 'loss', 'incomplete', 'jitter', 'frames'])
+
+
+def seq_next(frame_id):
+    """frame_id berikutnya, wrap di 2^32"""
+    return (frame_id + 1) & SEQ_MASK
+
+
+def seq_diff(a, b):
+    """Jarak bertanda a - b dalam ruang urutan (negatif jika a lebih lama)"""
+    diff = (a - b) & SEQ_MASK
+    return diff - SEQ_MODULUS if diff >= SEQ_HALF else diff
+
+
+def seq_newer(a, b):
+    """True jika frame_id a lebih baru dari b (aman terhadap wraparound)"""
+    return seq_diff(a, b) > 0
+
+
+def timestamp_us():
+    """Waktu saat ini dalam mikrodetik (untuk capture_ts_us)"""
+    return int(time.time() * 1000000)
+
+
+def pack_header(frame_id, chunk_index, chunk_count, total_size, capture_ts_us, flags=0,
+                send_delay_us=0, stream_id=0):
+    return HEADER.pack(MAGIC, VERSION, flags, stream_id, frame_id & SEQ_MASK,
+                       chunk_index, chunk_count, total_size, capture_ts_us,
+                       min(max(send_delay_us, 0), 0xFFFFFFFF))
+
+
+def pack_header_into(buf, offset, frame_id, chunk_index, chunk_count, total_size,
+                     capture_ts_us, flags=0, send_delay_us=0, stream_id=0):
+    HEADER.pack_into(buf, offset, MAGIC, VERSION, flags, stream_id, frame_id & SEQ_MASK,
+                     chunk_index, chunk_count, total_size, capture_ts_us,
+                     min(max(send_delay_us, 0), 0xFFFFFFFF))
+
+
+def pack_chunk_index_into(buf, chunk_index):
+    """Ganti chunk_index di header yang sudah di-pack (sisa field sama per frame)"""
+    CHUNK_INDEX.pack_into(buf, CHUNK_INDEX_OFFSET, chunk_index)
+
+
+def parse_header(packet):
+    """Parse header chunk, return ChunkHeader atau None jika bukan format ini"""
+    if len(packet) < HEADER_SIZE:
+        return None
+    magic, version, flags, stream_id, frame_id, index, count, total, ts, delay = HEADER.unpack_from(packet)
+    if magic != MAGIC or version != VERSION:
+        return None
+    if count == 0 or index >= count:
+        return None
+    return ChunkHeader(version, flags, frame_id, index, count, total, ts, delay, stream_id)
+
+
+def chunk_count_for(total_size, chunk_size):
+    """Jumlah chunk data untuk frame berukuran total_size"""
+    return (total_size + chunk_size - 1) // chunk_size
+
+
+def pack_nack(frame_id, indices):
+    """NACK: minta pengirim mengirim ulang chunk_index yang hilang"""
+    indices = indices[:MAX_NACK_INDICES]
+    return (CONTROL.pack(CONTROL_MAGIC, VERSION, MSG_NACK, len(indices), frame_id & SEQ_MASK)
+            + struct.pack('>{}H'.format(len(indices)), *indices))
+
+
+def parse_control(packet):
+    """Parse pesan kontrol, return (msg_type, frame_id, indices) atau None"""
+    if len(packet) < CONTROL.size:
+        return None
+    magic, version, msg_type, count, frame_id = CONTROL.unpack_from(packet)
+    if magic != CONTROL_MAGIC or version != VERSION:
+        return None
+    if len(packet) < CONTROL.size + 2 * count:
+        return None
+    indices = struct.unpack_from('>{}H'.format(count), packet, CONTROL.size)
+    return msg_type, frame_id, indices
+
+
+def pack_feedback(frame_id, loss, incomplete, jitter, frames):
+    """Feedback: loss/incomplete dalam fraksi 0..1, jitter dalam detik"""
+    return (CONTROL.pack(CONTROL_MAGIC, VERSION, MSG_FEEDBACK, 0, frame_id & SEQ_MASK)
+            + FEEDBACK.pack(min(int(loss * 1000), 1000), min(int(incomplete * 1000), 1000),
+                            min(int(jitter * 1000000), 0xFFFFFFFF), frames))
+
+
+def parse_feedback(packet):
+    """Parse pesan MSG_FEEDBACK, return Feedback atau None"""
+    if len(packet) < CONTROL.size + FEEDBACK.size:
+        return None
+    magic, version, msg_type, _, frame_id = CONTROL.unpack_from(packet)
+    if magic != CONTROL_MAGIC or version != VERSION or msg_type != MSG_FEEDBACK:
+        return None
+    loss, incomplete, jitter_us, frames = FEEDBACK.unpack_from(packet, CONTROL.size)
+    return Feedback(frame_id, loss / 1000.0, incomplete / 1000.0, jitter_us / 1000000.0, frames)
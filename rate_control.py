@@ -0,0 +1,168 @@
+"""
+Kontrol bitrate adaptif loop tertutup antara penerima dan MaixCam.
+- LinkMonitor (penerima): ukur chunk loss, rasio frame tidak lengkap dan jitter
+  antar-kedatangan, kirim MSG_FEEDBACK berkala ke pengirim.
+- AimdController (MaixCam): atur kualitas JPEG, resolusi dan FPS dalam batas
+  konfigurasi dengan AIMD (turun multiplikatif saat macet, naik aditif saat bersih).
+"""
+from protocol import FLAG_PARITY, FLAG_RETRANSMIT, pack_feedback, seq_diff, seq_newer
+
+MAX_GAP = 64  # Lompatan frame_id (maju atau mundur) lebih dari ini dianggap restart, bukan loss
+
+
+class LinkMonitor:
+    """
+    - on_chunk(header, now): panggil untuk setiap chunk yang diterima.
+    - report(now, reassembler_stats): return paket MSG_FEEDBACK setiap `interval`
+      detik (None di antaranya). Laporan terakhir tersimpan di self.last.
+    Loss hanya menghitung frame yang sudah ditutup (frame yang lebih baru sudah
+    mulai datang), jadi frame yang sedang dikirim tidak terhitung hilang.
+    Jitter dihitung seperti RFC 3550 dari selisih (waktu tiba - waktu kirim) chunk
+    pertama setiap frame, dengan waktu kirim = capture_ts + send_delay (jam
+    MaixCam), jadi offset jam saling meniadakan dan jeda capture/encode/pacing
+    yang berubah-ubah di MaixCam tidak terhitung sebagai jitter jaringan.
+    """
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.expected = 0
+        self.received = 0
+        self.highest = None
+        self.chunk_count = 0
+        self.current_received = 0  # Chunk frame terbaru, dihitung saat frame berikutnya mulai
+        self.last_transit = None
+        self.jitter = 0.0
+        self.last_report = None
+        self.last_completed = 0
+        self.last_evicted = 0
+        self.last = {'loss': 0.0, 'incomplete': 0.0, 'jitter': 0.0}
+
+    def on_chunk(self, header, now):
+        if header.flags & (FLAG_PARITY | FLAG_RETRANSMIT):
+            return  # Hanya chunk data asli yang dihitung untuk loss
+        frame_id = header.frame_id
+        if self.highest is not None and seq_diff(frame_id, self.highest) < -MAX_GAP:
+            # Pengirim restart (frame_id mulai lagi dari awal): frame terbuka ditutup,
+            # urutan dan jitter dimulai ulang seperti restart_gap di FrameReassembler
+            self.expected += self.chunk_count
+            self.received += self.current_received
+            self.highest = None
+            self.chunk_count = 0
+            self.current_received = 0
+            self.last_transit = None
+        if self.highest is not None and not seq_newer(frame_id, self.highest):
+            if frame_id == self.highest:
+                self.current_received += 1
+            else:
+                self.received += 1  # Chunk terlambat dari frame yang sudah ditutup
+            return
+
+        # Frame baru: frame sebelumnya ditutup dan dihitung, termasuk frame yang hilang total
+        if self.highest is not None:
+            gap = seq_diff(frame_id, self.highest)
+            if gap > MAX_GAP:
+                gap = 1
+            self.expected += self.chunk_count * gap
+            self.received += self.current_received
+        self.highest = frame_id
+        self.chunk_count = header.chunk_count
+        self.current_received = 1
+
+        transit = now - (header.capture_ts_us + header.send_delay_us) / 1000000.0
+        if self.last_transit is not None:
+            self.jitter += (abs(transit - self.last_transit) - self.jitter) / 16
+        self.last_transit = transit
+
+    def report(self, now, reassembler_stats):
+        if self.last_report is None:
+            self.last_report = now
+            return None
+        if now - self.last_report < self.interval or self.highest is None:
+            return None
+        self.last_report = now
+
+        completed = reassembler_stats['completed'] - self.last_completed
+        evicted = reassembler_stats['evicted'] - self.last_evicted
+        self.last_completed = reassembler_stats['completed']
+        self.last_evicted = reassembler_stats['evicted']
+
+        loss = max(0.0, 1.0 - self.received / self.expected) if self.expected else 0.0
+        incomplete = evicted / (completed + evicted) if completed + evicted else 0.0
+        self.expected = 0
+        self.received = 0
+        self.last = {'loss': loss, 'incomplete': incomplete, 'jitter': self.jitter}
+        return pack_feedback(self.highest, loss, incomplete, self.jitter, completed)
+
+
+class AimdController:
+    """
+    Atur (quality, resolution, fps) dari Feedback penerima.
+    - Macet (loss/incomplete/jitter di atas batas): turunkan kualitas secara
+      multiplikatif, lalu resolusi, lalu FPS.
+    - Bersih selama `hold` detik sejak penurunan terakhir: naikkan kembali
+      secara aditif dengan urutan terbalik (FPS, resolusi, kualitas).
+    resolutions diurutkan dari terbesar ke terkecil, resolutions[0] = awal.
+    """
+    def __init__(self, quality, min_quality, max_quality, resolutions, fps, min_fps, max_fps,
+                 loss_high=0.03, loss_low=0.005, incomplete_high=0.05, jitter_high=0.03,
+                 decrease=0.7, quality_step=5, fps_step=2, hold=2.0):
+        self.quality = quality
+        self.min_quality = min_quality
+        self.max_quality = max_quality
+        self.resolutions = resolutions
+        self.res_index = 0
+        self.fps = fps
+        self.min_fps = min_fps
+        self.max_fps = max_fps
+        self.loss_high = loss_high
+        self.loss_low = loss_low
+        self.incomplete_high = incomplete_high
+        self.jitter_high = jitter_high
+        self.decrease = decrease
+        self.quality_step = quality_step
+        self.fps_step = fps_step
+        self.hold = hold
+        self.last_decrease = 0
+        self.stats = {'decreases': 0, 'increases': 0}
+
+    @property
+    def resolution(self):
+        return self.resolutions[self.res_index]
+
+    def on_feedback(self, feedback, now):
+        """Terapkan satu Feedback, return True jika pengaturan berubah"""
+        congested = (feedback.loss > self.loss_high or feedback.incomplete > self.incomplete_high
+                     or feedback.jitter > self.jitter_high)
+        if congested:
+            changed = self._decrease()
+            self.last_decrease = now
+            if changed:
+                self.stats['decreases'] += 1
+            return changed
+        if feedback.loss <= self.loss_low and now - self.last_decrease >= self.hold:
+            changed = self._increase()
+            if changed:
+                self.stats['increases'] += 1
+            return changed
+        return False
+
+    def _decrease(self):
+        if self.quality > self.min_quality:
+            self.quality = max(self.min_quality, int(self.quality * self.decrease))
+        elif self.res_index < len(self.resolutions) - 1:
+            self.res_index += 1
+        elif self.fps > self.min_fps:
+            self.fps = max(self.min_fps, int(self.fps * self.decrease))
+        else:
+            return False
+        return True
+
+    def _increase(self):
+        if self.fps < self.max_fps:
+            self.fps = min(self.max_fps, self.fps + self.fps_step)
+        elif self.res_index > 0:
+            self.res_index -= 1
+        elif self.quality < self.max_quality:
+            self.quality = min(self.max_quality, self.quality + self.quality_step)
+        else:
+            return False
+        return True
@@ -0,0 +1,299 @@
+"""
+Mesin reassembly frame video UDP.
+- Melacak beberapa frame yang sedang dirakit sekaligus, dikunci dengan frame_id.
+- Chunk boleh datang dalam urutan apa pun; setiap chunk membawa header lengkap
+  (lihat protocol.py) sehingga chunk mana pun bisa membuka slot frame baru.
+- Chunk parity FEC (jika dikirim) dipakai untuk membangun ulang chunk yang hilang.
+- collect_nacks() memberi daftar chunk yang hilang untuk diminta ulang (NACK).
+- Frame yang terlalu tua atau tidak lengkap dibuang berdasarkan umur.
+- Header yang tidak masuk akal (total_size di luar chunk_count x payload UDP
+  maksimum atau lebih besar dari max_frame_size) ditolak sebelum buffer
+  dialokasikan, jadi datagram palsu tidak bisa memaksa alokasi besar.
+- on_frame(slot, reason, now) (opsional) dipanggil setiap frame selesai:
+  reason 'completed' atau alasan buang ('stale', 'capacity', 'superseded',
+  'mismatch'), untuk metrik (lihat metrics.py).
+"""
+import time
+
+from buffer_pool import BufferPool
+from fec import parity_groups, recover_chunk
+from protocol import FLAG_PARITY, FLAG_RETRANSMIT, MAX_CHUNK_PAYLOAD, seq_diff, seq_newer
+
+
+class _FrameSlot:
+    """
+    Slot satu frame yang sedang dirakit. Payload ditulis langsung ke buffer frame
+    (dari BufferPool) di offset chunk_index * chunk_size, tanpa list chunk dan join.
+    """
+    __slots__ = ('frame_id', 'num_chunks', 'total_size', 'capture_ts_us', 'flags',
+                 'buf', 'have', 'received', 'first_seen', 'parity', 'groups', 'chunk_size',
+                 'highest', 'nack_rounds', 'last_nack', 'repaired')
+
+    def __init__(self, header, buf, now):
+        self.frame_id = header.frame_id
+        self.num_chunks = header.chunk_count
+        self.total_size = header.total_size
+        self.capture_ts_us = header.capture_ts_us
+        self.flags = header.flags
+        self.buf = buf
+        self.have = bytearray(header.chunk_count)  # 1 = chunk sudah ada di buffer
+        self.received = 0
+        self.first_seen = now
+        self.parity = None      # {nomor grup: payload parity}
+        self.groups = 0
+        self.chunk_size = None  # Diturunkan dari chunk/parity pertama
+        self.highest = -1       # chunk_index data tertinggi yang sudah diterima
+        self.nack_rounds = 0
+        self.last_nack = 0.0
+        self.repaired = 0       # Chunk yang didapat dari retransmisi atau FEC
+
+    def _chunk_length(self, index):
+        if index == self.num_chunks - 1:
+            return self.total_size - index * self.chunk_size
+        return self.chunk_size
+
+    def _learn_chunk_size(self, index, length):
+        """chunk_size tidak ada di header, tapi bisa diturunkan dari chunk mana pun"""
+        if index < self.num_chunks - 1:
+            chunk_size = length
+        elif self.num_chunks > 1:
+            rest = self.total_size - length
+            if rest % (self.num_chunks - 1):
+                return False
+            chunk_size = rest // (self.num_chunks - 1)
+        else:
+            chunk_size = length
+        last = self.total_size - chunk_size * (self.num_chunks - 1)
+        if chunk_size <= 0 or last <= 0 or last > chunk_size:
+            return False
+        self.chunk_size = chunk_size
+        return True
+
+    def add(self, index, payload):
+        """Simpan chunk, return False jika duplikat/tidak valid"""
+        if index >= self.num_chunks or self.have[index]:
+            return False
+        length = len(payload)
+        if self.chunk_size is None and not self._learn_chunk_size(index, length):
+            return False
+        if length != self._chunk_length(index):
+            return False
+        offset = index * self.chunk_size
+        self.buf[offset:offset + length] = payload
+        self.have[index] = 1
+        self.received += 1
+        if index > self.highest:
+            self.highest = index
+        if self.parity:
+            self._try_recover(index % self.groups)
+        return True
+
+    def add_parity(self, group, payload):
+        """Simpan chunk parity, return False jika duplikat/tidak valid"""
+        if self.parity is None:
+            chunk_size = len(payload) - 1
+            if self.chunk_size is not None and chunk_size != self.chunk_size:
+                return False
+            self.parity = {}
+            self.groups = parity_groups(payload)
+            self.chunk_size = chunk_size
+        if group in self.parity or group >= self.groups:
+            return False
+        self.parity[group] = bytes(payload)  # Buffer datagram dipakai ulang, simpan salinan
+        self._try_recover(group)
+        return True
+
+    def _try_recover(self, group):
+        """Bangun ulang chunk jika tepat satu chunk di grup ini yang hilang"""
+        parity = self.parity.get(group)
+        if parity is None:
+            return False
+        chunk_size = self.chunk_size
+        view = memoryview(self.buf)
+        missing = None
+        others = []
+        for index in range(group, self.num_chunks, self.groups):
+            if not self.have[index]:
+                if missing is not None:
+                    return False
+                missing = index
+            else:
+                offset = index * chunk_size
+                others.append(view[offset:offset + self._chunk_length(index)])
+        if missing is None:
+            return False
+        length = self._chunk_length(missing)
+        offset = missing * chunk_size
+        self.buf[offset:offset + length] = recover_chunk(parity, others, length)
+        self.have[missing] = 1
+        self.received += 1
+        return True
+
+    def missing(self, upto):
+        """Daftar chunk_index yang belum diterima di bawah upto"""
+        have = self.have
+        return [i for i in range(upto) if not have[i]]
+
+    def is_complete(self):
+        return self.received == self.num_chunks
+
+    def missing_count(self):
+        """Chunk yang tidak datang di pengiriman pertama (diperbaiki + masih hilang)"""
+        return self.repaired + self.num_chunks - self.received
+
+    def frame_view(self):
+        """JPEG lengkap sebagai memoryview ke buffer frame (tanpa salinan)"""
+        return memoryview(self.buf)[:self.total_size]
+
+
+class FrameReassembler:
+    """
+    Merakit frame dari chunk UDP:
+    - add_chunk(): simpan chunk, return memoryview JPEG jika frame sudah lengkap.
+      Memoryview menunjuk ke buffer pool; buffer baru dipakai ulang setelah
+      konsumen melepas semua referensinya.
+    - evict_stale(): buang frame yang lebih tua dari max_age detik.
+    - collect_nacks(): daftar (frame_id, chunk yang hilang) untuk dikirim ke pengirim.
+    Frame yang lengkap hanya dikirim jika lebih baru dari frame terakhir,
+    frame lama yang masih dirakit langsung dibuang (latest frame wins).
+    """
+    def __init__(self, max_frames=8, max_age=0.2, restart_gap=64,
+                 nack_interval=0.02, nack_deadline=0.06, max_nack_rounds=2, pool=None,
+                 on_frame=None, max_frame_size=4 * 1024 * 1024):
+        self.max_frames = max_frames
+        self.max_frame_size = max_frame_size  # Batas total_size dari header (byte)
+        self.pool = pool if pool is not None else BufferPool()
+        self.max_age = max_age
+        self.restart_gap = restart_gap  # Jarak mundur yang dianggap restart pengirim
+        self.nack_interval = nack_interval      # Jeda minimum antar NACK untuk frame yang sama
+        self.nack_deadline = nack_deadline      # Frame lebih tua dari ini tidak di-NACK lagi
+        self.max_nack_rounds = max_nack_rounds
+        self.on_frame = on_frame
+        self.frames = {}
+        self.last_delivered = None
+        self.last_first_seen = None  # Waktu chunk pertama frame terakhir yang lengkap (latency.py)
+        self.stats = {
+            'completed': 0,
+            'evicted': 0,
+            'duplicates': 0,
+            'late': 0,
+            'recovered': 0,
+            'nacked': 0,
+            'rejected': 0
+        }
+
+    def _is_late(self, frame_id):
+        if self.last_delivered is None:
+            return False
+        behind = -seq_diff(frame_id, self.last_delivered)
+        if behind < 0:
+            return False
+        if behind > self.restart_gap:
+            # Pengirim kemungkinan restart, mulai ulang urutan
+            self.last_delivered = None
+            return False
+        return True
+
+    def _valid_size(self, header):
+        """total_size harus muat di chunk_count chunk (1 sampai MAX_CHUNK_PAYLOAD byte per chunk)"""
+        return (header.chunk_count <= header.total_size <= header.chunk_count * MAX_CHUNK_PAYLOAD
+                and header.total_size <= self.max_frame_size)
+
+    def _get_slot(self, header, now):
+        slot = self.frames.get(header.frame_id)
+        if slot is not None and (slot.num_chunks != header.chunk_count
+                                 or slot.total_size != header.total_size):
+            self._drop(slot, 'mismatch', now)
+            slot = None
+        if slot is None:
+            if len(self.frames) >= self.max_frames:
+                self._drop(min(self.frames.values(), key=lambda s: s.first_seen), 'capacity', now)
+            slot = _FrameSlot(header, self.pool.acquire(header.total_size), now)
+            self.frames[header.frame_id] = slot
+        return slot
+
+    def _drop(self, slot, reason, now):
+        """Buang frame yang belum lengkap, buffer kembali ke pool"""
+        del self.frames[slot.frame_id]
+        self.pool.release(slot.buf)
+        self.stats['evicted'] += 1
+        if self.on_frame is not None:
+            self.on_frame(slot, reason, now)
+
+    def _finish(self, slot, now):
+        del self.frames[slot.frame_id]
+        self.last_delivered = slot.frame_id
+        self.last_first_seen = slot.first_seen
+        self.stats['completed'] += 1
+        # Frame lebih lama yang belum lengkap tidak akan pernah ditampilkan
+        for older in [s for f, s in self.frames.items() if not seq_newer(f, slot.frame_id)]:
+            self._drop(older, 'superseded', now)
+        self.pool.lend(slot.buf)
+        if self.on_frame is not None:
+            self.on_frame(slot, 'completed', now)
+        return slot.frame_view()
+
+    def add_chunk(self, header, payload, now=None):
+        """Tambahkan chunk (header hasil protocol.parse_header)"""
+        if now is None:
+            now = time.time()
+        if not self._valid_size(header):
+            self.stats['rejected'] += 1
+            return None
+        if self._is_late(header.frame_id):
+            self.stats['late'] += 1
+            return None
+        slot = self._get_slot(header, now)
+        received = slot.received
+        if header.flags & FLAG_PARITY:
+            added = slot.add_parity(header.chunk_index, payload)
+        else:
+            added = slot.add(header.chunk_index, payload)
+            received += 1
+        if not added:
+            self.stats['duplicates'] += 1
+            return None
+        self.stats['recovered'] += slot.received - received
+        slot.repaired += slot.received - received
+        if header.flags & FLAG_RETRANSMIT:
+            slot.repaired += 1
+        if slot.is_complete():
+            return self._finish(slot, now)
+        return None
+
+    def evict_stale(self, now=None):
+        if now is None:
+            now = time.time()
+        stale = [s for s in self.frames.values() if now - s.first_seen > self.max_age]
+        for slot in stale:
+            self._drop(slot, 'stale', now)
+        return len(stale)
+
+    def collect_nacks(self, now=None):
+        """
+        Chunk dianggap hilang jika chunk dengan index lebih tinggi sudah datang,
+        atau frame yang lebih baru sudah mulai datang (kehilangan di ekor frame).
+        """
+        if now is None:
+            now = time.time()
+        if not self.frames:
+            return []
+        newest = None
+        for frame_id in self.frames:
+            if newest is None or seq_newer(frame_id, newest):
+                newest = frame_id
+
+        nacks = []
+        for slot in self.frames.values():
+            if slot.nack_rounds >= self.max_nack_rounds:
+                continue
+            if now - slot.first_seen > self.nack_deadline or now - slot.last_nack < self.nack_interval:
+                continue
+            upto = slot.num_chunks if slot.frame_id != newest or slot.parity else slot.highest
+            missing = slot.missing(upto)
+            if missing:
+                slot.nack_rounds += 1
+                slot.last_nack = now
+                self.stats['nacked'] += len(missing)
+                nacks.append((slot.frame_id, missing))
+        return nacks
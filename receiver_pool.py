@@ -0,0 +1,169 @@
+"""
+Penerima multi-proses untuk WebServer.py (--workers N).
+Satu proses merakit dan memvalidasi semua kamera di satu thread Python (GIL),
+jadi satu host hanya memakai kira-kira satu core untuk video. ReceiverPool
+menjalankan N proses worker, masing-masing VideoStreamReceiver dengan socket
+SO_REUSEPORT di port yang sama. Kernel membagi datagram per alamat sumber
+(hash 4-tuple), jadi semua chunk satu kamera (serta NACK/feedback-nya) selalu
+lewat worker yang sama dan state reassembly tidak perlu dibagi antar proses:
+beban tersebar per kamera, satu kamera paling banyak satu core.
+
+Worker menulis JPEG sekali ke FrameRing per kamera di shared memory
+(frame_ring.py, nama ring_name('maixcam_<port>_w<worker>', id), terlihat di
+/streams). Nama ring unik per worker: kamera yang restart dengan port sumber
+baru bisa pindah ke worker lain, dan ring lamanya tidak ikut terhapus.
+dan hanya mengirim pesan kecil ke proses HTTP lewat satu multiprocessing.Queue:
+- ('frame', header, addr, ring, counter, first_seen, completed, frame_stats)
+  per frame valid; counter berisi bytes JPEG jika frame lebih besar dari slot
+- ('metrics', worker, state) setiap stats_interval detik (ReceiverMetrics.export())
+Proses HTTP membaca frame dari ring, menayangkannya lewat StreamTable/
+CameraStream (streams.py) dan menjalankan ClockSync per kamera. Antrean penuh
+atau slot yang sudah ditimpa (proses HTTP tertinggal) = frame dibuang, bukan
+menahan loop terima.
+"""
+import multiprocessing
+import queue
+import socket
+import threading
+
+from frame_ring import FrameRing
+
+
+def _worker_main(index, ip, port, frames, stop_event, stats_interval):
+    import WebServer
+    metrics = WebServer.metrics
+    receiver = WebServer.VideoStreamReceiver(ip, port, reuse_port=True)
+    receiver.clock_sync_enabled = False  # Jam disinkronkan proses HTTP
+    WebServer.streams.ring_prefix = 'maixcam_{}_w{}'.format(port, index)
+
+    def sink(stream, header, frame_data, completed):
+        counter = stream.write_ring(header, frame_data, completed)
+        try:
+            frames.put_nowait(('frame', header, stream.sender_addr, stream.ring_name,
+                               counter if counter is not None else bytes(frame_data),
+                               stream.reassembler.last_first_seen, completed, stream.count_frame()))
+        except queue.Full:
+            metrics.handoff_dropped.inc()
+
+    receiver.frame_sink = sink
+    receiver.start()
+    while not stop_event.wait(stats_interval):
+        try:
+            frames.put_nowait(('metrics', index, metrics.export()))
+        except queue.Full:
+            pass
+    receiver.stop()
+
+
+class ReceiverPool:
+    """
+    Pengganti VideoStreamReceiver di proses HTTP (start()/stop() sama).
+    - streams: StreamTable proses HTTP, frame dari worker ditayangkan di sini.
+    - metrics: ReceiverMetrics proses HTTP, metrik worker dijumlahkan di /metrics.
+    """
+    def __init__(self, workers, streams, metrics, ip="0.0.0.0", port=9001, queue_size=64, stats_interval=1.0):
+        self.workers = workers
+        self.streams = streams
+        self.metrics = metrics
+        self.ip = ip
+        self.port = port
+        self.queue_size = queue_size
+        self.stats_interval = stats_interval
+        self.clock_sync_enabled = True
+        self.command_port = 9002
+        self.running = False
+        self.processes = []
+        self.frames = None
+        self.stop_event = None
+        self.rings = {}     # Nama -> FrameRing worker (dibuka sebagai pembaca)
+        self.counters = {}  # Nama -> counter frame terakhir yang dibaca dari ring itu
+
+    def start(self):
+        if not hasattr(socket, 'SO_REUSEPORT'):
+            raise RuntimeError("SO_REUSEPORT tidak didukung di OS ini, jalankan tanpa --workers")
+        ctx = multiprocessing.get_context('spawn')  # Tanpa fork dari proses yang sudah punya thread
+        self.frames = ctx.Queue(self.queue_size)
+        self.stop_event = ctx.Event()
+        self.running = True
+        # Viewer terhubung ke proses HTTP ini, bukan ke worker
+        self.metrics.bind(viewers_fn=lambda: sum(stream.broadcaster.viewers for stream in self.streams.list()))
+        for index in range(self.workers):
+            process = ctx.Process(target=_worker_main, daemon=True,
+                                  args=(index, self.ip, self.port, self.frames, self.stop_event,
+                                        self.stats_interval))
+            process.start()
+            self.processes.append(process)
+        threading.Thread(target=self._dispatch, daemon=True).start()
+        print("🚀 {} worker penerima UDP (SO_REUSEPORT) di {}:{}".format(self.workers, self.ip, self.port))
+
+    def _dispatch(self):
+        while self.running:
+            try:
+                message = self.frames.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            try:
+                if message[0] == 'frame':
+                    self._on_frame(*message[1:])
+                else:
+                    self.metrics.remote[message[1]] = message[2]
+            except Exception as e:
+                print("\n⚠️ Error menayangkan frame dari worker: {}".format(e))
+
+    def _attach(self, name):
+        ring = self.rings.pop(name, None)
+        if ring is not None:
+            ring.close()
+        ring = self.rings[name] = FrameRing.attach(name)
+        return ring
+
+    def _read_ring(self, name, counter):
+        """Salin frame dari ring worker (satu salinan untuk frame terbaru dan viewer), None jika tertimpa"""
+        ring = self.rings.get(name)
+        # Counter tidak maju = ring dibuat ulang dengan nama yang sama, attach segmen yang baru
+        if ring is None or counter <= self.counters.get(name, 0):
+            ring = self._attach(name)
+        self.counters[name] = counter
+        ref = ring.get(counter)
+        if ref is None and ring.head_counter() < counter:
+            # Segmen yang di-attach tidak ditulis lagi (sudah di-unlink), attach ulang
+            ring = self._attach(name)
+            ref = ring.get(counter)
+        if ref is None:
+            return None
+        frame_data = bytes(ref.data)
+        valid = ref.valid()
+        ref.release()
+        return frame_data if valid else None
+
+    def _on_frame(self, header, addr, ring, counter, first_seen, completed, frame_stats):
+        frame_data = counter if isinstance(counter, bytes) else self._read_ring(ring, counter)
+        if frame_data is None:
+            self.metrics.handoff_dropped.inc()
+            return
+        stream = self.streams.get(header, addr)
+        if stream is None:
+            return
+        if stream.sender_addr is None:
+            stream.sender_addr = addr
+            if self.clock_sync_enabled:
+                stream.start_clock_sync(self.command_port)
+        # Kamera yang restart bisa pindah worker: alamat dan ring ikut berganti
+        stream.sender_addr = addr
+        stream.ring_name = ring
+        stream.show(header, frame_data, first_seen, completed, frame_stats)
+
+    def stop(self):
+        self.running = False
+        if self.stop_event is not None:
+            self.stop_event.set()
+        for stream in self.streams.list():
+            stream.stop()
+        for process in self.processes:
+            process.join(2)
+            if process.is_alive():
+                process.terminate()
+        for ring in self.rings.values():
+            ring.close()
@@ -0,0 +1,328 @@
+"""
+Rekaman frame JPEG yang diterima ke disk dan playback dengan seek.
+
+Layout di root (default recordings/):
+    <kamera>/<start_us>.vrec   segmen append-only: header file, lalu per frame
+                               (ts_us u64, ukuran u32) + JPEG
+    <kamera>/<start_us>.vidx   index: (ts_us u64, offset u64) per frame
+Segmen baru dibuka setiap segment_seconds detik atau segment_bytes byte.
+Index berukuran tetap 16 byte per frame dan terurut waktu, jadi seek ke waktu
+mana pun = bisect di mmap index, tanpa membaca segmen.
+
+- Recorder.add(cam_id, ts, jpeg): dipanggil thread penerima, tidak pernah
+  menunggu disk. Antrean terbatas; jika penuh frame dibuang dan dihitung.
+- Thread writer mengambil antrean per batch: satu write() per file per batch,
+  fsync paling sering setiap fsync_interval detik. report() memberi backlog,
+  frame dibuang, byte ditulis dan durasi fsync.
+- RecordingStore: daftar rekaman dan play(cam, from_ts, speed) yang membaca
+  segmen lewat mmap, termasuk segmen yang masih ditulis (mengikuti live).
+"""
+import bisect
+import mmap
+import os
+import queue
+import re
+import struct
+import threading
+import time
+
+MAGIC = b'VREC'
+FILE_HEADER = struct.Struct('<4sI')  # magic, versi
+RECORD = struct.Struct('<QI')        # ts_us, ukuran JPEG
+INDEX = struct.Struct('<QQ')         # ts_us, offset record di segmen
+SEGMENT_EXT = '.vrec'
+INDEX_EXT = '.vidx'
+
+
+def camera_dir(cam_id):
+    """Nama folder kamera (hanya huruf, angka dan _), sama dengan nama di /recordings"""
+    return re.sub(r'[^0-9A-Za-z]', '_', str(cam_id))
+
+
+class _SegmentWriter:
+    """Segmen yang sedang ditulis untuk satu kamera"""
+    def __init__(self, directory):
+        self.directory = directory
+        self.data = None
+        self.index = None
+        self.start_us = 0
+        self.size = 0
+
+    def open(self, ts_us):
+        self.close()
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, str(ts_us))
+        self.data = open(path + SEGMENT_EXT, 'ab', buffering=0)
+        self.index = open(path + INDEX_EXT, 'ab', buffering=0)
+        # Segmen dengan nama sama bisa sudah ada (restart di mikrodetik yang sama, jam
+        # mundur): lanjutkan di akhir file agar offset index tetap menunjuk record yang benar
+        self.size = os.fstat(self.data.fileno()).st_size
+        if not self.size:
+            self.data.write(FILE_HEADER.pack(MAGIC, 1))
+            self.size = FILE_HEADER.size
+        self.start_us = ts_us
+
+    def append(self, frames):
+        """Tulis batch [(ts_us, jpeg)] dengan satu write() untuk data dan satu untuk index"""
+        parts = []
+        entries = []
+        offset = self.size
+        for ts_us, jpeg in frames:
+            parts.append(RECORD.pack(ts_us, len(jpeg)))
+            parts.append(jpeg)
+            entries.append(INDEX.pack(ts_us, offset))
+            offset += RECORD.size + len(jpeg)
+        self.data.write(b''.join(parts))
+        # Index ditulis setelah data, jadi entri index selalu menunjuk record yang utuh
+        self.index.write(b''.join(entries))
+        written = offset - self.size
+        self.size = offset
+        return written
+
+    def fsync(self):
+        if self.data is not None:
+            os.fsync(self.data.fileno())
+            os.fsync(self.index.fileno())
+
+    def close(self):
+        if self.data is not None:
+            self.fsync()
+            self.data.close()
+            self.index.close()
+            self.data = self.index = None
+
+
+class Recorder:
+    """Penulis rekaman untuk semua kamera: add() dari thread penerima, disk di thread sendiri"""
+    def __init__(self, root='recordings', segment_seconds=60.0, segment_bytes=256 * 1024 * 1024,
+                 queue_size=256, batch_size=64, fsync_interval=1.0):
+        self.root = root
+        self.segment_us = int(segment_seconds * 1000000)
+        self.segment_bytes = segment_bytes
+        self.queue = queue.Queue(queue_size)
+        self.batch_size = batch_size
+        self.fsync_interval = fsync_interval
+        self.segments = {}  # Folder kamera -> _SegmentWriter
+        self.running = False
+        self.thread = None
+        self.last_fsync = time.time()
+        self.dirty = False
+        self.stats = {'frames': 0, 'bytes': 0, 'dropped': 0, 'batches': 0, 'segments': 0,
+                      'fsyncs': 0, 'last_fsync_ms': 0.0, 'max_backlog': 0}
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        print("⏺️ Rekaman aktif di {}".format(os.path.abspath(self.root)))
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(5)
+        for segment in self.segments.values():
+            segment.close()
+
+    def add(self, cam_id, ts, jpeg):
+        """Antrekan frame (jpeg boleh memoryview, tidak disalin di thread pemanggil)"""
+        try:
+            self.queue.put_nowait((cam_id, int(ts * 1000000), jpeg))
+        except queue.Full:
+            self.stats['dropped'] += 1
+
+    def backlog(self):
+        return self.queue.qsize()
+
+    def report(self):
+        stats = dict(self.stats)
+        stats['backlog'] = self.backlog()
+        stats['queue_size'] = self.queue.maxsize
+        return stats
+
+    def _run(self):
+        while self.running or not self.queue.empty():
+            try:
+                batch = [self.queue.get(timeout=0.2)]
+            except queue.Empty:
+                self._maybe_fsync()
+                continue
+            backlog = self.queue.qsize() + 1
+            if backlog > self.stats['max_backlog']:
+                self.stats['max_backlog'] = backlog
+            # Ambil semua yang sudah antre (maksimal batch_size) tanpa menunggu
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except OSError as e:
+                print("⚠️ Gagal menulis rekaman: {}".format(e))
+                self.stats['dropped'] += len(batch)
+            self._maybe_fsync()
+
+    def _write(self, batch):
+        per_camera = {}
+        for cam_id, ts_us, jpeg in batch:
+            per_camera.setdefault(camera_dir(cam_id), []).append((ts_us, jpeg))
+        for name, frames in per_camera.items():
+            segment = self.segments.get(name)
+            if segment is None:
+                segment = self.segments[name] = _SegmentWriter(os.path.join(self.root, name))
+            ts_us = frames[0][0]
+            if (segment.data is None or ts_us - segment.start_us >= self.segment_us
+                    or segment.size >= self.segment_bytes):
+                segment.open(ts_us)
+                self.stats['segments'] += 1
+            self.stats['bytes'] += segment.append(frames)
+            self.stats['frames'] += len(frames)
+        self.stats['batches'] += 1
+        self.dirty = True
+
+    def _maybe_fsync(self):
+        now = time.time()
+        if not self.dirty or now - self.last_fsync < self.fsync_interval:
+            return
+        started = time.perf_counter()
+        for segment in self.segments.values():
+            segment.fsync()
+        self.stats['last_fsync_ms'] = (time.perf_counter() - started) * 1000
+        self.stats['fsyncs'] += 1
+        self.last_fsync = now
+        self.dirty = False
+
+
+class _Segment:
+    """Segmen rekaman di-mmap (data dan index) untuk dibaca"""
+    def __init__(self, path):
+        self.path = path
+        self.data = self.index = None
+        self.count = 0
+        self.remap()
+
+    def remap(self):
+        """Petakan ulang (segmen yang masih ditulis bertambah panjang), return jumlah frame"""
+        self.close()
+        with open(self.path + INDEX_EXT, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size // INDEX.size * INDEX.size
+            if size:
+                self.index = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+        with open(self.path + SEGMENT_EXT, 'rb') as f:
+            if os.fstat(f.fileno()).st_size:
+                self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.count = size // INDEX.size if self.data is not None else 0
+        return self.count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        # Sequence ts_us untuk bisect
+        return INDEX.unpack_from(self.index, i * INDEX.size)[0]
+
+    def find(self, ts_us):
+        """Posisi frame pertama dengan ts >= ts_us"""
+        return bisect.bisect_left(self, ts_us)
+
+    def frame(self, i):
+        """(ts_us, bytes JPEG) frame ke-i"""
+        ts_us, offset = INDEX.unpack_from(self.index, i * INDEX.size)
+        _, size = RECORD.unpack_from(self.data, offset)
+        start = offset + RECORD.size
+        return ts_us, self.data[start:start + size]
+
+    def close(self):
+        for m in (self.data, self.index):
+            if m is not None:
+                m.close()
+        self.data = self.index = None
+
+
+class RecordingStore:
+    """Membaca folder rekaman yang ditulis Recorder (boleh dari proses lain)"""
+    def __init__(self, root='recordings'):
+        self.root = root
+
+    def segments(self, cam):
+        """Waktu mulai (us) semua segmen kamera, terurut"""
+        directory = os.path.join(self.root, camera_dir(cam))
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            return []
+        return sorted(int(name[:-len(SEGMENT_EXT)]) for name in names
+                      if name.endswith(SEGMENT_EXT) and name[:-len(SEGMENT_EXT)].isdigit())
+
+    def _path(self, cam, start_us):
+        return os.path.join(self.root, camera_dir(cam), str(start_us))
+
+    def list(self):
+        """{kamera: [{'start', 'end', 'frames', 'bytes'}]} (waktu dalam detik unix)"""
+        try:
+            cameras = sorted(os.listdir(self.root))
+        except OSError:
+            return {}
+        result = {}
+        for cam in cameras:
+            entries = []
+            for start_us in self.segments(cam):
+                path = self._path(cam, start_us)
+                frames = os.path.getsize(path + INDEX_EXT) // INDEX.size
+                if not frames:
+                    continue
+                with open(path + INDEX_EXT, 'rb') as f:
+                    f.seek((frames - 1) * INDEX.size)
+                    end_us = INDEX.unpack(f.read(INDEX.size))[0]
+                entries.append({'start': start_us / 1000000.0, 'end': end_us / 1000000.0, 'frames': frames,
+                                'bytes': os.path.getsize(path + SEGMENT_EXT)})
+            if entries:
+                result[cam] = entries
+        return result
+
+    def frames(self, cam, from_ts=None, idle_timeout=2.0):
+        """
+        Generator (ts_us, JPEG) mulai frame pertama dengan ts >= from_ts (detik unix,
+        None = awal rekaman). Setelah frame terakhir menunggu segmen yang masih ditulis
+        sampai idle_timeout detik tanpa frame baru.
+        """
+        starts = self.segments(cam)
+        if not starts:
+            return
+        ts_us = int(from_ts * 1000000) if from_ts is not None else 0
+        # Segmen terakhir yang mulai sebelum from_ts, bisect di daftar nama file
+        current = starts[max(0, bisect.bisect_right(starts, ts_us) - 1)]
+        segment = _Segment(self._path(cam, current))
+        i = segment.find(ts_us)
+        idle_since = time.time()
+        try:
+            while True:
+                while i < len(segment):
+                    yield segment.frame(i)
+                    i += 1
+                    idle_since = time.time()
+                if segment.remap() > i:
+                    continue
+                later = [start for start in self.segments(cam) if start > current]
+                if later:
+                    segment.close()
+                    current = later[0]
+                    segment = _Segment(self._path(cam, current))
+                    i = 0
+                    continue
+                if time.time() - idle_since > idle_timeout:
+                    return
+                time.sleep(0.05)
+        finally:
+            segment.close()
+
+    def play(self, cam, from_ts=None, speed=1.0):
+        """Seperti frames(), tapi JPEG dikeluarkan mengikuti waktu rekaman dibagi speed"""
+        started = None
+        for ts_us, jpeg in self.frames(cam, from_ts):
+            if started is None:
+                started = (time.time(), ts_us)
+            delay = (ts_us - started[1]) / 1000000.0 / speed - (time.time() - started[0])
+            if delay > 0:
+                time.sleep(delay)
+            yield jpeg
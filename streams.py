@@ -0,0 +1,213 @@
+"""
+Beberapa MaixCam ke satu penerima (satu port UDP), dipakai WebServer.py dan
+AsyncWebServer.py.
+- stream_key(header, addr): id kamera = stream_id di header (1-255, Maixcam.py
+  --stream-id), atau IP sumber jika stream_id 0 (satu kamera per IP).
+- CameraStream: state per kamera: reassembler, LinkMonitor, statistik frame,
+  frame terbaru, latency (dengan ClockSync ke IP kamera itu), broadcaster dan
+  alamat sumber untuk NACK/feedback.
+- StreamTable: peta id -> CameraStream, dibuat saat datagram pertama kamera
+  datang. Kamera pertama memakai stream default (objek global server), jadi
+  /video_feed dan /stats tanpa id tetap menayangkan kamera pertama.
+  Dengan ring_prefix, setiap kamera juga menulis frame ke FrameRing di shared
+  memory (frame_ring.py) bernama ring_name(prefix, id) untuk konsumen lain.
+  Dengan recorder, setiap frame yang ditayangkan juga direkam (recorder.py).
+"""
+import re
+import time
+
+from commands import shared_session
+from frame_ring import FrameRing
+from latency import ClockSync, LatencyTracker
+from protocol import pack_nack
+from rate_control import LinkMonitor
+from reassembly import FrameReassembler
+
+
+def stream_key(header, addr):
+    """Id kamera (string) untuk datagram dari addr"""
+    if header.stream_id:
+        return str(header.stream_id)
+    return addr[0]
+
+
+def ring_name(prefix, cam_id):
+    """Nama shared memory ring kamera (hanya huruf, angka dan _)"""
+    return '{}_{}'.format(prefix, re.sub(r'[^0-9A-Za-z]', '_', cam_id))
+
+
+class CameraStream:
+    """
+    - on_chunk(header, payload, addr, now): rakit chunk, return data frame jika lengkap.
+    - maintain(now, send): buang frame basi, kirim NACK dan feedback lewat send(paket, addr).
+    - publish(header, frame_data, completed) / invalid_frame(): frame lengkap yang valid / tidak.
+    - stats(): isi /stats untuk kamera ini.
+    """
+    def __init__(self, broadcaster, latency=None, latest_frame=None, on_frame=None):
+        self.cam_id = None  # Diisi StreamTable saat datagram pertama datang
+        self.broadcaster = broadcaster
+        self.latency = latency if latency is not None else LatencyTracker()
+        broadcaster.on_serve = self.latency.served
+        if latest_frame is None:
+            latest_frame = {'data': b'', 'timestamp': 0, 'counter': 0, 'stats': {'fps': 0}}
+        self.latest_frame = latest_frame
+        self.reassembler = FrameReassembler(on_frame=on_frame)
+        self.monitor = LinkMonitor()
+        self.frame_stats = {'last_time': time.time(), 'fps': 0, 'total_frames': 0, 'dropped_frames': 0,
+                            'invalid_frames': 0}
+        self.sender_addr = None
+        self.last_nack_check = 0.0
+        self.ring = None       # FrameRing milik kamera ini (penulis)
+        self.ring_name = None  # Nama ring untuk /streams, juga saat ring ditulis proses worker
+        self.recorder = None   # Recorder (recorder.py) atau None
+
+    def start_clock_sync(self, command_port):
+        # Offset jam lewat kanal perintah ke MaixCam yang mengirim stream ini
+        host = self.sender_addr[0]
+        session, _ = shared_session(host, command_port)
+        self.latency.clock = ClockSync(session)
+        self.latency.clock.start()
+        print("⏱️ Sinkronisasi jam kamera {} dengan {}:{}".format(self.cam_id, host, command_port))
+
+    def open_ring(self, name, slots=8, slot_size=512 * 1024):
+        self.ring = FrameRing.create(name, slots, slot_size)
+        self.ring_name = name
+
+    def stop(self):
+        if self.latency.clock:
+            self.latency.clock.stop()
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+    def on_chunk(self, header, payload, addr, now):
+        self.sender_addr = addr
+        self.monitor.on_chunk(header, now)
+        return self.reassembler.add_chunk(header, payload, now)
+
+    def maintain(self, now, send, nack=True, nack_interval=0.0, feedback=True):
+        self.reassembler.evict_stale(now)
+        if self.sender_addr is None:
+            return
+        # NACK untuk chunk yang hilang ke alamat sumber stream
+        if nack and now - self.last_nack_check >= nack_interval:
+            self.last_nack_check = now
+            for frame_id, missing in self.reassembler.collect_nacks(now):
+                send(pack_nack(frame_id, missing), self.sender_addr)
+        # Laporan kondisi link ke MaixCam untuk kontrol bitrate
+        if feedback:
+            report = self.monitor.report(now, self.reassembler.stats)
+            if report is not None:
+                send(report, self.sender_addr)
+                self.frame_stats['chunk_loss'] = self.monitor.last['loss']
+                self.frame_stats['jitter'] = self.monitor.last['jitter']
+
+    def invalid_frame(self):
+        self.frame_stats['invalid_frames'] += 1
+
+    def count_frame(self):
+        """Hitung satu frame valid, return salinan statistik frame"""
+        frame_stats = self.frame_stats
+        frame_stats['total_frames'] += 1
+        current_time = time.time()
+        elapsed = current_time - frame_stats['last_time']
+        if elapsed >= 1.0:
+            frame_stats['fps'] = frame_stats['total_frames'] / elapsed
+            frame_stats['total_frames'] = 0
+            frame_stats['last_time'] = current_time
+        frame_stats['dropped_frames'] = self.reassembler.stats['evicted']
+        return frame_stats.copy()
+
+    def write_ring(self, header, frame_data, completed):
+        """Tulis frame sekali ke ring, return counter (None tanpa ring atau frame lebih besar dari slot)"""
+        if self.ring is None:
+            return None
+        return self.ring.write(frame_data, frame_id=header.frame_id, capture_ts_us=header.capture_ts_us,
+                               first_seen=self.reassembler.last_first_seen, completed=completed)
+
+    def publish(self, header, frame_data, completed):
+        self.write_ring(header, frame_data, completed)
+        self.show(header, frame_data, self.reassembler.last_first_seen, completed, self.count_frame())
+
+    def show(self, header, frame_data, first_seen, completed, frame_stats):
+        """Jadikan frame terbaru dan kirim ke viewer (dipakai juga untuk frame dari worker, receiver_pool.py)"""
+        current_time = time.time()
+        if self.recorder is not None:
+            self.recorder.add(self.cam_id, current_time, frame_data)
+        self.latest_frame.update({
+            'data': frame_data,
+            'timestamp': current_time,
+            'counter': self.latest_frame['counter'] + 1,
+            'stats': frame_stats
+        })
+        timing = self.latency.on_frame(header, first_seen, completed)
+        self.broadcaster.publish(frame_data, timing)
+
+    def stats(self):
+        latest_frame = self.latest_frame
+        if latest_frame['data']:
+            return {
+                'fps': round(latest_frame['stats']['fps'], 1),
+                'last_update': time.time() - latest_frame['timestamp'],
+                'total_frames': latest_frame['counter'],
+                'dropped_frames': latest_frame['stats'].get('dropped_frames', 0),
+                'chunk_loss': round(latest_frame['stats'].get('chunk_loss', 0), 3),
+                'jitter_ms': round(latest_frame['stats'].get('jitter', 0) * 1000, 1),
+                'latency': self.latency.summary(),
+                'viewers': self.broadcaster.viewers
+            }
+        return {'status': 'no frames received'}
+
+
+class StreamTable:
+    """
+    get(header, addr): CameraStream untuk datagram, dibuat jika belum ada
+    (None jika sudah max_streams kamera, agar datagram liar tidak menghabiskan
+    memori). Pembaca di thread HTTP memakai find()/list(); dict diganti utuh
+    saat kamera baru ditambahkan, jadi aman dibaca tanpa lock.
+    """
+    def __init__(self, default, make_stream, max_streams=16, ring_prefix=None):
+        self.default = default          # CameraStream untuk kamera pertama
+        self.make_stream = make_stream  # make_stream() -> CameraStream baru
+        self.max_streams = max_streams
+        self.ring_prefix = ring_prefix  # Jika diisi, setiap kamera baru membuka FrameRing
+        self.recorder = None            # Jika diisi, frame setiap kamera baru direkam
+        self.streams = {}
+        self.rejected = 0
+
+    def get(self, header, addr):
+        key = stream_key(header, addr)
+        stream = self.streams.get(key)
+        if stream is not None:
+            return stream
+        if len(self.streams) >= self.max_streams:
+            if not self.rejected:
+                print("⚠️ Batas {} kamera tercapai, stream {} diabaikan".format(self.max_streams, key))
+            self.rejected += 1
+            return None
+        stream = self.default if self.default.cam_id is None else self.make_stream()
+        stream.cam_id = key
+        stream.recorder = self.recorder
+        if self.ring_prefix:
+            stream.open_ring(ring_name(self.ring_prefix, key))
+        streams = dict(self.streams)
+        streams[key] = stream
+        self.streams = streams
+        print("📷 Kamera {} terhubung dari {}:{}".format(key, *addr))
+        return stream
+
+    def find(self, cam_id):
+        return self.streams.get(cam_id)
+
+    def list(self):
+        return list(self.streams.values())
+
+    def summary(self):
+        """Ringkasan semua kamera untuk /streams"""
+        return {stream.cam_id: {
+            'address': '{}:{}'.format(*stream.sender_addr) if stream.sender_addr else None,
+            'fps': round(stream.latest_frame['stats']['fps'], 1),
+            'total_frames': stream.latest_frame['counter'],
+            'viewers': stream.broadcaster.viewers,
+            'ring': stream.ring_name,
+        } for stream in self.list()}
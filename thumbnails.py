@@ -0,0 +1,93 @@
+"""
+Cache thumbnail JPEG untuk /snapshot dan /thumbnail di WebServer.py.
+- Kunci cache (kamera, frame counter, lebar, tinggi, kualitas): setiap varian
+  di-resize dan di-encode paling banyak sekali per frame, berapa pun klien
+  yang polling. Request bersamaan untuk kunci yang sama menunggu hasil
+  request pertama, tidak ikut menghitung.
+- Frame besar di-decode langsung dalam ukuran 1/2, 1/4 atau 1/8
+  (cv2.IMREAD_REDUCED_COLOR_*, skala DCT di libjpeg), jadi thumbnail kecil
+  tidak perlu decode resolusi penuh.
+- LRU dengan max_entries entri; entri frame lama otomatis terdorong keluar.
+"""
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from jpeg_utils import jpeg_size
+
+REDUCED_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+                 (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+
+def fit_size(src_w, src_h, width=None, height=None):
+    """Ukuran thumbnail di dalam kotak width x height dengan rasio aspek sumber (tidak diperbesar)"""
+    scale = min(width / src_w if width else 1.0, height / src_h if height else 1.0, 1.0)
+    return max(1, round(src_w * scale)), max(1, round(src_h * scale))
+
+
+def make_thumbnail(jpeg, width=None, height=None, quality=70):
+    """JPEG baru yang muat di width x height, None jika JPEG gagal di-decode"""
+    size = jpeg_size(jpeg)
+    flag = cv2.IMREAD_COLOR
+    if size is not None:
+        target_w, target_h = fit_size(size[0], size[1], width, height)
+        # Faktor reduksi terbesar yang masih >= ukuran target
+        for factor, reduced in REDUCED_FLAGS:
+            if size[0] // factor >= target_w and size[1] // factor >= target_h:
+                flag = reduced
+                break
+    image = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), flag)
+    if image is None:
+        return None
+    h, w = image.shape[:2]
+    if size is None:
+        target_w, target_h = fit_size(w, h, width, height)
+    if (w, h) != (target_w, target_h):
+        image = cv2.resize(image, (target_w, target_h), interpolation=cv2.INTER_AREA)
+    ok, buf = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buf.tobytes() if ok else None
+
+
+class ThumbnailCache:
+    """
+    get(cam_id, counter, jpeg, width, height, quality) -> bytes JPEG (atau None).
+    width/height/quality None = frame asli (snapshot), tanpa re-encode.
+    """
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.pending = {}  # Kunci -> Event, untuk request yang sedang menghitung kunci itu
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'waits': 0}
+
+    def get(self, cam_id, counter, jpeg, width=None, height=None, quality=None):
+        key = (cam_id, counter, width, height, quality)
+        while True:
+            with self.lock:
+                if key in self.entries:
+                    self.entries.move_to_end(key)
+                    self.stats['hits'] += 1
+                    return self.entries[key]
+                event = self.pending.get(key)
+                if event is None:
+                    event = self.pending[key] = threading.Event()
+                    self.stats['misses'] += 1
+                    break
+                self.stats['waits'] += 1
+            event.wait(1.0)
+        try:
+            if quality is None:
+                result = bytes(jpeg)
+            else:
+                result = make_thumbnail(jpeg, width, height, quality)
+            with self.lock:
+                self.entries[key] = result
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        finally:
+            with self.lock:
+                del self.pending[key]
+            event.set()
+        return result